@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK: BATCHED LOGISTIC FITTER VS. PER-SESSION SKLEARN
+*Simulates N Phase 2 datasets (8 personalized angles, 320 trials)
+*Fits them with quartet_fit.fit_logistic (one call) and with one
+ LogisticRegression(solver="lbfgs") per dataset
+*Reports runtime and the largest parameter/PSE differences
+
+Usage: python benchmarks/bench_fit.py [n_datasets]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from quartet_fit import fit_logistic  # noqa: E402
+
+n_datasets = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+rng = np.random.default_rng(0)
+
+# simulated sessions: PSE ~ N(pi/4, 0.05), logistic scale 0.05 rad
+pse = rng.normal(np.pi / 4, 0.05, n_datasets)
+X = pse[:, None] + 0.075 * (np.arange(320) % 8 - 3)[None, :]
+y = (rng.random(X.shape) < 1 / (1 + np.exp((X - np.pi / 4) / 0.05))).astype(float)
+
+t0 = time.perf_counter()
+batched = fit_logistic(X, y)
+t_batched = time.perf_counter() - t0
+
+t0 = time.perf_counter()
+sk = np.array([(m.intercept_[0], m.coef_[0, 0]) for m in
+               (LogisticRegression(solver="lbfgs", max_iter=1000).fit(X[i][:, None], y[i])
+                for i in range(n_datasets))])
+t_sklearn = time.perf_counter() - t0
+
+print(f"{n_datasets} datasets x 320 trials")
+print(f"batched: {t_batched:8.3f} s  ({batched['converged'].mean() * 100:.1f}% converged, "
+      f"max {batched['n_iter'].max()} iterations)")
+print(f"sklearn: {t_sklearn:8.3f} s  (speed-up {t_sklearn / t_batched:.1f}x)")
+print(f"max |diff| intercept {np.abs(batched['intercept'] - sk[:, 0]).max():.2e}, "
+      f"slope {np.abs(batched['slope'] - sk[:, 1]).max():.2e}, "
+      f"PSE {np.abs(batched['pse'] + sk[:, 0] / sk[:, 1]).max():.2e} rad")
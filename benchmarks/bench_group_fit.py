@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK: HIERARCHICAL GROUP FIT (RUNTIME SCALING AND SHRINKAGE)
+*Simulates subjects with PSE ~ N(pi/4, 0.06) rad and slope ~ N(-20, 5),
+ each tested at 8 angles 0.075 rad apart around a noisy Phase 1 estimate
+*Fits quartet_group.fit_group for growing numbers of subjects (runtime
+ should grow linearly) and reports the recovered group distribution
+*Compares the PSE error of the partially pooled estimates with independent
+ per-subject fits (C=1.0 as in the session analysis, and unpenalized), for
+ full (320) and short (64) sessions
+
+Usage: python benchmarks/bench_group_fit.py [max_subjects]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from quartet_fit import fit_logistic  # noqa: E402
+from quartet_group import fit_group, group_summary  # noqa: E402
+
+TRUE = {"PSEMeanRad": np.pi / 4, "PSESDRad": 0.06, "SlopeMean": -20.0, "SlopeSD": 5.0}
+
+
+def simulate(n_subjects, trials_per_angle, rng):
+    pse = rng.normal(TRUE["PSEMeanRad"], TRUE["PSESDRad"], n_subjects)
+    slope = rng.normal(TRUE["SlopeMean"], TRUE["SlopeSD"], n_subjects)
+    center = pse + rng.normal(0, 0.05, n_subjects)  # Phase 1 estimate
+    X = center[:, None] + 0.075 * (np.arange(8) - 3)[None, :]
+    W = np.full(X.shape, float(trials_per_angle))
+    p = 1 / (1 + np.exp(-slope[:, None] * (X - pse[:, None])))
+    Y = rng.binomial(trials_per_angle, p) / trials_per_angle
+    return pse, X, Y, W
+
+
+max_subjects = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+rng = np.random.default_rng(0)
+
+print("runtime (320 trials per subject)")
+n = 250
+while n <= max_subjects:
+    pse, X, Y, W = simulate(n, 40, rng)
+    t0 = time.perf_counter()
+    fit = fit_group(X, Y, W)
+    elapsed = time.perf_counter() - t0
+    s = group_summary(fit)
+    print(f"{n:>6} subjects: {elapsed:7.3f} s ({elapsed / n * 1e3:.3f} ms/subject, {fit['n_iter']} EM iterations)  "
+          f"PSE mean {s['PSEMeanRad']:.4f} SD {s['PSESDRad']:.4f}, slope mean {s['SlopeMean']:.2f} SD {s['SlopeSD']:.2f}")
+    n *= 2
+print("true: " + ", ".join(f"{key} {value:.4f}" for key, value in TRUE.items()))
+
+print("\nPSE error vs. the true PSE, 500 subjects (rad)")
+for trials_per_angle in (40, 8):
+    pse, X, Y, W = simulate(500, trials_per_angle, rng)
+    fit = fit_group(X, Y, W)
+    errors = {"partial pooling": fit["pse"] - pse}
+    # clip runaway independent fits to the tested range, as a plot would
+    for label, independent in (("independent C=1", fit["no_pool"]),
+                               ("independent C=None", fit_logistic(X, Y, weights=W, C=None))):
+        errors[label] = np.clip(independent["pse"], X.min(axis=1), X.max(axis=1)) - pse
+    print(f"{trials_per_angle * 8:>4} trials: " + ", ".join(
+        f"{label} RMS {np.sqrt(np.mean(err ** 2)):.4f} (max {np.abs(err).max():.4f})" for label, err in errors.items()))
+    print(f"{'':>12} mean posterior SD {np.sqrt(fit['cov'][:, 0, 0]).mean():.4f}")
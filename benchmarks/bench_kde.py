@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK: PHASE 1 DENSITIES AT GROUP SCALE (BINNED FFT KDE VS. EXACT KDE)
+*Simulates Phase 1 responses (10 per direction and subject, as a session)
+ for growing numbers of subjects
+*Times the densities of every subject and direction: quartet_kde.kde in one
+ call vs. one scipy gaussian_kde per group (what seaborn's kdeplot does for
+ each hue level), both on the same 512-point grid
+*Reports the largest difference relative to each density's peak, and the
+ pooled density of all responses (one group, n = 20 x subjects)
+
+Usage: python benchmarks/bench_kde.py [max_subjects]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import gaussian_kde
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from quartet_kde import kde  # noqa: E402
+
+
+def simulate(n_subjects, rng, per_direction=10):
+    pse = rng.normal(0.85, 0.06, n_subjects)
+    rows = []
+    for direction, offset in (("Ascending", 0.03), ("Descending", -0.03)):
+        x = pse[:, None] + offset + rng.normal(0, 0.04, (n_subjects, per_direction))
+        rows.append(pd.DataFrame({"Subject": np.repeat(np.arange(n_subjects), per_direction),
+                                  "RatioDir": direction, "ResponseRad": x.ravel()}))
+    return pd.concat(rows, ignore_index=True)
+
+
+def exact(data, grid, by):
+    return np.array([gaussian_kde(group["ResponseRad"].to_numpy())(grid)
+                     for _, group in data.groupby(by, sort=True)])
+
+
+def relative_error(binned, reference):
+    return (np.abs(binned - reference).max(axis=1) / reference.max(axis=1)).max()
+
+
+max_subjects = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+rng = np.random.default_rng(0)
+
+print("per subject and direction (10 responses each)")
+n = 125
+while n <= max_subjects:
+    data = simulate(n, rng)
+    t0 = time.perf_counter()
+    binned = kde(data["ResponseRad"], data[["Subject", "RatioDir"]])
+    t_binned = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    reference = exact(data, binned["grid"], ["Subject", "RatioDir"])
+    t_exact = time.perf_counter() - t0
+    print(f"{n:>6} subjects ({2 * n} densities): binned {t_binned:7.3f} s, exact {t_exact:7.3f} s "
+          f"(x{t_exact / t_binned:5.1f}), max error {relative_error(binned['density'], reference):.1e} of peak")
+    n *= 2
+
+print("\npooled (one density of all responses)")
+for n in (125, 1000, max_subjects):
+    data = simulate(n, rng)
+    t0 = time.perf_counter()
+    binned = kde(data["ResponseRad"])
+    t_binned = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    reference = gaussian_kde(data["ResponseRad"].to_numpy())(binned["grid"])[None, :]
+    t_exact = time.perf_counter() - t0
+    print(f"{len(data):>7} responses: binned {t_binned:7.4f} s, exact {t_exact:7.4f} s "
+          f"(x{t_exact / t_binned:6.1f}), max error {relative_error(binned['density'], reference):.1e} of peak")
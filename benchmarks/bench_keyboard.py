@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK: KEY-DOWN TIMESTAMP LATENCY AND JITTER (SYNTHETIC KEY EVENTS)
+*Injects space presses at known times during a flip loop and compares the
+ reported time with the true key-down time, for event.getKeys (stamped when
+ polled) and for ResponseBox (psychopy.hardware.keyboard)
+*Also reports how often the response is attributed to the wrong frame, i.e.
+ the ResponseRatio error of a Phase 1 sweep
+
+Headless (default): stand-in psychopy with a virtual clock; presses are
+queued at sub-frame times. This checks the timing pipeline (frame
+attribution, clock alignment) and shows the frame quantization of the
+polled path; the stand-in keyboard is exact by construction.
+
+Live (--live): the real psychopy window and keyboard, with presses sent
+through the OS by pynput from a timer thread. The true time is read on the
+experiment clock just before each press, so the error also contains the
+OS injection latency (an upper bound on the keyboard path's own latency).
+
+Usage: python benchmarks/bench_keyboard.py [n_presses] [--live] [--refresh-rate HZ]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(label, get_keys, clear, win, clock, inject, n_presses, rng):
+    """Inject n_presses, one per trial; returns a dict of timestamp and frame errors."""
+    stamp_err, frame_err = [], []
+    for _ in range(n_presses):
+        clear()
+        flip_times = []
+        truth = inject(clock.getTime() + rng.uniform(0.1, 0.4))
+        keys = []
+        while not keys:
+            flip_times.append(win.flip())
+            keys = get_keys(['space'])
+            if len(flip_times) > 600:
+                raise RuntimeError(f"{label}: injected key never arrived")
+        true_time = truth()
+        stamp_err.append(keys[0][1] - true_time)
+        true_frame = press_frame(flip_times, true_time)
+        frame_err.append(press_frame(flip_times, keys[0][1]) - true_frame)
+    stamp_err = np.asarray(stamp_err) * 1000
+    frame_err = np.asarray(frame_err)
+    return {"path": label, "mean_ms": stamp_err.mean(), "sd_ms": stamp_err.std(ddof=1),
+            "max_ms": np.abs(stamp_err).max(), "wrong_frame": np.mean(frame_err != 0)}
+
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+parser.add_argument('n_presses', nargs='?', type=int, default=200)
+parser.add_argument('--live', action='store_true', help='real psychopy + OS key injection (pynput)')
+parser.add_argument('--refresh-rate', type=float, default=60, help='headless refresh rate (Hz)')
+args = parser.parse_args()
+rng = np.random.default_rng(0)
+
+if args.live:
+    from pynput.keyboard import Controller, Key
+    from psychopy import core, event, logging, visual
+
+    controller = Controller()
+
+    def inject(t):
+        truth = {}
+
+        def press():
+            truth["t"] = clock.getTime()
+            controller.press(Key.space)
+            controller.release(Key.space)
+        threading.Timer(max(0.0, t - clock.getTime()), press).start()
+        return lambda: truth["t"]
+else:
+    import quartet_headless
+
+    class _Idle:
+        def on_flip(self, xys, now):
+            return None
+
+        def on_poll(self, keyList, now):
+            return None
+
+    quartet_headless.install(_Idle(), refresh_rate=args.refresh_rate)
+    from psychopy import core, event, logging, visual
+
+    def inject(t):
+        quartet_headless.inject_key('space', clock.t0 + t)
+        return lambda: t
+
+from quartet_responses import ResponseBox, press_frame  # noqa: E402  (after the stand-ins)
+
+win = visual.Window(size=(800, 600), fullscr=args.live, units='pix')
+clock = core.Clock()
+logging.setDefaultClock(clock)
+box = ResponseBox(clock)
+
+results = [
+    measure("event.getKeys", lambda keyList: event.getKeys(keyList=keyList, timeStamped=clock),
+            lambda: event.clearEvents(eventType='keyboard'), win, clock, inject, args.n_presses, rng),
+    measure(box.describe(), box.get_keys, box.clear, win, clock, inject, args.n_presses, rng),
+]
+t0 = time.perf_counter()
+for _ in range(10000):
+    box.get_keys(['space'])
+poll_us = (time.perf_counter() - t0) / 10000 * 1e6
+win.close()
+
+print(f"{args.n_presses} presses per path, {'live' if args.live else 'headless'}"
+      f"{'' if args.live else f' at {args.refresh_rate:g} Hz'}; error = reported - true key-down")
+for r in results:
+    print(f"{r['path']:>48}: mean {r['mean_ms']:7.3f} ms  sd {r['sd_ms']:6.3f} ms  "
+          f"max |err| {r['max_ms']:7.3f} ms  wrong frame {r['wrong_frame'] * 100:5.1f}%")
+print(f"ResponseBox.get_keys poll cost: {poll_us:.2f} us")
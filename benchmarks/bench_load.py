@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK: LOADING SESSIONS FROM CSV VS. COLUMNAR FILES (GROUP-ANALYSIS READ PATH)
+*Simulates a few headless sessions and replicates them into n_sessions
+ session folders, each with _p1/_p2 as CSV, Feather and Parquet
+*Times loading every session's two phases, typed as the analysis needs them:
+ CSV (read_csv + coercion to the fixed schema), Feather memory-mapped,
+ Feather read into memory, Parquet
+*Reports the best of --repeats passes (warm page cache) and the size on disk
+
+Usage: python benchmarks/bench_load.py [n_sessions] [--repeats N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from quartet_headless import SimulatedObserver, run_session  # noqa: E402
+from quartet_columnar import read_phase, typed_frame, write_phase  # noqa: E402
+
+N_SOURCES = 4  # distinct simulated sessions, cycled over the replicas
+
+
+def load_csv(prefix):
+    return [typed_frame(pd.read_csv(prefix + f'_p{i}.csv'), f"phase{i}") for i in (1, 2)]
+
+
+def load_feather(prefix, memory_map=True):
+    return [read_phase(prefix + f'_p{i}.feather', memory_map=memory_map)[0] for i in (1, 2)]
+
+
+def load_parquet(prefix):
+    return [read_phase(prefix + f'_p{i}.parquet')[0] for i in (1, 2)]
+
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+parser.add_argument('n_sessions', nargs='?', type=int, default=500)
+parser.add_argument('--repeats', type=int, default=3)
+args = parser.parse_args()
+
+with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as data_dir:  # report workers may still be writing
+    sources = []
+    for session in range(N_SOURCES):
+        np.random.seed(session)
+        g = run_session(SimulatedObserver(pse=0.8, seed=session), data_dir,
+                        participant=f"src{session}")
+        metadata = {"expInfo": {key: str(value) for key, value in g["expInfo"].items()},
+                    "refr_rate": g["refr_rate"], "subject_ratio": g["subject_ratio"]}
+        sources.append((g["phase1_df"], g["phase2_df"], metadata))
+
+    prefixes, sizes = [], {"csv": 0, "feather": 0, "parquet": 0}
+    for session in range(args.n_sessions):
+        phase1_df, phase2_df, metadata = sources[session % N_SOURCES]
+        folder = os.path.join(data_dir, f"p{session:04d}_SubjData", 'Output')
+        os.makedirs(folder)
+        prefix = os.path.join(folder, f"p{session:04d}")
+        for i, df in ((1, phase1_df), (2, phase2_df)):
+            df.to_csv(prefix + f'_p{i}.csv', index=False)
+            for fmt in ('feather', 'parquet'):
+                write_phase(df, prefix + f'_p{i}.{fmt}', f"phase{i}", metadata)
+            for fmt in sizes:
+                sizes[fmt] += os.path.getsize(prefix + f'_p{i}.{fmt}')
+        prefixes.append(prefix)
+
+    paths = {"CSV + schema coercion": (load_csv, "csv"),
+             "Feather (memory-mapped)": (load_feather, "feather"),
+             "Feather (read)": (lambda prefix: load_feather(prefix, memory_map=False), "feather"),
+             "Parquet": (load_parquet, "parquet")}
+    timings = {}
+    for label, (load, fmt) in paths.items():
+        best = np.inf
+        for _ in range(args.repeats):
+            t0 = time.perf_counter()
+            frames = [load(prefix) for prefix in prefixes]
+            best = min(best, time.perf_counter() - t0)
+        timings[label] = (best, fmt)
+    # every path yields the same typed frames
+    for load, _ in paths.values():
+        for expected, loaded in zip(load_csv(prefixes[0]), load(prefixes[0])):
+            pd.testing.assert_frame_equal(expected, loaded)
+
+csv_time = timings["CSV + schema coercion"][0]
+print(f"{args.n_sessions} sessions x 2 phases, best of {args.repeats} (warm cache)")
+for label, (seconds, fmt) in timings.items():
+    print(f"{label:>24}: {seconds:7.3f} s  {seconds / args.n_sessions * 1000:6.2f} ms/session  "
+          f"x{csv_time / seconds:5.1f}  {sizes[fmt] / 2**20:6.1f} MB")
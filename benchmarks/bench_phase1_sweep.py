@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK: COARSE-TO-FINE VS. LINEAR PHASE 1 SWEEP (SIMULATED OBSERVERS)
+*Runs paired headless sessions (same observer, seed and trial order) with
+ "Phase 1: Linear" and "Phase 1: Coarse-to-fine"
+*Observer PSEs are drawn uniformly over the middle of the ratio range, so the
+ coarse grid is not aligned with the threshold
+*Reports Phase 1 duration (virtual time) and the bias/RMS error of the
+ ascending, descending and overall mean estimates against the true PSE
+
+Usage: python benchmarks/bench_phase1_sweep.py [n_sessions]
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from quartet_headless import SimulatedObserver, run_session  # noqa: E402
+
+n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+rng = np.random.default_rng(0)
+true_pse = rng.uniform(0.6, 1.0, n_sessions)
+
+rows = []
+with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as data_dir:  # report workers may still be writing
+    for session, pse in enumerate(true_pse):
+        for mode in ("Linear", "Coarse-to-fine"):
+            np.random.seed(session)  # same trial order in both modes
+            # adaptive Phase 2 keeps the (irrelevant here) second phase short
+            g = run_session(SimulatedObserver(pse=pse, seed=session), data_dir,
+                            participant=f"sim{session:04d}{mode[0]}", adaptive=True,
+                            coarse_to_fine=mode == "Coarse-to-fine")
+            p1 = g["phase1_df"]
+            rows.append({
+                "Session": session, "Mode": mode, "TruePSE": pse,
+                "Phase1Seconds": g["phase1_end_time"] - g["phase1_start_time"],
+                "NoResponse": int(p1["ResponseKey"].isna().sum()),
+                # coarse-to-fine trials without a response in the fine sweep
+                "CoarseOnly": int((p1["ResponseRatio"] == p1["CoarseRatio"]).sum()) if "CoarseRatio" in p1 else 0,
+                "AscendingErr": g["ascending_mean_rad"] - pse,
+                "DescendingErr": g["descending_mean_rad"] - pse,
+                "OverallErr": g["overall_mean_rad"] - pse,
+            })
+
+df = pd.DataFrame(rows)
+summary = df.groupby("Mode", sort=False).agg(
+    Phase1Seconds=("Phase1Seconds", "mean"),
+    NoResponse=("NoResponse", "sum"),
+    CoarseOnly=("CoarseOnly", "sum"),
+    AscendingBias=("AscendingErr", "mean"),
+    DescendingBias=("DescendingErr", "mean"),
+    OverallBias=("OverallErr", "mean"),
+    OverallRMS=("OverallErr", lambda e: np.sqrt(np.mean(e ** 2))),
+)
+paired = df.pivot(index="Session", columns="Mode", values="OverallErr")
+diff = paired["Coarse-to-fine"] - paired["Linear"]
+saved = 1 - summary.loc["Coarse-to-fine", "Phase1Seconds"] / summary.loc["Linear", "Phase1Seconds"]
+
+print(f"{n_sessions} paired sessions, observer PSE ~ U(0.6, 1.0) rad (errors in rad)")
+print(summary.to_string(float_format=lambda v: f"{v:.4f}"))
+print(f"Phase 1 time saved: {saved * 100:.1f}%")
+print(f"overall estimate, coarse-to-fine minus linear: {diff.mean():+.4f} "
+      f"(SE {diff.std(ddof=1) / np.sqrt(len(diff)):.4f})")
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+MICRO-BENCHMARK: PER-FRAME CPU TIME OF QUARTET DRAWING
+*legacy: shared GratingStim moved and drawn twice per frame (former show_quartets)
+*batched: QuartetArray (one ElementArrayStim draw for both squares), with
+ positions indexed from a precomputed GeometryTable
+
+Only the draw calls are timed; the flip is done outside the timed region
+with waitBlanking off so the refresh rate does not mask the CPU cost.
+
+Usage: python benchmarks/bench_quartet_draw.py [n_frames]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from psychopy import visual
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from quartet_geometry import GeometryTable  # noqa: E402
+from quartet_stimuli import QuartetArray  # noqa: E402
+
+n_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+SquareSize = 1.0
+backColor = [-0.5, -0.5, -0.5]
+squareColor = np.multiply(backColor, -1)
+
+win = visual.Window(size=(800, 600), units='pix', color=backColor,
+                    fullscr=False, waitBlanking=False)
+dotFix = visual.Circle(win, autoLog=False, units='pix', radius=4,
+                       fillColor='red', lineColor='red')
+dotFix_green = visual.Circle(win, autoLog=False, units='pix', radius=4,
+                             fillColor='green', lineColor='green')
+Square = visual.GratingStim(win, autoLog=False, tex=None, units='pix',
+                            size=(40, 40), color=squareColor)
+quartets = QuartetArray(win, 40, squareColor, dotFix, dotFix_green)
+
+
+def show_quartets_legacy(Hori, Verti, pair):
+    if pair == 0:
+        Square.setPos((-Hori, Verti))
+        Square.draw()
+        Square.setPos((Hori, -Verti))
+        Square.draw()
+    else:
+        Square.setPos((Hori, Verti))
+        Square.draw()
+        Square.setPos((-Hori, -Verti))
+        Square.draw()
+    dotFix.draw()
+
+
+# one ratio per frame, radius 120 px (pix_per_deg = 1 so the table is in pixels)
+table = GeometryTable(np.tan(np.linspace(0.3, 1.2, n_frames)), 120, 40, 1.0)
+pairs = np.arange(n_frames) % 2
+frame_xys = table.frame_xys(np.arange(n_frames), pairs)
+
+
+def run(draw):
+    cost = np.empty(n_frames)
+    for frame in range(n_frames):
+        t0 = time.perf_counter()
+        draw(frame)
+        cost[frame] = time.perf_counter() - t0
+        win.flip()
+    return cost * 1e6  # us
+
+
+results = {
+    "legacy": run(lambda frame: show_quartets_legacy(table.Hori[frame], table.Verti[frame], pairs[frame])),
+    "batched": run(lambda frame: quartets.draw(frame_xys[frame])),
+}
+win.close()
+
+print(f"{n_frames} frames per implementation (draw-call CPU time, us)")
+for name, cost in results.items():
+    print(f"{name:>8}: median {np.median(cost):8.1f}  mean {cost.mean():8.1f}  "
+          f"p99 {np.percentile(cost, 99):8.1f}")
+print(f"speed-up (median): {np.median(results['legacy']) / np.median(results['batched']):.2f}x")
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK: STARTUP IMPORT COST OF THE EXPERIMENT SCRIPT
+*Runs the top-level imports of quartet_parityratio.py (read from the script)
+ and the former eager stack (+ matplotlib, seaborn, sklearn, markdown) in
+ fresh interpreters with -X importtime
+*Reports total import time (median of N runs), peak RSS, and which analysis
+ packages end up loaded before the first trial
+
+psychopy (and the quartet modules that need it) is skipped in both sets when
+it is not installed; its cost is the same either way.
+
+Usage: python benchmarks/bench_startup.py [n_runs]
+"""
+
+import ast
+import importlib.util
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'quartet_parityratio.py')
+ANALYSIS_STACK = ["matplotlib", "seaborn", "sklearn", "markdown", "scipy"]
+
+# what the script imported before the analysis stack was deferred
+LEGACY_EXTRA = ["import matplotlib.pyplot as plt", "import seaborn as sns",
+                "from sklearn.linear_model import LogisticRegression", "import markdown"]
+
+n_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+has_psychopy = importlib.util.find_spec("psychopy") is not None
+
+
+def script_imports():
+    """Top-level import statements of the experiment script, as source lines."""
+    with open(SCRIPT, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    lines = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            module = node.module if isinstance(node, ast.ImportFrom) else node.names[0].name
+            if not has_psychopy and module.split('.')[0] in ("psychopy", "quartet_stimuli", "quartet_responses", "quartet_calibration"):
+                continue
+            lines.append(ast.unparse(node))
+    return lines
+
+
+def measure(lines):
+    """(import seconds, peak RSS MB, loaded analysis packages) of one fresh interpreter."""
+    code = '\n'.join(lines + [
+        "import resource, sys",
+        "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)",
+        f"print(','.join(m for m in {ANALYSIS_STACK!r} if m in sys.modules))",
+    ])
+    env = dict(os.environ, MPLBACKEND='Agg')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+    # "import time: self [us] | cumulative | imported package"; top level = no indent
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            total_us += int(cumulative)
+    rss_kb, loaded = proc.stdout.splitlines()[-2:]
+    return total_us / 1e6, int(rss_kb) / 1024, loaded
+
+
+experiment = script_imports()
+legacy = experiment + LEGACY_EXTRA
+print(f"{n_runs} runs per set, psychopy {'included' if has_psychopy else 'not installed (skipped)'}")
+results = {}
+for label, lines in [("experiment", experiment), ("legacy", legacy)]:
+    runs = [measure(lines) for _ in range(n_runs)]
+    seconds = np.median([r[0] for r in runs])
+    rss = np.median([r[1] for r in runs])
+    results[label] = seconds
+    print(f"{label:>10}: {seconds * 1000:8.1f} ms imports, {rss:6.1f} MB peak RSS, "
+          f"analysis packages loaded: {runs[-1][2] or 'none'}")
+print(f"startup saving: {(results['legacy'] - results['experiment']) * 1000:.1f} ms "
+      f"({results['legacy'] / results['experiment']:.1f}x)")
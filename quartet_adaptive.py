@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+ADAPTIVE PHASE 2 (PSI METHOD) FOR THE QUARTET PARITY RATIO EXPERIMENT
+*Grid posterior over the PSE and the width of the psychometric function
+*Each trial shows the personalized condition (PR-3 ... PR+4) that minimizes
+ the expected posterior entropy (Kontsevich & Tyler, 1999)
+*Stops once the PSE credible interval is narrower than a target width
+
+Model (as in the simulated observer; larger angles favour horizontal motion):
+
+    P(vertical | x) = lapse / 2 + (1 - lapse) * expit(-(x - pse) / width)
+
+The stimulus set is the 8 personalized ratios, so trials keep the
+ConditionRatio labels of the constant-stimuli mode and the _p2.csv schema
+(and the Phase 2 frame cache) are unchanged. from_trials() rebuilds the
+posterior of saved trials (the analysis falls back on it when adaptive
+responses are perfectly separated). Everything is a NumPy array
+over (condition, pse, width); an update plus the next choice takes well
+under a millisecond and runs in the ITI.
+"""
+
+import numpy as np
+
+from quartet_fit import expit
+
+
+class PsiPhase2:
+    """
+    Psi-method engine over the personalized Phase 2 conditions.
+
+    labels/ratios: the condition labels and their aspect ratios.
+    prior_pse: centre (rad) of the Gaussian PSE prior, normally the Phase 1
+    estimate; prior_sd its spread. The width prior is uniform in log width.
+    """
+
+    def __init__(self, labels, ratios, prior_pse, prior_sd=0.15, pse_span=0.45, n_pse=181,
+                 width_range=(0.01, 0.3), n_width=40, lapse=0.04, ci=95):
+        self.labels = list(labels)
+        self.stim_rad = np.arctan(np.asarray(ratios, dtype=float))
+        self.pse_grid = np.linspace(prior_pse - pse_span, prior_pse + pse_span, n_pse)
+        self.width_grid = np.geomspace(width_range[0], width_range[1], n_width)
+        self.lapse = lapse
+        self.ci = ci
+
+        # P(vertical) for every (condition, pse, width)
+        eta = -(self.stim_rad[:, None, None] - self.pse_grid[None, :, None]) / self.width_grid[None, None, :]
+        self.p_vertical = lapse / 2 + (1 - lapse) * expit(eta)
+
+        prior = np.exp(-0.5 * ((self.pse_grid - prior_pse) / prior_sd) ** 2)[:, None] * np.ones(n_width)
+        self.posterior = prior / prior.sum()
+        self.n_trials = 0
+
+    @classmethod
+    def from_trials(cls, x_rad, vertical, prior_pse, **kwargs):
+        """
+        Engine whose posterior holds the given trials (angles in rad,
+        1/True = vertical). The posterior does not depend on the trial order,
+        so it equals the one the session built trial by trial.
+        """
+        stim_rad, index = np.unique(np.asarray(x_rad, dtype=float), return_inverse=True)
+        engine = cls(list(range(len(stim_rad))), np.tan(stim_rad), prior_pse, **kwargs)
+        n = np.bincount(index, minlength=len(stim_rad))
+        k = np.bincount(index, np.asarray(vertical, dtype=float), minlength=len(stim_rad))
+        log_like = (np.tensordot(k, np.log(engine.p_vertical), axes=1)
+                    + np.tensordot(n - k, np.log1p(-engine.p_vertical), axes=1))
+        posterior = engine.posterior * np.exp(log_like - log_like.max())
+        engine.posterior = posterior / posterior.sum()
+        engine.n_trials = int(n.sum())
+        return engine
+
+    # -- trial selection ------------------------------------------------------
+
+    @staticmethod
+    def _entropy(p, axes):
+        return -np.sum(np.where(p > 0, p * np.log(np.where(p > 0, p, 1.0)), 0.0), axis=axes)
+
+    def expected_entropy(self):
+        """Expected posterior entropy after one more trial at each condition."""
+        joint_v = self.p_vertical * self.posterior          # (condition, pse, width)
+        p_v = joint_v.sum(axis=(1, 2))
+        joint_h = self.posterior - joint_v
+        p_h = 1.0 - p_v
+        h_v = self._entropy(joint_v / p_v[:, None, None], (1, 2))
+        h_h = self._entropy(joint_h / p_h[:, None, None], (1, 2))
+        return p_v * h_v + p_h * h_h
+
+    def next_condition(self):
+        """Label of the most informative condition for the next trial."""
+        return self.labels[int(np.argmin(self.expected_entropy()))]
+
+    # -- update ---------------------------------------------------------------
+
+    def update(self, label, response_label):
+        """Bayes update with one response ('vertical' / 'horizontal'; None is ignored)."""
+        if response_label is None:
+            return
+        likelihood = self.p_vertical[self.labels.index(label)]
+        if response_label != "vertical":
+            likelihood = 1.0 - likelihood
+        posterior = self.posterior * likelihood
+        self.posterior = posterior / posterior.sum()
+        self.n_trials += 1
+
+    # -- estimates ------------------------------------------------------------
+
+    def pse_marginal(self):
+        return self.posterior.sum(axis=1)
+
+    def pse_mean(self):
+        """Posterior mean of the PSE (rad)."""
+        return float(self.pse_marginal() @ self.pse_grid)
+
+    def width_mean(self):
+        """Posterior mean of the width (rad)."""
+        return float(self.posterior.sum(axis=0) @ self.width_grid)
+
+    def pse_ci(self):
+        """Equal-tailed credible interval of the PSE (rad)."""
+        cdf = np.cumsum(self.pse_marginal())
+        tail = (100 - self.ci) / 200
+        lo, hi = np.interp([tail, 1 - tail], cdf, self.pse_grid)
+        return float(lo), float(hi)
+
+    def done(self, target_width, min_trials=0, max_trials=None):
+        """True once the PSE CI is narrower than target_width (rad) after min_trials."""
+        if max_trials is not None and self.n_trials >= max_trials:
+            return True
+        lo, hi = self.pse_ci()
+        return self.n_trials >= min_trials and hi - lo <= target_width
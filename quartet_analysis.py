@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+ANALYSIS AND REPORTING FOR THE QUARTET PARITY RATIO EXPERIMENT
+*Phase 1: threshold means, personalized aspect ratios, density plots
+*Phase 2: psychometric curve (logistic fit), PSE and its bootstrap CI
+*Multi-eccentricity sessions: one batched fit of PSE vs. eccentricity
+*Summary report (Markdown + HTML), re-rendered only when its content changed
+
+Used at the end of a live session and by the offline re-analysis
+(quartet_reanalysis.py); nothing here needs a window.
+
+Only NumPy/pandas are imported here, so the experiment script can import
+this module at startup. The figures and the report live in quartet_report
+(matplotlib, markdown) and the bootstrap in quartet_bootstrap;
+both are imported on first use. Report functions can still be imported
+from this module (resolved lazily by __getattr__).
+"""
+
+import importlib
+
+import numpy as np
+import pandas as pd
+
+from quartet_adaptive import PsiPhase2
+from quartet_fit import expit, fit_logistic
+
+# names served lazily from their modules (imported on first access)
+_LAZY = {
+    "plot_phase1_density": "quartet_report",
+    "plot_phase2_curves": "quartet_report",
+    "img_md": "quartet_report",
+    "write_summary": "quartet_report",
+    "plot_pse_by_eccentricity": "quartet_report",
+    "bootstrap_pse": "quartet_bootstrap",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# %% ECCENTRICITIES
+# ==============================================================================
+
+def eccentricities_of(df):
+    """Sorted eccentricities (dva) of a session's trials ([] without an Eccentricity column)."""
+    if "Eccentricity" not in df:
+        return []
+    return sorted(float(e) for e in df["Eccentricity"].dropna().unique())
+
+
+def ratio_key(eccentricity):
+    """Key of an eccentricity in a per-eccentricity ratio set (JSON-safe text)."""
+    return f"{float(eccentricity):g}"
+
+
+def is_per_eccentricity(subject_ratio):
+    """True for {eccentricity: {label: ratio}}, False for a single {label: ratio} set."""
+    return bool(subject_ratio) and all(isinstance(v, dict) for v in subject_ratio.values())
+
+
+# %% PHASE 1 (Method of Limits)
+# ==============================================================================
+
+def phase1_means(phase1_df):
+    """
+    Mean response angle (rad) of the ascending and descending sweeps and
+    their average (the Phase 1 parity-ratio estimate).
+    """
+    # Filter by 'ascending' and 'descending' bins
+    ascending_bin = phase1_df[phase1_df["RatioDir"] == "ascending"]
+    descending_bin = phase1_df[phase1_df["RatioDir"] == "descending"]
+
+    # Calculate means in angles
+    ascending_mean_rad = np.arctan(
+        ascending_bin[ascending_bin["ResponseKey"].notna()]["ResponseRatio"].astype(float)
+    ).mean()
+    descending_mean_rad = np.arctan(
+        descending_bin[descending_bin["ResponseKey"].notna()]["ResponseRatio"].astype(float)
+    ).mean()
+    overall_mean_rad = (ascending_mean_rad + descending_mean_rad) / 2
+    return ascending_mean_rad, descending_mean_rad, overall_mean_rad
+
+
+def personalized_ratios(overall_mean_rad, condition_labels, mystep_rad=0.075):
+    """
+    Personalized aspect ratios: steps of mystep_rad around the Phase 1
+    estimate (PR-3 ... PR+4). Returns (myrange_ratio, subject_ratio).
+    """
+    myrange_rad = [overall_mean_rad + i * mystep_rad for i in range(-3, 5)]
+    myrange_ratio = np.tan(myrange_rad)
+    subject_ratio = {label: value for label, value in zip(condition_labels, myrange_ratio)}
+    return myrange_ratio, subject_ratio
+
+
+def phase1_summary(phase1_df):
+    """
+    Valid Phase 1 responses (with ResponseRad) and the per-direction summary
+    table in radian and ratio. Returns (p1_data, summary_table).
+    """
+    ascending_bin = phase1_df[phase1_df["RatioDir"] == "ascending"].copy()
+    descending_bin = phase1_df[phase1_df["RatioDir"] == "descending"].copy()
+    ascending_bin["RatioDir"] = "Ascending"
+    descending_bin["RatioDir"] = "Descending"
+    combined_data = pd.concat([ascending_bin, descending_bin], ignore_index=True)
+
+    p1_data = combined_data[combined_data["ResponseKey"].notna()].copy()
+    p1_data["ResponseRatio"] = p1_data["ResponseRatio"].astype(float)
+    p1_data["ResponseRad"] = np.arctan(p1_data["ResponseRatio"])
+
+    summary_table = (
+        p1_data.groupby("RatioDir")
+        .agg(
+            MeanRad=("ResponseRad", "mean"),
+            SDRad=("ResponseRad", "std"),
+            MinRad=("ResponseRad", "min"),
+            MaxRad=("ResponseRad", "max"),
+            n=("ResponseRad", "count")
+        )
+        .reset_index()
+    )
+
+    # Add ratio versions
+    summary_table["MeanRatio"] = np.tan(summary_table["MeanRad"])
+    summary_table["SDRatio"] = np.tan(summary_table["SDRad"])
+    summary_table["MinRatio"] = np.tan(summary_table["MinRad"])
+    summary_table["MaxRatio"] = np.tan(summary_table["MaxRad"])
+    return p1_data, summary_table
+
+
+# %% PHASE 2 (Method of Constant Stimuli)
+# ==============================================================================
+
+def phase2_data(phase2_df, subject_ratio):
+    """Valid Phase 2 responses with condition angle and binary response (1 = vertical)."""
+    # Filter out invalid responses
+    p2_data = phase2_df[phase2_df["ResponseKey"].notna()].copy()
+
+    if is_per_eccentricity(subject_ratio):
+        # each eccentricity has its own personalized ratio set
+        p2_data["ConditionRat"] = [subject_ratio[ratio_key(e)][label] for e, label
+                                   in zip(p2_data["Eccentricity"], p2_data["ConditionRatio"])]
+    else:
+        p2_data["ConditionRat"] = p2_data["ConditionRatio"].map(subject_ratio)
+    p2_data["ConditionRad"] = np.arctan(p2_data["ConditionRat"].astype(float))
+    p2_data["ResponseBinary"] = (p2_data["ResponseLabel"] == "vertical").astype(int)
+    return p2_data
+
+
+def psi_estimate(p2_data, prior_pse):
+    """
+    PSE from the psi posterior of the Phase 2 trials (prior centred on the
+    Phase 1 estimate, as in the adaptive session), in the format of
+    fit_psychometric; the curve is the logistic at the posterior mean width.
+    pse_rad_ci is the 95% credible interval.
+    """
+    engine = PsiPhase2.from_trials(p2_data["ConditionRad"], p2_data["ResponseBinary"], prior_pse)
+    pse_rad = engine.pse_mean()
+    width = engine.width_mean()
+    return {"intercept": pse_rad / width, "slope": -1.0 / width, "converged": True,
+            "pse_rad": pse_rad, "pse_ratio": np.tan(pse_rad), "pse_rad_ci": engine.pse_ci(),
+            "estimate": "psi posterior"}
+
+
+def fit_psychometric(p2_data, C=1.0, prior_pse=None):
+    """
+    Logistic fit of the vertical responses on ConditionRad (same objective
+    as sklearn's LogisticRegression with L2 strength C; C=None for none).
+    Returns a dict with intercept, slope, PSE (radian and ratio), converged,
+    separated and estimate ("logistic fit").
+
+    Unpenalized fits (adaptive sessions) of perfectly separated responses
+    have no finite optimum, and their PSE is an arbitrary point between the
+    two classes: with prior_pse given, such a fit (or one that did not
+    converge) falls back to psi_estimate() (estimate "psi posterior").
+    """
+    # Model fitting
+    X = p2_data["ConditionRad"].values  # (n,) shape
+    y = p2_data["ResponseBinary"].values  # (n,) shape
+    if len(np.unique(y)) < 2:
+        raise ValueError("Phase 2 responses contain a single class; the psychometric curve cannot be fitted.")
+    fit = fit_logistic(X, y, C=C)
+    separated = bool(fit["separated"][0])
+    if C is None and prior_pse is not None and (separated or not fit["converged"][0]):
+        return dict(psi_estimate(p2_data, prior_pse), separated=separated)
+
+    # calculate the PSE
+    intercept = fit["intercept"][0]
+    slope = fit["slope"][0]
+    pse_rad = -intercept / slope
+    return {"intercept": intercept, "slope": slope, "converged": bool(fit["converged"][0]),
+            "separated": separated, "pse_rad": pse_rad, "pse_ratio": np.tan(pse_rad),
+            "estimate": "logistic fit"}
+
+
+def fit_by_eccentricity(phase1_df, p2_data, C=1.0):
+    """
+    PSE vs. eccentricity: all eccentricities fitted in one batched pass
+    (one logistic regression per eccentricity, same objective as
+    fit_psychometric). Returns a DataFrame with Eccentricity, the Phase 1
+    estimate (Phase1Rad), PSERad/PSERatio, Slope, n, Converged and Estimate.
+    With C=None, eccentricities whose fit is separated or did not converge
+    take the psi posterior PSE instead (as fit_psychometric).
+    """
+    eccentricities = eccentricities_of(p2_data)
+    groups = [p2_data[p2_data["Eccentricity"] == e] for e in eccentricities]
+    phase1_rad = [phase1_means(phase1_df[phase1_df["Eccentricity"] == e])[2] for e in eccentricities]
+    fit = fit_logistic([g["ConditionRad"].values for g in groups],
+                       [g["ResponseBinary"].values for g in groups], C=C)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pse_rad = -fit["intercept"] / fit["slope"]
+    slope, converged = fit["slope"].copy(), fit["converged"].copy()
+    estimate = np.full(len(groups), "logistic fit", dtype=object)
+    if C is None:
+        for i in np.flatnonzero(fit["separated"] | ~fit["converged"]):
+            if groups[i]["ResponseBinary"].nunique() < 2:
+                continue  # a single class: nothing to estimate
+            psi = psi_estimate(groups[i], phase1_rad[i])
+            pse_rad[i], slope[i], converged[i], estimate[i] = psi["pse_rad"], psi["slope"], True, psi["estimate"]
+    return pd.DataFrame({
+        "Eccentricity": eccentricities,
+        "Phase1Rad": phase1_rad,
+        "PSERad": pse_rad,
+        "PSERatio": np.tan(pse_rad),
+        "Slope": slope,
+        "n": [len(g) for g in groups],
+        "Converged": converged,
+        "Estimate": estimate,
+    })
+
+
+def predict_vertical(fit, x_rad):
+    """Fitted probability of a vertical response at angle(s) x_rad."""
+    return expit(fit["intercept"] + fit["slope"] * np.asarray(x_rad))
+
+
+def phase2_summary(p2_data):
+    """Percent vertical responses (± SE) per condition angle."""
+    data_summary = (
+        p2_data.groupby("ConditionRad")
+        .agg(
+            vertical_percent=("ResponseBinary", lambda x: x.mean() * 100),
+            n=("ResponseBinary", "count"),
+            se=("ResponseBinary", lambda x: x.std(ddof=1) / np.sqrt(len(x)) * 100)
+        )
+        .reset_index()
+    )
+    data_summary["ConditionRatio"] = np.tan(data_summary["ConditionRad"])
+    return data_summary
+
+
+# %% WHOLE SESSION
+# ==============================================================================
+
+def analyze_session(phase1_df, phase2_df, expInfo, baseFileName, condition_labels,
+                    mystep_rad=0.075, subject_ratio=None, render=True, n_boot=10000, seed=0, C=1.0,
+                    render_workers=None, invalidate_cache=False, bootstrap=None):
+    """
+    Run the end-of-session analysis: Phase 1 summary, personalized ratios
+    (recomputed from Phase 1 unless subject_ratio is given), Phase 2 fit,
+    PSE and its bootstrap CI (n_boot replicates, 0 to skip; a bootstrap
+    result computed before, e.g. by the live session, is used as is), and (if render)
+    the figures and summary report under baseFileName. Rendering goes through
+    the content-hash cache of quartet_artifacts: only changed or missing
+    artifacts are rendered (render_workers at once; invalidate_cache=True
+    re-renders all), and "render" holds the hits and misses.
+    Sessions with several eccentricities use one ratio set per eccentricity
+    ({ratio_key(e): {label: ratio}}); the psychometric curve then pools them,
+    and "by_eccentricity" holds the PSE of each (None otherwise).
+    C is the L2 strength of the fit (None for adaptive sessions, whose
+    trials cluster around the PSE and leave the slope to the penalty).
+    When such a fit has no finite optimum (perfectly separated responses),
+    the PSE and its CI come from the psi posterior instead: fit["estimate"]
+    and bootstrap["method"] say which was used.
+    Returns a dict of the results.
+    """
+    ascending_mean_rad, descending_mean_rad, overall_mean_rad = phase1_means(phase1_df)
+    eccentricities = eccentricities_of(phase1_df)
+    if subject_ratio is None and len(eccentricities) > 1:
+        subject_ratio = {ratio_key(e): personalized_ratios(phase1_means(phase1_df[phase1_df["Eccentricity"] == e])[2],
+                                                           condition_labels, mystep_rad)[1]
+                         for e in eccentricities}
+    elif subject_ratio is None:
+        _, subject_ratio = personalized_ratios(overall_mean_rad, condition_labels, mystep_rad)
+    p1_data, summary_table = phase1_summary(phase1_df)
+    p2_data = phase2_data(phase2_df, subject_ratio)
+    fit = fit_psychometric(p2_data, C=C, prior_pse=overall_mean_rad)
+    by_eccentricity = fit_by_eccentricity(phase1_df, p2_data, C=C) if len(eccentricities) > 1 else None
+    if fit["estimate"] == "psi posterior":
+        # resampling separated responses cannot give a CI: report the credible interval
+        bootstrap = {"method": "psi posterior", "ci": 95, "pse_rad_ci": fit["pse_rad_ci"],
+                     "pse_ratio_ci": tuple(np.tan(fit["pse_rad_ci"])), "slope_ci": (np.nan, np.nan),
+                     "n_boot": 0, "n_valid": 0}
+    elif bootstrap is None and n_boot:
+        from quartet_bootstrap import bootstrap_pse
+        bootstrap = bootstrap_pse(p2_data, n_boot=n_boot, seed=seed, C=C)
+    data_summary = phase2_summary(p2_data)
+
+    render_stats = None
+    if render:
+        # matplotlib/markdown are first imported for a cache miss
+        from quartet_artifacts import render as render_artifacts, session_artifacts
+        jobs = session_artifacts(baseFileName, expInfo, p1_data, summary_table, p2_data, data_summary, fit,
+                                 subject_ratio, bootstrap, by_eccentricity)
+        render_stats = render_artifacts(baseFileName, jobs, workers=render_workers, invalidate=invalidate_cache)
+
+    return {
+        "ascending_mean_rad": ascending_mean_rad,
+        "descending_mean_rad": descending_mean_rad,
+        "overall_mean_rad": overall_mean_rad,
+        "subject_ratio": subject_ratio,
+        "p1_data": p1_data,
+        "summary_table": summary_table,
+        "p2_data": p2_data,
+        "data_summary": data_summary,
+        "fit": fit,
+        "bootstrap": bootstrap,
+        "by_eccentricity": by_eccentricity,
+        "render": render_stats,
+    }
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+RENDER CACHE FOR THE QUARTET PARITY RATIO FIGURES AND SUMMARY
+*Each report artifact (Phase 1 density pair, Phase 2 curve pair, PSE by
+ eccentricity, Markdown/HTML summary) is keyed by a SHA-256 of exactly what
+ it shows: its trial data, the analysis results it prints and the plotting
+ parameters (dpi, RENDER_VERSION)
+*The keys are stored next to the outputs ({baseFileName}_render_cache.json);
+ an artifact whose key is unchanged and whose files all exist is skipped
+*The missing artifacts are rendered concurrently (one process each, started
+ the platform's default way; each imports the plotting stack itself)
+*render() reports hits and misses; invalidate=True re-renders everything
+
+When every artifact is a hit, matplotlib is not even imported.
+Floats are hashed rounded to FLOAT_DECIMALS, so data reloaded from a CSV
+(whose parser can differ in the last bit) keys the same as the original.
+Bump RENDER_VERSION whenever a figure or the summary layout changes, so
+existing caches are no longer trusted.
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from quartet_bootstrap import bootstrap_summary
+
+RENDER_VERSION = 2  # 2: Phase 1 densities from quartet_kde
+CACHE_SUFFIX = '_render_cache.json'
+DPI = 300
+FLOAT_DECIMALS = 10
+
+# artifact -> output suffixes (in report order)
+ARTIFACTS = {
+    "phase1_density": ['_Phase1_RadDensity.png', '_Phase1_RatDensity.png'],
+    "phase2_curves": ['_Phase2_RadCurve.png', '_Phase2_RatCurve.png'],
+    "pse_eccentricity": ['_PSE_Eccentricity.png'],
+    "summary": ['_summary.md', '_summary.html'],
+}
+
+
+# %% CONTENT KEYS
+# ==============================================================================
+
+def _feed(h, value):
+    if isinstance(value, pd.DataFrame):
+        h.update(json.dumps([str(column) for column in value.columns]).encode())
+        h.update(pd.util.hash_pandas_object(value.round(FLOAT_DECIMALS), index=False).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        _feed(h, value.to_frame())
+    elif isinstance(value, np.ndarray):
+        h.update(f"{value.dtype}{value.shape}".encode())
+        if value.dtype.kind == 'f':
+            value = np.round(value, FLOAT_DECIMALS) + 0.0  # (+ 0.0: -0.0 -> 0.0)
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value, key=str):
+            h.update(f"<{key}>".encode())
+            _feed(h, value[key])
+    elif isinstance(value, (list, tuple)):
+        h.update(b"[")
+        for item in value:
+            _feed(h, item)
+        h.update(b"]")
+    else:
+        value = value.item() if isinstance(value, np.generic) else value
+        if isinstance(value, float):
+            value = round(value, FLOAT_DECIMALS) + 0.0
+        h.update(repr(value).encode())
+    h.update(b";")
+
+
+def content_key(*parts):
+    """SHA-256 (hex) of DataFrames, arrays, dicts, lists and scalars."""
+    h = hashlib.sha256(f"render-v{RENDER_VERSION}".encode())
+    for part in parts:
+        _feed(h, part)
+    return h.hexdigest()
+
+
+# %% CACHE FILE
+# ==============================================================================
+
+class RenderCache:
+    """Content keys of the artifacts rendered under one baseFileName."""
+
+    def __init__(self, baseFileName):
+        self.baseFileName = baseFileName
+        self.path = baseFileName + CACHE_SUFFIX
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f).get("artifacts", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def fresh(self, name, key):
+        """True if the artifact was rendered from the same content and its files still exist."""
+        entry = self.entries.get(name)
+        return entry is not None and entry["key"] == key and \
+            all(os.path.isfile(self.baseFileName + suffix) for suffix in ARTIFACTS[name])
+
+    def record(self, name, key):
+        self.entries[name] = {"key": key, "rendered": time.time()}
+
+    def invalidate_all(self):
+        """Forget every key (the next render() re-renders all artifacts)."""
+        self.entries = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def save(self):
+        """Replace the cache file atomically."""
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"version": RENDER_VERSION, "artifacts": self.entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+# %% RENDERING
+# ==============================================================================
+
+def session_artifacts(baseFileName, expInfo, p1_data, summary_table, p2_data, data_summary, fit,
+                      subject_ratio, bootstrap=None, by_eccentricity=None, dpi=DPI):
+    """
+    Render jobs of one session: dicts with name, key, func (in quartet_report)
+    and args. Keys hash only the columns and values each artifact draws.
+    """
+    fit_shown = {key: fit[key] for key in ("intercept", "slope", "pse_rad", "pse_ratio")}
+    jobs = [
+        {"name": "phase1_density", "func": "plot_phase1_density",
+         "key": content_key("phase1_density", p1_data[["ResponseRad", "ResponseRatio", "RatioDir"]],
+                            summary_table, dpi),
+         "args": (p1_data, summary_table, baseFileName, dpi)},
+        {"name": "phase2_curves", "func": "plot_phase2_curves",
+         "key": content_key("phase2_curves", p2_data[["ConditionRad", "ResponseBinary"]],
+                            data_summary, fit_shown, dpi),
+         "args": (p2_data, data_summary, fit, baseFileName, dpi)},
+    ]
+    if by_eccentricity is not None:
+        jobs.append({"name": "pse_eccentricity", "func": "plot_pse_by_eccentricity",
+                     "key": content_key("pse_eccentricity", by_eccentricity, dpi),
+                     "args": (by_eccentricity, baseFileName, dpi)})
+    shown_info = {key: expInfo[key] for key in ("participant", "expName", "date")}
+    jobs.append({"name": "summary", "func": "write_summary",
+                 "key": content_key("summary", os.path.basename(baseFileName), shown_info, summary_table,
+                                    subject_ratio, fit_shown, bootstrap_summary(bootstrap), by_eccentricity),
+                 "args": (baseFileName, expInfo, summary_table, subject_ratio, fit["pse_rad"],
+                          fit["pse_ratio"], bootstrap, by_eccentricity)})
+    return jobs
+
+
+def _run(func, args):
+    # matplotlib/markdown are first imported here
+    getattr(importlib.import_module("quartet_report"), func)(*args)
+
+
+def render(baseFileName, jobs, workers=None, invalidate=False):
+    """
+    Render the jobs whose content changed (or all, with invalidate=True);
+    several at once in worker processes (workers: default one per missing
+    artifact, 1 renders in this process).
+    The keys of the artifacts that rendered are saved even when another one
+    fails (its error is raised after the others finished).
+    Returns {"hits": [...], "misses": [...], "seconds": ...}.
+    """
+    t0 = time.perf_counter()
+    cache = RenderCache(baseFileName)
+    if invalidate:
+        cache.invalidate_all()
+    fresh = [cache.fresh(job["name"], job["key"]) for job in jobs]
+    hits = [job for job, is_fresh in zip(jobs, fresh) if is_fresh]
+    misses = [job for job, is_fresh in zip(jobs, fresh) if not is_fresh]
+    workers = min(workers or len(misses), len(misses), os.cpu_count() or 1)
+    try:
+        if workers > 1:
+            # platform default start method (spawn on macOS: forking a process that
+            # holds matplotlib and BLAS threads is unsafe); workers import quartet_report
+            error = None
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for job, future in [(job, pool.submit(_run, job["func"], job["args"])) for job in misses]:
+                    try:
+                        future.result()
+                    except Exception as err:
+                        error = error or err
+                        continue
+                    cache.record(job["name"], job["key"])
+            if error is not None:
+                raise error
+        else:
+            for job in misses:
+                _run(job["func"], job["args"])
+                cache.record(job["name"], job["key"])
+    finally:
+        # keep the artifacts that did render, even if another one failed
+        if misses:
+            cache.save()
+    return {"hits": [job["name"] for job in hits], "misses": [job["name"] for job in misses],
+            "seconds": time.perf_counter() - t0}
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+BOOTSTRAP CONFIDENCE INTERVALS FOR THE PSE
+*Resamples the Phase 2 trials within each ConditionRatio
+*Fits all replicates in one batched call (quartet_fit.fit_logistic)
+*Optional split across worker processes with independent RNG streams
+
+Within a condition every trial has the same angle, so resampling its n_c
+binary responses with replacement is the same as drawing the number of
+vertical responses from Binomial(n_c, k_c / n_c). A replicate is therefore
+one row of 8 counts, and B replicates are a single (B, 8) array that is
+fitted as aggregated binomial data.
+bootstrap_summary() keeps what the report shows (no replicates), as plain
+JSON-ready values, so a CI computed once can be handed to the report worker.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from quartet_fit import fit_logistic
+
+
+SUMMARY_KEYS = ("method", "ci", "pse_rad_ci", "pse_ratio_ci", "slope_ci", "n_boot", "n_valid")
+
+
+def condition_counts(p2_data):
+    """
+    Per-condition angle (rad), number of valid trials and number of
+    vertical responses, sorted by angle. Returns (x, n, k).
+    """
+    grouped = p2_data.groupby("ConditionRad")["ResponseBinary"].agg(["count", "sum"]).sort_index()
+    return grouped.index.to_numpy(dtype=float), grouped["count"].to_numpy(), grouped["sum"].to_numpy()
+
+
+def _bootstrap_chunk(x, n, k, n_boot, seed, C):
+    """Fit n_boot replicates drawn with one RNG stream; returns the replicate fits."""
+    rng = np.random.default_rng(seed)
+    k_boot = rng.binomial(n, k / n, size=(n_boot, len(n)))
+    fit = fit_logistic(np.broadcast_to(x, k_boot.shape), k_boot / n, C=C,
+                       weights=np.broadcast_to(n, k_boot.shape))
+    return fit["intercept"], fit["slope"], fit["converged"]
+
+
+def bootstrap_pse(p2_data, n_boot=10000, ci=95, seed=0, C=1.0, workers=1):
+    """
+    Percentile bootstrap CI of the PSE (stratified by ConditionRatio).
+
+    workers > 1 splits the replicates across processes, each with its own
+    stream spawned from `seed` (np.random.SeedSequence), so results are
+    reproducible for a given (seed, workers).
+
+    Returns a dict: method ("percentile bootstrap"), pse_rad_ci, pse_ratio_ci
+    (lower, upper), slope_ci, n_boot, n_valid (converged replicates) and the
+    replicate pse_rad array.
+    """
+    x, n, k = condition_counts(p2_data)
+    streams = np.random.SeedSequence(seed).spawn(workers)
+    sizes = np.full(workers, n_boot // workers)
+    sizes[:n_boot % workers] += 1
+
+    if workers == 1:
+        parts = [_bootstrap_chunk(x, n, k, n_boot, streams[0], C)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, os.cpu_count() or 1)) as pool:
+            parts = list(pool.map(_bootstrap_chunk, [x] * workers, [n] * workers, [k] * workers,
+                                  sizes, streams, [C] * workers))
+    intercept = np.concatenate([part[0] for part in parts])
+    slope = np.concatenate([part[1] for part in parts])
+    valid = np.concatenate([part[2] for part in parts]) & (slope != 0)
+
+    pse_rad = np.full(n_boot, np.nan)
+    pse_rad[valid] = -intercept[valid] / slope[valid]
+    q = [(100 - ci) / 2, 100 - (100 - ci) / 2]
+    pse_rad_ci = tuple(float(v) for v in np.nanpercentile(pse_rad, q)) if valid.any() else (np.nan, np.nan)
+    slope_ci = tuple(float(v) for v in np.percentile(slope[valid], q)) if valid.any() else (np.nan, np.nan)
+    return {
+        "method": "percentile bootstrap",
+        "ci": ci,
+        "pse_rad_ci": pse_rad_ci,
+        "pse_ratio_ci": tuple(float(v) for v in np.tan(pse_rad_ci)),
+        "slope_ci": slope_ci,
+        "n_boot": n_boot,
+        "n_valid": int(valid.sum()),
+        "pse_rad": pse_rad,
+    }
+
+
+def bootstrap_summary(bootstrap):
+    """The CI fields of a bootstrap_pse() result (without the replicates), or None."""
+    if bootstrap is None:
+        return None
+    summary = {}
+    for key in SUMMARY_KEYS:
+        value = bootstrap[key]
+        if isinstance(value, (tuple, list)):
+            summary[key] = [float(v) for v in value]
+        else:
+            summary[key] = value if isinstance(value, str) else int(value)
+    return summary
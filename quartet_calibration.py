@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+REFRESH-RATE CALIBRATION CACHE FOR THE QUARTET PARITY RATIO EXPERIMENT
+*One JSON file of measured refresh rates, keyed by monitor preset and screen
+*A launch with a fresh cache entry only runs a short flip check (quick_frames);
+ a full measurement (full_frames) runs when the entry is missing, stale, was
+ made with another resolution or declared rate, or disagrees with the check
+*If even the full measurement is unreliable, the monitor preset's declared
+ refresh_rate is used (not a fixed guess)
+
+Cache entry: refresh_rate (Hz), interval_sd_ms, n_intervals, valid_fraction,
+declared_rate, size_px and measured (epoch seconds, plus ISO text).
+
+Measurements time consecutive win.flip() calls (waitBlanking=True) on
+core.getTime(); the rate is 1 / median interval, so occasional dropped
+frames do not bias it.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from psychopy import core
+
+CACHE_NAME = 'monitor_calibration.json'
+
+
+def cache_key(monitor, screen):
+    return f"{monitor}:{screen}"
+
+
+def load_cache(path):
+    """All cache entries ({} if there is no readable cache file)."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_cache(path, cache):
+    """Replace the cache file atomically."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def measure_refresh(win, n_frames, n_warmup=10, tolerance=0.1):
+    """
+    Time n_frames flips after n_warmup. Returns a dict with refresh_rate
+    (None if fewer than 90% of the intervals are within `tolerance` of the
+    median), interval_sd_ms, n_intervals and valid_fraction.
+    """
+    for _ in range(n_warmup):
+        win.flip()
+    times = np.empty(n_frames + 1)
+    for i in range(n_frames + 1):
+        win.flip()
+        times[i] = core.getTime()
+    intervals = np.diff(times)
+    median = float(np.median(intervals))
+    valid = np.abs(intervals - median) <= tolerance * median
+    valid_fraction = float(valid.mean())
+    return {
+        "refresh_rate": 1.0 / median if median > 0 and valid_fraction >= 0.9 else None,
+        "interval_sd_ms": float(intervals[valid].std() * 1000) if valid.any() else None,
+        "n_intervals": int(n_frames),
+        "valid_fraction": valid_fraction,
+    }
+
+
+def calibrate(win, monitor, monInfo, path, max_age_days=7, quick_frames=30, full_frames=240,
+              rel_tol=0.01):
+    """
+    Refresh rate for this monitor preset, from the cache when a short check
+    agrees with it (within rel_tol), otherwise from a full measurement that
+    replaces the cache entry.
+
+    Returns a dict: refresh_rate, source ('cache', 'measured' or 'declared'),
+    declared_rate, check_rate (the short check, None if skipped or
+    unreliable), interval_sd_ms, reason (why a full measurement ran) and the
+    cache entry used (None for 'declared').
+    """
+    declared = float(monInfo["refresh_rate"])
+    key = cache_key(monitor, monInfo["screen"])
+    cache = load_cache(path)
+    entry = cache.get(key)
+    result = {"declared_rate": declared, "check_rate": None}
+
+    if entry is None:
+        reason = "no cache entry"
+    elif time.time() - entry["measured"] > max_age_days * 86400:
+        reason = f"cache entry older than {max_age_days} days"
+    elif list(entry["size_px"]) != list(monInfo["size_px"]) or entry["declared_rate"] != declared:
+        reason = "monitor preset changed"
+    else:
+        check = measure_refresh(win, quick_frames)
+        result["check_rate"] = check["refresh_rate"]
+        if check["refresh_rate"] is not None and \
+                abs(check["refresh_rate"] - entry["refresh_rate"]) <= rel_tol * entry["refresh_rate"]:
+            result.update(refresh_rate=entry["refresh_rate"], source="cache",
+                          interval_sd_ms=entry["interval_sd_ms"], reason=None, entry=entry)
+            return result
+        reason = "quick check disagrees with the cache" if check["refresh_rate"] is not None \
+            else "quick check unreliable"
+
+    full = measure_refresh(win, full_frames)
+    if full["refresh_rate"] is None:
+        result.update(refresh_rate=declared, source="declared",
+                      interval_sd_ms=full["interval_sd_ms"], reason=reason, entry=None)
+        return result
+    entry = dict(full, declared_rate=declared, size_px=list(monInfo["size_px"]),
+                 measured=time.time(), measured_iso=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    cache[key] = entry
+    save_cache(path, cache)
+    result.update(refresh_rate=entry["refresh_rate"], source="measured",
+                  interval_sd_ms=entry["interval_sd_ms"], reason=reason, entry=entry)
+    return result
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+SESSION CATALOG FOR THE QUARTET PARITY RATIO EXPERIMENT
+*One SQLite file indexing every session under {participant}_SubjData/{expName}/Output:
+ participant, sub_id, date, monitor, refresh rate, modes, trial counts,
+ Phase 1 means and PSE (plus PSE by eccentricity), one row per session
+*scan(): incremental; a session is re-indexed only when the mtime or size
+ of one of its files (phase data, columnar copies, journal, log) changed,
+ and sessions whose files are gone are dropped
+*query(): group questions answered from the catalog alone, without loading
+ trial-level data
+
+Session settings come from the columnar metadata when present, else from the
+journal header and the first lines of the .log. The PSE is the point
+estimate of the session analysis (no bootstrap CI, no figures); a session
+that fails to index is kept with status 'error' and retried once its files change.
+
+Usage:
+    python quartet_catalog.py scan ROOT [ROOT ...] [--db PATH]
+    python quartet_catalog.py query "monitor = 'Scanner' AND started >= '2026-10-01'" [--db PATH]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from quartet_reanalysis import (EXP_NAME, CONDITION_LABELS, find_sessions, load_session,
+                                session_subject_ratio)
+
+DB_NAME = 'session_catalog.sqlite'
+SCHEMA_VERSION = 1
+
+SESSION_COLUMNS = {
+    "session": "TEXT PRIMARY KEY",  # {participant}_{expName}_{date}
+    "root": "TEXT", "base_path": "TEXT",
+    "participant": "TEXT", "sub_id": "TEXT", "exp_name": "TEXT",
+    "date": "TEXT", "started": "TEXT",  # ISO 8601, from the session date
+    "monitor": "TEXT", "refresh_rate": "REAL",
+    "phase1_mode": "TEXT", "phase2_mode": "TEXT", "motion": "TEXT", "eccentricities": "TEXT",
+    "p1_trials": "INTEGER", "p1_valid": "INTEGER", "p2_trials": "INTEGER", "p2_valid": "INTEGER",
+    "ascending_mean_rad": "REAL", "descending_mean_rad": "REAL", "overall_mean_rad": "REAL",
+    "pse_rad": "REAL", "pse_ratio": "REAL", "slope": "REAL", "converged": "INTEGER",
+    "status": "TEXT", "error": "TEXT",
+    "fingerprint": "TEXT", "indexed": "REAL",
+}
+ECCENTRICITY_COLUMNS = {
+    "session": "TEXT REFERENCES sessions(session) ON DELETE CASCADE",
+    "eccentricity": "REAL", "phase1_rad": "REAL", "pse_rad": "REAL", "pse_ratio": "REAL",
+    "slope": "REAL", "n": "INTEGER", "converged": "INTEGER",
+}
+# table -> (default query columns, row order)
+QUERY_DEFAULTS = {
+    "sessions": ("participant, date, monitor, refresh_rate, overall_mean_rad, pse_rad, pse_ratio, status",
+                 "participant, date"),
+    "eccentricities": ("*", "session, eccentricity"),
+}
+
+
+# %% DATABASE
+# ==============================================================================
+
+def connect(path=DB_NAME):
+    """Open (and create if needed) the catalog database."""
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA foreign_keys = ON")
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute(f"CREATE TABLE IF NOT EXISTS sessions "
+               f"({', '.join(f'{name} {kind}' for name, kind in SESSION_COLUMNS.items())})")
+    db.execute(f"CREATE TABLE IF NOT EXISTS eccentricities "
+               f"({', '.join(f'{name} {kind}' for name, kind in ECCENTRICITY_COLUMNS.items())}, "
+               f"PRIMARY KEY (session, eccentricity))")
+    for column in ("participant", "monitor", "started"):
+        db.execute(f"CREATE INDEX IF NOT EXISTS sessions_{column} ON sessions ({column})")
+    db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return db
+
+
+def session_files(session):
+    """Files whose changes invalidate a session's catalog row (existing ones only)."""
+    paths = [session["p1_path"], session["p2_path"], session["journal_path"], session["log_path"]]
+    paths += session.get("columnar_paths") or []
+    return [path for path in paths if os.path.isfile(path)]
+
+
+def fingerprint(session):
+    """(name, mtime_ns, size) of every session file, as JSON text."""
+    stats = [(os.path.basename(path), os.stat(path)) for path in session_files(session)]
+    return json.dumps([[name, st.st_mtime_ns, st.st_size] for name, st in stats])
+
+
+# %% SESSION ROW
+# ==============================================================================
+
+def _journal_expInfo(path):
+    # the session header is the first record; the trials after it are not read
+    try:
+        with open(path, encoding='utf-8') as f:
+            header = json.loads(f.readline())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return header.get("expInfo", {}) if header.get("type") == "session" else {}
+
+
+def _log_header(path, max_lines=40):
+    # "Monitor: X" and "RefreshRate=60.0" are written before the first trial
+    found = {}
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for _, line in zip(range(max_lines), f):
+                if line.startswith("Monitor: "):
+                    found.setdefault("monitor", line[len("Monitor: "):].strip())
+                elif line.startswith("RefreshRate="):
+                    found["refresh_rate"] = float(line.split("=", 1)[1])
+    except FileNotFoundError:
+        pass
+    return found
+
+
+def started_iso(date):
+    """ISO time of a session date ('2026-10-17_14h05.31...'), or None."""
+    try:
+        return datetime.strptime(date[:19], '%Y-%m-%d_%Hh%M.%S').isoformat()
+    except ValueError:
+        return None
+
+
+def index_session(session):
+    """
+    Catalog row (dict) and eccentricity rows of one session; never raises
+    (a failure is recorded in status/error).
+    """
+    from quartet_analysis import (phase1_means, phase2_data, fit_psychometric, fit_by_eccentricity,
+                                  eccentricities_of)
+
+    row = {"session": os.path.basename(session["baseFileName"]), "base_path": session["baseFileName"],
+           "participant": session["participant"], "exp_name": session["expName"],
+           "date": session["date"], "started": started_iso(session["date"]),
+           "indexed": time.time()}
+    by_eccentricity = []
+    try:
+        phase1_df, phase2_df, metadata = load_session(session)
+        expInfo = metadata.get("expInfo") or _journal_expInfo(session["journal_path"])
+        log = _log_header(session["log_path"])
+        subject_ratio = metadata.get("subject_ratio") or session_subject_ratio(phase2_df, CONDITION_LABELS)
+        C = None if expInfo.get("phase2_mode") == "Adaptive" else 1.0
+        p2_data = phase2_data(phase2_df, subject_ratio)
+        ascending, descending, overall = phase1_means(phase1_df)
+        fit = fit_psychometric(p2_data, C=C, prior_pse=overall)
+        eccentricities = eccentricities_of(phase1_df) if "Eccentricity" in phase1_df else []
+        row.update({
+            "sub_id": expInfo.get("sub_id"),
+            "monitor": expInfo.get("monitor") or log.get("monitor"),
+            "refresh_rate": metadata.get("refr_rate") or log.get("refresh_rate"),
+            "phase1_mode": expInfo.get("phase1_mode", "Linear"),
+            "phase2_mode": expInfo.get("phase2_mode", "Constant"),
+            "motion": expInfo.get("motion", "Apparent"),
+            "eccentricities": ",".join(f"{e:g}" for e in eccentricities),
+            "p1_trials": len(phase1_df), "p1_valid": int(phase1_df["ResponseKey"].notna().sum()),
+            "p2_trials": len(phase2_df), "p2_valid": len(p2_data),
+            "ascending_mean_rad": ascending, "descending_mean_rad": descending, "overall_mean_rad": overall,
+            "pse_rad": fit["pse_rad"], "pse_ratio": fit["pse_ratio"], "slope": fit["slope"],
+            "converged": int(fit["converged"]),
+            "status": "ok", "error": None,
+        })
+        if len(eccentricities) > 1:
+            table = fit_by_eccentricity(phase1_df, p2_data, C=C)
+            by_eccentricity = [(row["session"], r.Eccentricity, r.Phase1Rad, r.PSERad, r.PSERatio,
+                                r.Slope, int(r.n), int(r.Converged)) for r in table.itertuples()]
+    except Exception as err:
+        row.update({"status": "error", "error": f"{type(err).__name__}: {err}"})
+    return row, by_eccentricity
+
+
+# %% SCAN AND QUERY
+# ==============================================================================
+
+def scan(db, roots, expName=EXP_NAME, progress=False):
+    """
+    Bring the catalog up to date with the sessions under roots. Only new
+    and changed sessions are read. Returns counts: sessions, indexed,
+    unchanged, removed, failed.
+    """
+    known = {row["session"]: row["fingerprint"] for row in db.execute(
+        "SELECT session, fingerprint FROM sessions WHERE root IN (%s)" % ",".join("?" * len(roots)),
+        [os.path.abspath(root) for root in roots])}
+    counts = {"sessions": 0, "indexed": 0, "unchanged": 0, "removed": 0, "failed": 0}
+    seen = set()
+    for root in roots:
+        for session in find_sessions([root], expName):
+            counts["sessions"] += 1
+            name = os.path.basename(session["baseFileName"])
+            seen.add(name)
+            files = fingerprint(session)
+            if known.get(name) == files:
+                counts["unchanged"] += 1
+                continue
+            row, by_eccentricity = index_session(session)
+            row.update(root=os.path.abspath(root), fingerprint=files)
+            row = {key: row.get(key) for key in SESSION_COLUMNS}
+            with db:
+                db.execute("DELETE FROM sessions WHERE session = ?", (name,))
+                db.execute(f"INSERT INTO sessions ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                           list(row.values()))
+                db.executemany(f"INSERT INTO eccentricities VALUES ({', '.join('?' * len(ECCENTRICITY_COLUMNS))})",
+                               by_eccentricity)
+            counts["indexed"] += 1
+            counts["failed"] += row["status"] != "ok"
+            if progress:
+                print(f"\r{counts['indexed']} indexed", end='', file=sys.stderr)
+    if progress and counts["indexed"]:
+        print(file=sys.stderr)
+    gone = [name for name in known if name not in seen]
+    with db:
+        db.executemany("DELETE FROM sessions WHERE session = ?", [(name,) for name in gone])
+    counts["removed"] = len(gone)
+    return counts
+
+
+def query(db, where="1", params=(), columns="*", table="sessions"):
+    """
+    Catalog rows matching an SQL condition, as a list of dicts (sessions by
+    participant and date, eccentricities by session and eccentricity).
+    """
+    sql = f"SELECT {columns} FROM {table} WHERE {where} ORDER BY {QUERY_DEFAULTS[table][1]}"
+    return [dict(row) for row in db.execute(sql, params)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index sessions in a SQLite catalog and query it.")
+    parser.add_argument('--db', default=DB_NAME, help="catalog file (SQLite)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    scan_parser = commands.add_parser('scan', help="index new and changed sessions")
+    scan_parser.add_argument('roots', nargs='+', help="folders holding {participant}_SubjData")
+    scan_parser.add_argument('--exp-name', default=EXP_NAME)
+    query_parser = commands.add_parser('query', help="print the sessions matching an SQL condition")
+    query_parser.add_argument('where', nargs='?', default="1", help="e.g. \"monitor = 'Scanner'\"")
+    query_parser.add_argument('--columns', default=None,
+                              help="default: a summary of each session, or all columns of eccentricities")
+    query_parser.add_argument('--table', default="sessions", choices=list(QUERY_DEFAULTS))
+    args = parser.parse_args(argv)
+
+    db = connect(args.db)
+    t0 = time.perf_counter()
+    if args.command == 'scan':
+        counts = scan(db, args.roots, args.exp_name, progress=True)
+        print(f"{counts['sessions']} sessions: {counts['indexed']} indexed ({counts['failed']} failed), "
+              f"{counts['unchanged']} unchanged, {counts['removed']} removed "
+              f"in {time.perf_counter() - t0:.2f} s -> {args.db}")
+    else:
+        rows = query(db, args.where, columns=args.columns or QUERY_DEFAULTS[args.table][0], table=args.table)
+        elapsed = time.perf_counter() - t0
+        if rows:
+            print("\t".join(rows[0]))
+        for row in rows:
+            print("\t".join("" if value is None else f"{value:.4f}" if isinstance(value, float) else str(value)
+                            for value in row.values()))
+        print(f"{len(rows)} {'sessions' if args.table == 'sessions' else 'rows'} in {elapsed * 1000:.1f} ms",
+              file=sys.stderr)
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
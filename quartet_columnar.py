@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+COLUMNAR SESSION OUTPUT FOR THE QUARTET PARITY RATIO EXPERIMENT
+*write_phase(): one phase DataFrame as a typed Arrow file next to its CSV,
+ with a fixed schema per phase (categoricals for the string columns, NaN for
+ a missing response) and the session metadata embedded in the file
+*read_phase(): loads it memory-mapped; the numeric columns are zero-copy
+ views of the mapped file, so no text parsing or dtype coercion on reload
+*read_metadata(): the embedded metadata alone (expInfo, subject_ratio,
+ refr_rate, ...), without reading any column
+*read_phase_frame(): a phase DataFrame from its CSV or columnar file
+
+Formats (by file extension):
+    .feather  Arrow IPC, uncompressed (default; memory-mappable)
+    .parquet  smaller on disk, but decoded (copied) on every read
+
+The schema columns are always present and in schema order (a column the
+session did not record is all missing, e.g. CoarseRatio of a linear Phase 1);
+columns outside the schema are kept after them with their inferred type.
+
+pyarrow is optional: without it HAVE_PYARROW is False and the CSVs remain the
+only output. It is imported on first use, not when the experiment starts.
+"""
+
+import importlib.util
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+SCHEMA_VERSION = 1
+METADATA_KEY = b'quartet'
+COLUMNAR_SUFFIX = '.feather'
+CONDITION_LABELS = ["PR-3", "PR-2", "PR-1", "PR", "PR+1", "PR+2", "PR+3", "PR+4"]
+
+_SHARED = {
+    "Run": "int32", "Trial": "int32", "Duration": "float64", "RespDelay": "float64",
+    "FeedbackTime": "float64", "ITI": "float64",
+    "QuartetOrder": ["left_tilted", "right_tilted"],
+    "Motion": ["apparent", "physical"],
+    "Eccentricity": "float64", "ResponseTime": "float64",
+}
+# column -> "int32"/"float64", "Int32" (nullable), or a list of categories
+SCHEMAS = {
+    "phase1": dict(_SHARED, **{
+        "RatioDir": ["ascending", "descending"],
+        "ResponseKey": ["space"],
+        "ResponseFlip": "Int32",
+        "ResponseRatio": "float64",
+        "CoarseRatio": "float64",
+    }),
+    "phase2": dict(_SHARED, **{
+        "Duration_F1": "float64", "ReportTime": "float64", "Cycle": "int32",
+        "ConditionRatio": CONDITION_LABELS,
+        "trial_ratio": "float64",
+        "ResponseKey": ["v", "h"],
+        "ResponseLabel": ["vertical", "horizontal"],
+    }),
+}
+
+
+def phase_schema(phase, condition_labels=None):
+    """Column types of one phase ("phase1" or "phase2")."""
+    schema = dict(SCHEMAS[phase])
+    if condition_labels is not None and "ConditionRatio" in schema:
+        schema["ConditionRatio"] = list(condition_labels)
+    return schema
+
+
+def typed_frame(df, phase, condition_labels=None):
+    """
+    The phase DataFrame coerced to the fixed schema (a CSV reload or the
+    in-memory trial list). Values outside a column's categories are an error.
+    """
+    schema = phase_schema(phase, condition_labels)
+    columns = {}
+    for name, kind in schema.items():
+        values = df[name] if name in df else pd.Series(np.nan, index=df.index)
+        if isinstance(kind, list):
+            cat = pd.Categorical(values.where(values.notna(), None), categories=kind)
+            unknown = values.notna().to_numpy() & (cat.codes == -1)
+            if unknown.any():
+                raise ValueError(f"{phase}.{name}: values outside the schema: "
+                                 f"{sorted(set(values[unknown].astype(str)))}")
+            columns[name] = cat
+        elif kind == "Int32":
+            columns[name] = pd.to_numeric(values).astype("Int32")
+        else:
+            columns[name] = pd.to_numeric(values).astype(kind)
+    typed = pd.DataFrame(columns, index=df.index)
+    extra = [name for name in df.columns if name not in schema]
+    return pd.concat([typed, df[extra]], axis=1).reset_index(drop=True) if extra else typed.reset_index(drop=True)
+
+
+def _arrow():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    return pa, pq
+
+
+def _arrow_column(series):
+    pa, _ = _arrow()
+    # floats as plain arrays (NaN, no validity bitmap) so they stay zero-copy on read
+    if series.dtype == np.float64 or series.dtype == np.int32:
+        return pa.array(series.to_numpy())
+    return pa.array(series, from_pandas=True)
+
+
+def write_phase(df, path, phase, metadata=None, condition_labels=None):
+    """
+    Write one phase as a typed Arrow file (.feather or .parquet by extension)
+    with `metadata` (JSON-ready: expInfo, subject_ratio, refr_rate, ...)
+    embedded. Returns the typed DataFrame.
+    """
+    pa, pq = _arrow()
+    typed = typed_frame(df, phase, condition_labels)
+    meta = dict(metadata or {}, phase=phase, schema_version=SCHEMA_VERSION)
+    table = pa.table([_arrow_column(typed[name]) for name in typed.columns], names=list(typed.columns))
+    table = table.replace_schema_metadata({METADATA_KEY: json.dumps(meta, default=float).encode()})
+    tmp = path + '.tmp'
+    if path.endswith('.parquet'):
+        pq.write_table(table, tmp)
+    else:
+        with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+    return typed
+
+
+def _metadata(schema):
+    return json.loads(schema.metadata[METADATA_KEY]) if schema.metadata and METADATA_KEY in schema.metadata else {}
+
+
+def read_metadata(path):
+    """Metadata embedded in a phase file (no column data is read)."""
+    pa, pq = _arrow()
+    if path.endswith('.parquet'):
+        return _metadata(pq.read_schema(path))
+    with pa.memory_map(path) as source:
+        return _metadata(pa.ipc.open_file(source).schema)
+
+
+def read_phase(path, columns=None, memory_map=True):
+    """
+    Load one phase file: returns (DataFrame, metadata).
+
+    Feather files are memory-mapped (memory_map=True): the numeric columns of
+    the DataFrame are views of the mapped pages, read only when touched.
+    The file itself is closed before returning; the mapping is released with
+    the DataFrame (and any view of it). On Windows a mapped file cannot be
+    replaced meanwhile: pass memory_map=False to read the columns into memory.
+    """
+    pa, pq = _arrow()
+    if path.endswith('.parquet'):
+        table = pq.read_table(path, columns=columns, memory_map=memory_map)
+    else:
+        with pa.memory_map(path) if memory_map else pa.OSFile(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+    df, metadata = table.to_pandas(split_blocks=True), _metadata(table.schema)
+    # nullable integers come back as plain ints when the session had no missing value
+    for name, kind in SCHEMAS.get(metadata.get("phase"), {}).items():
+        if kind == "Int32" and name in df:
+            df[name] = df[name].astype("Int32")
+    return df, metadata
+
+
+def read_phase_frame(path):
+    """A phase DataFrame from a _p1/_p2 file of any format (.csv, .feather, .parquet)."""
+    if path.endswith('.csv'):
+        return pd.read_csv(path)
+    return read_phase(path)[0]
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+QUARTET GEOMETRY FOR THE QUARTET PARITY RATIO EXPERIMENT
+*ratio2dist: Hori/Verti distances on the iso-eccentric circle
+*Geometry table: ratios, angles, distances and pixel positions precomputed once
+*Trajectory table: per-frame square positions of the physical-motion glides
+
+Only NumPy is needed here, so the analysis code can use the same tables
+without a window.
+"""
+
+import numpy as np
+
+
+# sign of (Hori, Verti) for each square of a pair
+# pair 0: left-tilted (upper-left, lower-right); pair 1: right-tilted (upper-right, lower-left)
+PAIR_SIGNS = np.array([
+    [[-1, 1], [1, -1]],
+    [[1, 1], [-1, -1]],
+])
+
+
+# %% DISTANCES
+# ==============================================================================
+
+# Calculate the Hori/Verti distances
+def ratio2dist(ratio, radius):
+    """
+    Calculate the horizontal (Hori) and vertical (Verti) distances
+    for a point on a circle given the radius and a ratio.
+    Works element-wise on arrays of ratios.
+    """
+    angle = np.arctan(ratio)  # Ratio to Angle in radians
+    Hori = radius * np.cos(angle)  # Horizontal distance
+    Verti = radius * np.sin(angle)  # Vertical distance
+    return Hori, Verti
+
+
+def quartet_xys(Hori, Verti, pair):
+    """
+    Positions of the two squares of a pair, shape (2, 2).
+    """
+    if pair != 0 and pair != 1:
+        raise ValueError("Invalid value for pair. Use 0 for left-tilted or 1 for right-tilted.")
+    return PAIR_SIGNS[pair] * (Hori, Verti)
+
+
+# %% GEOMETRY TABLE
+# ==============================================================================
+
+class GeometryTable:
+    """
+    Precomputed geometry for a fixed list of ratios on one monitor.
+
+    Arrays (one row per ratio index):
+      ratio, rad         aspect ratio and its angle (arctan)
+      Hori, Verti        distances in deg
+      xys_pix            square positions in pixels, shape (n, pair, square, xy)
+    """
+
+    def __init__(self, ratios, radius, square_size, pix_per_deg):
+        self.ratio = np.asarray(ratios, dtype=float)
+        self.rad = np.arctan(self.ratio)
+        self.Hori, self.Verti = ratio2dist(self.ratio, radius)
+        self.radius = radius
+        self.pix_per_deg = pix_per_deg
+        self.square_pix = square_size * pix_per_deg
+        dist_pix = np.stack([self.Hori, self.Verti], axis=-1) * pix_per_deg
+        self.xys_pix = PAIR_SIGNS[np.newaxis] * dist_pix[:, np.newaxis, np.newaxis, :]
+
+    @classmethod
+    def from_monitor(cls, ratios, radius, square_size, monitor):
+        """Build the table for a psychopy Monitor (deg -> pix as in units='deg')."""
+        from psychopy.tools.monitorunittools import deg2pix
+        return cls(ratios, radius, square_size, deg2pix(1.0, monitor))
+
+    def __len__(self):
+        return len(self.ratio)
+
+    def ratio_at(self, index):
+        """Ratio(s) of the given index/indices."""
+        return self.ratio[index]
+
+    def index_of(self, ratios):
+        """Index of the table entry closest (in angle) to each ratio."""
+        rad = np.arctan(np.asarray(ratios, dtype=float))
+        if len(self) == 1:
+            return np.zeros(rad.shape, dtype=int)
+        order = np.argsort(self.rad)
+        pos = np.clip(np.searchsorted(self.rad[order], rad), 1, len(self) - 1)
+        left, right = order[pos - 1], order[pos]
+        return np.where(np.abs(rad - self.rad[left]) <= np.abs(rad - self.rad[right]), left, right)
+
+    def frame_xys(self, index, pair):
+        """Pixel positions for per-frame index and pair arrays, shape (frames, 2, 2)."""
+        return self.xys_pix[index, pair]
+
+
+# %% TRAJECTORY TABLE
+# ==============================================================================
+
+class TrajectoryTable:
+    """
+    Precomputed physical-motion trajectories for a GeometryTable.
+
+    For every ratio and destination pair, the square positions (pixels) on
+    each frame of a glide from the other pair's positions:
+      xys_pix            shape (n, pair, frames, square, xy)
+
+    The squares move along the shorter side of the quartet (vertically when
+    Verti < Hori, else horizontally), i.e. in the direction proximity favours
+    in apparent motion. path 'arc' keeps them on the iso-eccentric circle,
+    'linear' moves them in a straight line. phases holds the glide progress
+    on each frame (0 < phase <= 1, the last frame reaching the new pair).
+    """
+
+    def __init__(self, table, phases, path='arc'):
+        self.table = table
+        self.phases = np.asarray(phases, dtype=float)
+        self.path = path
+        self.vertical = table.Verti < table.Hori  # motion axis of each ratio
+
+        # start: the other pair's positions; end: the destination square of each
+        # start square (same x for vertical motion, same y for horizontal motion)
+        start = table.xys_pix[:, ::-1]
+        end = table.xys_pix.copy()
+        end[self.vertical] = end[self.vertical][:, :, ::-1]
+        if path == 'linear':
+            p = self.phases[np.newaxis, np.newaxis, :, np.newaxis, np.newaxis]
+            self.xys_pix = start[:, :, np.newaxis] + (end - start)[:, :, np.newaxis] * p
+        elif path == 'arc':
+            a0 = np.arctan2(start[..., 1], start[..., 0])
+            turn = np.angle(np.exp(1j * (np.arctan2(end[..., 1], end[..., 0]) - a0)))  # shorter arc
+            angle = a0[:, :, np.newaxis] + turn[:, :, np.newaxis] * self.phases[:, np.newaxis]
+            r = np.hypot(start[..., 0], start[..., 1])[:, :, np.newaxis]
+            self.xys_pix = np.stack([r * np.cos(angle), r * np.sin(angle)], axis=-1)
+        else:
+            raise ValueError("Invalid path. Use 'arc' or 'linear'.")
+
+    def __len__(self):
+        return len(self.phases)
+
+    def memory_bytes(self):
+        return self.xys_pix.nbytes
+
+    def frame_xys(self, index, pair, interval, tick):
+        """
+        Pixel positions, shape (frames, 2, 2), for per-frame ratio index, pair,
+        interval and tick (frames since the interval start) arrays. The first
+        interval shows its pair at rest; every later one glides in from the
+        previous pair and holds once the glide is over.
+        """
+        xys = self.table.xys_pix[index, pair]
+        glide = interval > 0
+        step = np.minimum(tick, len(self.phases) - 1)
+        xys[glide] = self.xys_pix[index[glide], pair[glide], step[glide]]
+        return xys
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+HIERARCHICAL GROUP PSYCHOMETRIC MODEL FOR THE QUARTET PARITY RATIO EXPERIMENT
+*Partially pooled logistic model of the stacked Phase 2 data of many
+ subjects: per-subject PSE and slope, shrunk toward the group distribution
+*Laplace-EM: the E-step finds every subject's posterior mode and curvature
+ at once (batched 2x2 Fisher scoring on padded arrays), the M-step updates
+ the group mean and covariance; cost is linear in the number of subjects
+*load_group(): stacks the Phase 2 data of saved sessions (CSV or columnar,
+ as the per-session analysis writes them), keyed by participant
+*load_group_phase1(): the same for the Phase 1 responses; --density draws
+ them as a group overlay (one density per subject and direction)
+
+Model, for trial i of subject j (x = condition angle in rad, y = vertical):
+
+    P(y = 1) = expit(slope_j * (x - pse_j))
+    (pse_j, slope_j) ~ N(mu, Sigma)
+
+Trials are aggregated to binomial counts per subject and angle first, so
+the arrays are (subjects, distinct angles) whatever the trial count.
+Subject uncertainties (PSESD, SlopeSD) are the Laplace posterior SDs.
+Sigma has a weak inverse-Wishart prior (prior_df pseudo-subjects with SDs
+prior_sd): negligible with many subjects, it keeps Sigma from collapsing
+onto a line when there are only a few short sessions.
+
+Usage: python quartet_group.py ROOT [ROOT ...] [--out group_fit.csv] [--eccentricity DVA] [--density PREFIX]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from quartet_fit import expit, fit_logistic
+
+
+# %% DATA
+# ==============================================================================
+
+def group_arrays(data, subject="Subject", x="ConditionRad", y="ResponseBinary"):
+    """
+    Stacked trial data -> (subjects, X, Y, W): binomial counts per subject
+    and angle in padded (J, K) arrays (Y = proportion vertical, W = trials,
+    0 on padding).
+    """
+    counts = data.groupby([subject, x], sort=True)[y].agg(["size", "sum"]).reset_index()
+    codes, subjects = pd.factorize(counts[subject], sort=True)
+    position = counts.groupby(subject).cumcount().to_numpy()
+    shape = (len(subjects), position.max() + 1 if len(position) else 0)
+    X, Y, W = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    X[codes, position] = counts[x].to_numpy(dtype=float)
+    W[codes, position] = counts["size"].to_numpy(dtype=float)
+    Y[codes, position] = counts["sum"].to_numpy(dtype=float) / W[codes, position]
+    return np.asarray(subjects), X, Y, W
+
+
+def load_group(sessions, subject_key="participant", eccentricity=None):
+    """
+    Valid Phase 2 trials of saved sessions (from find_sessions), stacked
+    with a Subject column (sessions of one participant are pooled).
+    Sessions that cannot be read are skipped and returned as (name, error).
+    """
+    from quartet_analysis import phase2_data
+    from quartet_reanalysis import load_session, session_subject_ratio
+
+    frames, failed = [], []
+    for session in sessions:
+        try:
+            _, phase2_df, metadata = load_session(session)
+            subject_ratio = metadata.get("subject_ratio") or session_subject_ratio(phase2_df)
+            p2_data = phase2_data(phase2_df, subject_ratio)
+            if eccentricity is not None:
+                p2_data = p2_data[np.isclose(p2_data["Eccentricity"], eccentricity)]
+        except Exception as err:
+            failed.append((os.path.basename(session["baseFileName"]), f"{type(err).__name__}: {err}"))
+            continue
+        frames.append(pd.DataFrame({"Subject": session[subject_key],
+                                    "ConditionRad": p2_data["ConditionRad"].to_numpy(),
+                                    "ResponseBinary": p2_data["ResponseBinary"].to_numpy()}))
+    data = pd.concat(frames, ignore_index=True) if frames else \
+        pd.DataFrame(columns=["Subject", "ConditionRad", "ResponseBinary"])
+    return data, failed
+
+
+def load_group_phase1(sessions, subject_key="participant", eccentricity=None):
+    """
+    Valid Phase 1 responses of saved sessions (RatioDir, ResponseRad,
+    ResponseRatio), stacked with a Subject column like load_group().
+    """
+    from quartet_analysis import phase1_summary
+    from quartet_reanalysis import load_session
+
+    columns = ["RatioDir", "ResponseRad", "ResponseRatio"]
+    frames, failed = [], []
+    for session in sessions:
+        try:
+            phase1_df, _, _ = load_session(session)
+            if eccentricity is not None:
+                phase1_df = phase1_df[np.isclose(phase1_df["Eccentricity"], eccentricity)]
+            p1_data, _ = phase1_summary(phase1_df)
+        except Exception as err:
+            failed.append((os.path.basename(session["baseFileName"]), f"{type(err).__name__}: {err}"))
+            continue
+        frames.append(p1_data[columns].assign(Subject=session[subject_key]))
+    data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["Subject"] + columns)
+    return data, failed
+
+
+# %% MODEL
+# ==============================================================================
+
+def _neg_log_posterior(pse, slope, X, Y, W, mu, P):
+    eta = slope[:, None] * (X - pse[:, None])
+    d0, d1 = pse - mu[0], slope - mu[1]
+    prior = 0.5 * (P[0, 0] * d0 ** 2 + 2 * P[0, 1] * d0 * d1 + P[1, 1] * d1 ** 2)
+    return (W * (np.logaddexp(0.0, eta) - Y * eta)).sum(axis=1) + prior
+
+
+def posterior_modes(pse, slope, X, Y, W, mu, Sigma, max_iter=100, tol=1e-9):
+    """
+    Every subject's posterior mode of (pse, slope) under the N(mu, Sigma)
+    prior, by batched Fisher scoring with step halving (warm start from
+    pse, slope). Returns pse, slope, the (J, 2, 2) posterior covariances
+    (inverse curvature at the mode) and converged.
+    """
+    P = np.linalg.inv(Sigma)
+    pse, slope = pse.copy(), slope.copy()
+    n = len(pse)
+    converged = np.zeros(n, dtype=bool)
+    f = _neg_log_posterior(pse, slope, X, Y, W, mu, P)
+    for _ in range(max_iter):
+        active = ~converged
+        if not active.any():
+            break
+        # gradient and expected curvature (d eta / d pse = -slope, d eta / d slope = x - pse)
+        d = X - pse[:, None]
+        p = expit(slope[:, None] * d)
+        r = W * (p - Y)
+        w = W * p * (1.0 - p)
+        g0 = -slope * r.sum(axis=1) + P[0, 0] * (pse - mu[0]) + P[0, 1] * (slope - mu[1])
+        g1 = (r * d).sum(axis=1) + P[0, 1] * (pse - mu[0]) + P[1, 1] * (slope - mu[1])
+        h00 = slope ** 2 * w.sum(axis=1) + P[0, 0]
+        h01 = -slope * (w * d).sum(axis=1) + P[0, 1]
+        h11 = (w * d * d).sum(axis=1) + P[1, 1]
+        det = h00 * h11 - h01 ** 2
+        d0 = (h11 * g0 - h01 * g1) / det
+        d1 = (h00 * g1 - h01 * g0) / det
+
+        step = np.ones(n)
+        for _ in range(50):
+            new_pse, new_slope = pse - step * d0, slope - step * d1
+            with np.errstate(over='ignore', invalid='ignore'):  # overshooting steps are halved
+                f_new = _neg_log_posterior(new_pse, new_slope, X, Y, W, mu, P)
+                worse = active & ~(f_new <= f + 1e-12 * np.abs(f))
+            if not worse.any():
+                break
+            step[worse] *= 0.5
+
+        pse = np.where(active, new_pse, pse)
+        slope = np.where(active, new_slope, slope)
+        f = np.where(active, f_new, f)
+        converged |= active & (np.maximum(np.abs(step * d0), np.abs(step * d1)) < tol)
+
+    # posterior covariance: inverse of the curvature at the mode
+    d = X - pse[:, None]
+    p = expit(slope[:, None] * d)
+    w = W * p * (1.0 - p)
+    H = np.empty((n, 2, 2))
+    H[:, 0, 0] = slope ** 2 * w.sum(axis=1) + P[0, 0]
+    H[:, 0, 1] = H[:, 1, 0] = -slope * (w * d).sum(axis=1) + P[0, 1]
+    H[:, 1, 1] = (w * d * d).sum(axis=1) + P[1, 1]
+    return pse, slope, np.linalg.inv(H), converged
+
+
+def fit_group(X, Y, W, max_iter=500, tol=1e-7, prior_sd=(0.05, 5.0), prior_df=4):
+    """
+    Laplace-EM fit of the partially pooled model to padded binomial data
+    (see group_arrays) of at least 2 subjects. Starts from the pooled fit
+    of all subjects.
+
+    Returns a dict: pse, slope (posterior modes), cov (J, 2, 2 posterior
+    covariances), mu (group mean of pse, slope), Sigma (group covariance),
+    no_pool (dict of the independent per-subject fits, C=1.0 as in the
+    session analysis), converged (EM) and n_iter.
+    """
+    J = X.shape[0]
+    if J < 2:
+        raise ValueError(f"the group model needs at least 2 subjects, got {J}")
+    pooled = fit_logistic(X.reshape(1, -1), Y.reshape(1, -1), weights=W.reshape(1, -1), C=None)
+    no_pool = fit_logistic(X, Y, weights=W, C=1.0)
+    mu = np.array([pooled["pse"][0], pooled["slope"][0]])
+    # broad start: the spread of the independent fits (clipped to the tested angles)
+    spread = np.nanstd(np.clip(no_pool["pse"], X[W > 0].min(), X[W > 0].max()))
+    Sigma = np.diag([max(spread, prior_sd[0]) ** 2, max(abs(mu[1]), prior_sd[1]) ** 2])
+    Psi = prior_df * np.diag(np.square(prior_sd))
+
+    pse, slope = np.full(J, mu[0]), np.full(J, mu[1])
+    converged = False
+    for n_iter in range(1, max_iter + 1):
+        pse, slope, cov, modes_converged = posterior_modes(pse, slope, X, Y, W, mu, Sigma)
+        theta = np.column_stack([pse, slope])
+        new_mu = theta.mean(axis=0)
+        centered = theta - new_mu
+        new_Sigma = (centered.T @ centered + cov.sum(axis=0) + Psi) / (J + prior_df)
+        change = max(np.abs(new_mu - mu).max(), np.abs(new_Sigma - Sigma).max() / np.abs(Sigma).max())
+        mu, Sigma = new_mu, new_Sigma
+        if change < tol:
+            converged = bool(modes_converged.all())
+            break
+    return {"pse": pse, "slope": slope, "cov": cov, "mu": mu, "Sigma": Sigma,
+            "no_pool": no_pool, "converged": converged, "n_iter": n_iter}
+
+
+def group_table(subjects, fit, W):
+    """Per-subject results (partially pooled and independent) as a DataFrame."""
+    return pd.DataFrame({
+        "Subject": subjects,
+        "n": W.sum(axis=1).astype(int),
+        "PSERad": fit["pse"],
+        "PSESD": np.sqrt(fit["cov"][:, 0, 0]),
+        "PSERatio": np.tan(fit["pse"]),
+        "Slope": fit["slope"],
+        "SlopeSD": np.sqrt(fit["cov"][:, 1, 1]),
+        "NoPoolPSERad": fit["no_pool"]["pse"],
+        "NoPoolSlope": fit["no_pool"]["slope"],
+    })
+
+
+def group_summary(fit):
+    """Group-level distribution of the PSE and slope (dict)."""
+    sd = np.sqrt(np.diag(fit["Sigma"]))
+    return {"PSEMeanRad": fit["mu"][0], "PSESDRad": sd[0], "PSEMeanRatio": np.tan(fit["mu"][0]),
+            "SlopeMean": fit["mu"][1], "SlopeSD": sd[1],
+            "Correlation": fit["Sigma"][0, 1] / (sd[0] * sd[1]),
+            "Subjects": len(fit["pse"]), "Converged": fit["converged"], "Iterations": fit["n_iter"]}
+
+
+def main(argv=None):
+    from quartet_reanalysis import EXP_NAME, find_sessions
+
+    parser = argparse.ArgumentParser(description="Fit the partially pooled group model to saved sessions.")
+    parser.add_argument('roots', nargs='+', help="folders holding {participant}_SubjData")
+    parser.add_argument('--exp-name', default=EXP_NAME)
+    parser.add_argument('--eccentricity', type=float, default=None, help="only trials at this eccentricity (dva)")
+    parser.add_argument('--out', default='group_fit.csv', help="per-subject results (CSV)")
+    parser.add_argument('--density', metavar='PREFIX', default=None,
+                        help="also draw the Phase 1 group overlay to PREFIX_Phase1_{Rad,Rat}Density.png")
+    args = parser.parse_args(argv)
+
+    sessions = find_sessions(args.roots, args.exp_name)
+    if args.density:
+        from quartet_report import plot_group_phase1_density
+
+        t0 = time.perf_counter()
+        p1_data, _ = load_group_phase1(sessions, eccentricity=args.eccentricity)
+        if len(p1_data):
+            plot_group_phase1_density(p1_data, args.density)
+            print(f"Phase 1 overlay: {p1_data['Subject'].nunique()} subjects, {len(p1_data)} responses "
+                  f"({time.perf_counter() - t0:.2f} s) -> {args.density}_Phase1_*Density.png")
+
+    t0 = time.perf_counter()
+    data, failed = load_group(sessions, eccentricity=args.eccentricity)
+    # before the checks below, so the reason is shown when the skips leave too few subjects
+    for name, error in failed:
+        print(f"  skipped {name}: {error}")
+    if not len(data):
+        sys.exit("no Phase 2 data found")
+    t_load = time.perf_counter() - t0
+    subjects, X, Y, W = group_arrays(data)
+    if len(subjects) < 2:
+        sys.exit(f"the group model needs at least 2 subjects, found {len(subjects)}")
+    t0 = time.perf_counter()
+    fit = fit_group(X, Y, W)
+    t_fit = time.perf_counter() - t0
+    group_table(subjects, fit, W).to_csv(args.out, index=False)
+
+    summary = group_summary(fit)
+    print(f"{len(subjects)} subjects, {len(data)} trials (load {t_load:.2f} s, fit {t_fit:.3f} s, "
+          f"{summary['Iterations']} EM iterations{'' if summary['Converged'] else ', NOT converged'}) -> {args.out}")
+    print(f"PSE: mean {summary['PSEMeanRad']:.4f} rad ({summary['PSEMeanRatio']:.4f} ratio), "
+          f"SD {summary['PSESDRad']:.4f} rad")
+    print(f"slope: mean {summary['SlopeMean']:.2f}, SD {summary['SlopeSD']:.2f}; "
+          f"correlation {summary['Correlation']:+.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,560 @@
+# -*- coding: utf-8 -*-
+"""
+HEADLESS SIMULATED-OBSERVER MODE FOR THE QUARTET PARITY RATIO EXPERIMENT
+*Null window backend: stand-in psychopy modules (visual, event, core, ...)
+*Virtual clock: flips advance by one refresh period, waits advance instantly
+*Simulated observer: answers from a logistic psychometric function
+
+The experiment script itself runs unchanged: the stand-in modules are
+installed as `psychopy` in sys.modules before the script is executed, the
+GUI dialog is answered from a preset and the observer "looks" at the square
+positions drawn on every flip. A full session (conditions, CSVs, fit,
+figures and summary) runs at machine speed.
+
+Usage: python quartet_headless.py [--sessions N] [--pse RAD] [--seed N] ...
+"""
+
+import argparse
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+_thisDir = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(_thisDir, 'quartet_parityratio.py')
+
+
+class HeadlessQuit(Exception):
+    """Raised by the stand-in core.quit() to end a simulated session."""
+
+
+# %% SIMULATED OBSERVER
+# ==============================================================================
+
+class SimulatedObserver:
+    """
+    Observer answering from a logistic psychometric function of the quartet
+    angle (rad = arctan(Verti / Hori)).
+
+    P(vertical) = lapse / 2 + (1 - lapse) / (1 + exp((angle - pse) / width))
+    (larger angles bring the squares closer horizontally, so horizontal
+    motion wins).
+
+    Phase 1 (space bar): each sweep draws a threshold from N(pse, threshold_sd)
+    and the observer presses space once the angle has passed it by
+    `hysteresis` rad. Phase 2 (v/h): the last quartet seen is judged with the
+    psychometric function. Reaction times are drawn from N(rt_mean, rt_sd).
+
+    Physical motion (the squares move between flips) is seen veridically:
+    the motion axis is judged from the displacement, Phase 1 responds when
+    it changes during a sweep and Phase 2 reports it (with the same lapses).
+    """
+
+    def __init__(self, pse=np.pi / 4, width=0.05, threshold_sd=0.05, hysteresis=0.03,
+                 rt_mean=0.45, rt_sd=0.08, lapse=0.0, seed=None):
+        self.pse = pse
+        self.width = width
+        self.threshold_sd = threshold_sd
+        self.hysteresis = hysteresis
+        self.rt_mean = rt_mean
+        self.rt_sd = rt_sd
+        self.lapse = lapse
+        self.rng = np.random.default_rng(seed)
+        self.last_judgement = None
+        self.new_episode()
+
+    def new_episode(self):
+        """Forget the current stimulus (called after a blank flip)."""
+        self.angle = None
+        self.threshold = None
+        self.side = 0
+        self.responded = False
+        self.prev_xys = None
+        self.axis = None
+        self.first_axis = None
+
+    def motion_axis(self, xys):
+        """
+        'vertical' or 'horizontal' if the squares glided since the last flip,
+        else None. Apparent-motion jumps to the other pair cover at least 60%
+        of the eccentricity, a glide step at most about 10%.
+        """
+        prev, self.prev_xys = self.prev_xys, np.asarray(xys, dtype=float)
+        if prev is None:
+            return None
+        # match the squares to their previous positions (draw order may change)
+        step = min(self.prev_xys - prev, self.prev_xys - prev[::-1], key=lambda d: np.abs(d).sum())
+        distance = np.hypot(step[:, 0], step[:, 1]).max()
+        if distance == 0 or distance > 0.3 * np.hypot(*self.prev_xys[0]):
+            return None
+        dx, dy = np.abs(step).sum(axis=0)
+        return 'vertical' if dy > dx else 'horizontal'
+
+    def p_vertical(self, angle):
+        """Probability of reporting vertical motion at a quartet angle."""
+        return self.lapse / 2 + (1 - self.lapse) / (1 + np.exp((angle - self.pse) / self.width))
+
+    def reaction_time(self):
+        return max(0.1, self.rng.normal(self.rt_mean, self.rt_sd))
+
+    def on_flip(self, xys, now):
+        """
+        Called on every flip with the square positions on screen (or None).
+        Returns a (key, time) press for the Phase 1 sweep, or None.
+        """
+        if xys is None:
+            if self.angle is not None:
+                self.new_episode()
+            return None
+        axis = self.motion_axis(xys)
+        if axis is not None:
+            self.axis = axis
+            if self.first_axis is None:
+                self.first_axis = axis
+            elif axis != self.first_axis and not self.responded:
+                self.responded = True
+                return 'space', now + self.reaction_time()
+            return None
+        angle = np.arctan2(abs(xys[0][1]), abs(xys[0][0]))
+        if self.angle is None:
+            self.threshold = self.rng.normal(self.pse, self.threshold_sd)
+            self.side = np.sign(angle - self.threshold)
+        self.angle = angle
+        if not self.responded and self.side * (angle - self.threshold) <= -self.hysteresis:
+            self.responded = True
+            return 'space', now + self.reaction_time()
+        return None
+
+    def on_poll(self, keyList, now):
+        """
+        Called when the script polls v/h keys: judge the last quartet once.
+        Returns a (key, time) press or None.
+
+        A press the script ignored (made within its response delay) is
+        repeated, as a participant would, one second later.
+        """
+        if 'v' not in keyList:
+            return None
+        if self.angle is not None and not self.responded:
+            self.responded = True
+            if self.axis is not None:
+                p_vertical = self.lapse / 2 + (1 - self.lapse) * (self.axis == 'vertical')
+            else:
+                p_vertical = self.p_vertical(self.angle)
+            key = 'v' if self.rng.random() < p_vertical else 'h'
+            self.last_judgement = (key, now + self.reaction_time())
+            return self.last_judgement
+        if self.last_judgement is not None and now > self.last_judgement[1] + 1.0:
+            self.last_judgement = (self.last_judgement[0], now + self.reaction_time())
+            return self.last_judgement
+        return None
+
+
+# %% VIRTUAL CLOCK AND SESSION STATE
+# ==============================================================================
+
+class _Session:
+    """Shared state of the stand-in modules for one simulated session."""
+
+    def __init__(self, observer, refresh_rate, dialog):
+        self.observer = observer
+        self.refresh_rate = refresh_rate
+        self.frame_dur = 1.0 / refresh_rate
+        self.dialog = dialog
+        self.now = 0.0
+        self.keys = []  # pending (key, absolute time)
+        self.default_clock = None
+        self.n_flips = 0
+        self.date_counter = 0
+
+
+_session = None
+
+
+def _advance(duration):
+    _session.now += max(0.0, duration)
+
+
+def _press(press):
+    if press is not None:
+        _session.keys.append(press)
+
+
+def inject_key(key, t):
+    """Queue a synthetic key-down at virtual time t (seconds since install())."""
+    _session.keys.append((key, t))
+
+
+# %% STAND-IN PSYCHOPY MODULES
+# ==============================================================================
+
+class _Clock:
+    def __init__(self):
+        self.t0 = _session.now
+
+    def getTime(self):
+        return _session.now - self.t0
+
+    def reset(self, newT=0.0):
+        self.t0 = _session.now + newT
+
+
+def _wait(secs, hogCPUperiod=None):
+    _advance(secs)
+
+
+def _quit():
+    raise HeadlessQuit()
+
+
+def _pop_keys(keyList):
+    """Key-downs of the listed keys that have happened by now, as (key, time)."""
+    if keyList is not None:
+        _press(_session.observer.on_poll(keyList, _session.now))
+    ready, pending = [], []
+    for key, t in _session.keys:
+        if t <= _session.now and (keyList is None or key in keyList):
+            ready.append((key, t))
+        else:
+            pending.append((key, t))
+    _session.keys = pending
+    return ready
+
+
+def _get_keys(keyList=None, timeStamped=False, **kwargs):
+    # like pyglet events, keys are stamped when they are polled, not at key-down
+    ready = _pop_keys(keyList)
+    if timeStamped:
+        return [(key, _session.now - timeStamped.t0) for key, t in ready]
+    return [key for key, t in ready]
+
+
+def _wait_keys(maxWait=float('inf'), keyList=None, timeStamped=False, **kwargs):
+    _advance(0.5)  # instructions/breaks are read and dismissed quickly
+    key = keyList[0] if keyList else 'space'
+    if timeStamped:
+        return [(key, timeStamped.getTime())] if hasattr(timeStamped, 'getTime') else [(key, _session.now)]
+    return [key]
+
+
+def _clear_events(eventType=None):
+    _session.keys = []
+
+
+class _KeyPress:
+    def __init__(self, name, tDown, rt):
+        self.name = name
+        self.tDown = tDown
+        self.rt = rt
+        self.duration = None
+
+
+class _Keyboard:
+    # psychopy.hardware.keyboard: key-down times from the (virtual) event itself
+    def __init__(self, clock=None, backend=None, **kwargs):
+        self.clock = clock if clock is not None else _Clock()
+        self._backend = 'headless'
+
+    def getKeys(self, keyList=None, waitRelease=True, clear=True):
+        return [_KeyPress(key, t, t - self.clock.t0) for key, t in _pop_keys(keyList)]
+
+    def clearEvents(self, eventType=None):
+        _clear_events(eventType)
+
+
+class _Mouse:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class _Window:
+    def __init__(self, monitor=None, size=(1920, 1080), **kwargs):
+        self.monitor = monitor
+        self.size = np.asarray(size)
+        self.units = kwargs.get('units', 'deg')
+        self.drawn = []
+
+    def getActualFrameRate(self, *args, **kwargs):
+        return float(_session.refresh_rate)
+
+    def clearBuffer(self, *args, **kwargs):
+        self.drawn = []
+
+    def flip(self, clearBuffer=True):
+        # wait for the next (virtual) vertical blank
+        fd = _session.frame_dur
+        _session.now = (np.floor(_session.now / fd + 1e-9) + 1) * fd
+        _session.n_flips += 1
+        squares = [item for kind, item in self.drawn if kind == 'squares']
+        _press(_session.observer.on_flip(squares[-1] if squares else None, _session.now))
+        if clearBuffer:
+            self.drawn = []
+        clock = _session.default_clock
+        return clock.getTime() if clock is not None else _session.now
+
+    def close(self):
+        pass
+
+
+class _Stim:
+    kind = 'stim'
+
+    def __init__(self, win, **kwargs):
+        self.win = win
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def draw(self, win=None):
+        self.win.drawn.append((self.kind, None))
+
+    def setPos(self, pos, **kwargs):
+        self.pos = pos
+
+
+class _TextStim(_Stim):
+    kind = 'text'
+
+    def draw(self, win=None):
+        self.win.drawn.append((self.kind, getattr(self, 'text', '')))
+
+
+class _ElementArrayStim(_Stim):
+    kind = 'squares'
+
+    def draw(self, win=None):
+        self.win.drawn.append((self.kind, np.array(self.xys, dtype=float)))
+
+
+class _BufferImageStim(_Stim):
+    kind = 'buffer'
+
+    def __init__(self, win, **kwargs):
+        super().__init__(win, **kwargs)
+        self.captured = list(win.drawn)
+
+    def draw(self, win=None):
+        self.win.drawn.extend(self.captured)
+
+
+class _Monitor:
+    def __init__(self, name=None, width=None, distance=None, **kwargs):
+        self.name = name
+        self.width = width
+        self.distance = distance
+        self.size_pix = None
+
+    def setSizePix(self, size):
+        self.size_pix = size
+
+    def getSizePix(self):
+        return self.size_pix
+
+    def getWidth(self):
+        return self.width
+
+    def getDistance(self):
+        return self.distance
+
+
+def _deg2pix(degrees, monitor, correctFlat=False):
+    # same flat-screen approximation as psychopy.tools.monitorunittools
+    cm = np.asarray(degrees) * monitor.getDistance() * 0.017455
+    return cm * monitor.getSizePix()[0] / float(monitor.getWidth())
+
+
+class _LogFile:
+    def __init__(self, f=None, level=None, filemode='a', **kwargs):
+        self.stream = open(f, filemode, encoding='utf-8')
+
+    def write(self, txt):
+        self.stream.write(txt)
+        self.stream.flush()
+
+
+class _Console:
+    def setLevel(self, level):
+        pass
+
+
+def _set_default_clock(clock):
+    _session.default_clock = clock
+
+
+class _Dlg:
+    def __init__(self, title='', **kwargs):
+        self.fields = []
+        self.data = []
+        self.OK = False
+
+    def addField(self, key, initial='', choices=None, **kwargs):
+        if choices is not None and initial == '':
+            initial = choices[0]
+        self.fields.append((key, initial))
+
+    def show(self):
+        self.data = [_session.dialog.get(key, initial) for key, initial in self.fields]
+        self.OK = True
+        return self.data
+
+
+def _get_date_str(*args, **kwargs):
+    _session.date_counter += 1
+    return time.strftime('%Y-%m-%d_%Hh%M.%S') + '_sim%03d' % _session.date_counter
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+# repo modules that import psychopy themselves
+_PSYCHOPY_DEPENDENTS = ('quartet_stimuli', 'quartet_responses', 'quartet_calibration')
+
+
+def install(observer, refresh_rate=60, dialog=None):
+    """
+    Install the stand-in psychopy modules for one session (replaces any real
+    psychopy already imported). Returns the previous sys.modules entries.
+    """
+    global _session
+    _session = _Session(observer, refresh_rate, dialog or {})
+    modules = {
+        'psychopy.visual': _module('psychopy.visual', Window=_Window, GratingStim=_Stim,
+                                   Circle=_Stim, TextStim=_TextStim,
+                                   ElementArrayStim=_ElementArrayStim,
+                                   BufferImageStim=_BufferImageStim),
+        'psychopy.event': _module('psychopy.event', getKeys=_get_keys, waitKeys=_wait_keys,
+                                  clearEvents=_clear_events, Mouse=_Mouse),
+        'psychopy.core': _module('psychopy.core', Clock=_Clock, wait=_wait, quit=_quit,
+                                 getTime=lambda: _session.now),
+        'psychopy.monitors': _module('psychopy.monitors', Monitor=_Monitor),
+        'psychopy.logging': _module('psychopy.logging', LogFile=_LogFile, console=_Console(),
+                                    setDefaultClock=_set_default_clock,
+                                    INFO=20, WARNING=30, DEBUG=10),
+        'psychopy.gui': _module('psychopy.gui', Dlg=_Dlg),
+        'psychopy.hardware.keyboard': _module('psychopy.hardware.keyboard', Keyboard=_Keyboard,
+                                              KeyPress=_KeyPress),
+        'psychopy.data': _module('psychopy.data', getDateStr=_get_date_str),
+        'psychopy.tools.monitorunittools': _module('psychopy.tools.monitorunittools',
+                                                   deg2pix=_deg2pix),
+    }
+    modules['psychopy.tools'] = _module('psychopy.tools',
+                                        monitorunittools=modules['psychopy.tools.monitorunittools'])
+    modules['psychopy.hardware'] = _module('psychopy.hardware',
+                                           keyboard=modules['psychopy.hardware.keyboard'])
+    modules['psychopy'] = _module('psychopy', **{name.split('.')[-1]: module
+                                                 for name, module in modules.items()
+                                                 if name.count('.') == 1})
+    previous = {name: sys.modules.get(name) for name in modules}
+    # modules that imported the real psychopy must be re-imported against the stand-ins
+    for name in _PSYCHOPY_DEPENDENTS:
+        sys.modules.pop(name, None)
+    sys.modules.update(modules)
+    return previous
+
+
+def uninstall(previous):
+    """Restore the sys.modules entries returned by install()."""
+    for name, module in previous.items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
+    for name in _PSYCHOPY_DEPENDENTS:
+        sys.modules.pop(name, None)
+
+
+# %% SESSION RUNNER
+# ==============================================================================
+
+def run_session(observer, data_dir, participant='sim', sub_id='99', monitor='TongLab',
+                debug=False, refresh_rate=60, resume=False, adaptive=False,
+                coarse_to_fine=False, physical=False, eccentricities=None, blocked=False,
+                script=SCRIPT):
+    """
+    Run the full experiment script once against the simulated observer.
+
+    Data are written under data_dir ({participant}_SubjData/...). Returns the
+    script's globals (phase1_df, phase2_df, subject_ratio, pse_rad, ...) plus
+    "wall_time" and "virtual_time" (seconds). eccentricities (dva, None for the
+    script's default) are run interleaved, or blocked if blocked=True.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+    dialog = {"Subject ID:": sub_id, "Initials:": participant, "Monitor:": monitor,
+              "Debug:": "Yes" if debug else "No", "Resume:": "Yes" if resume else "No",
+              "Phase 1:": "Coarse-to-fine" if coarse_to_fine else "Linear",
+              "Phase 2:": "Adaptive" if adaptive else "Constant",
+              "Motion:": "Physical" if physical else "Apparent",
+              "Eccentricity order:": "Blocked" if blocked else "Interleaved"}
+    if eccentricities is not None:
+        dialog["Eccentricities (dva):"] = ", ".join(f"{ecc:g}" for ecc in eccentricities)
+    previous = install(observer, refresh_rate, dialog)
+    os.environ['QUARTET_DATA_DIR'] = data_dir
+    with open(script, encoding='utf-8') as f:
+        code = compile(f.read(), script, 'exec')
+    scope = {'__name__': '__main__', '__file__': script}
+    # as when run as a script: its folder is on sys.path (it chdirs to the data folder
+    # and imports the analysis modules only at the end of the session)
+    script_dir = os.path.dirname(os.path.abspath(script))
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    cwd = os.getcwd()
+    t0 = time.perf_counter()
+    try:
+        exec(code, scope)
+    except HeadlessQuit:
+        pass
+    finally:
+        scope['wall_time'] = time.perf_counter() - t0
+        scope['virtual_time'] = _session.now
+        os.environ.pop('QUARTET_DATA_DIR', None)
+        os.chdir(cwd)
+        uninstall(previous)
+    return scope
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run simulated sessions without a display.")
+    parser.add_argument('--sessions', type=int, default=1)
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(_thisDir), 'SimData'))
+    parser.add_argument('--monitor', default='TongLab')
+    parser.add_argument('--refresh-rate', type=float, default=60, help="simulated refresh rate (Hz)")
+    parser.add_argument('--debug', action='store_true', help="short protocol (Debug: Yes)")
+    parser.add_argument('--coarse-to-fine', action='store_true', help="coarse-to-fine Phase 1 sweep")
+    parser.add_argument('--adaptive', action='store_true', help="adaptive Phase 2 (Phase 2: Adaptive)")
+    parser.add_argument('--physical', action='store_true', help="physical-motion quartets (Motion: Physical)")
+    parser.add_argument('--eccentricities', type=float, nargs='+', help="eccentricities in dva (default: script's)")
+    parser.add_argument('--blocked', action='store_true', help="one eccentricity per run (Eccentricity order: Blocked)")
+    parser.add_argument('--pse', type=float, default=np.pi / 4, help="observer PSE in rad")
+    parser.add_argument('--width', type=float, default=0.05, help="logistic scale in rad")
+    parser.add_argument('--threshold-sd', type=float, default=0.05)
+    parser.add_argument('--hysteresis', type=float, default=0.03)
+    parser.add_argument('--lapse', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    print(f"{'session':>8} {'wall (s)':>9} {'virtual (s)':>12} {'P1 mean':>8} {'P2 n':>5} {'PSE rad':>8} {'true':>6}")
+    for session in range(args.sessions):
+        np.random.seed(args.seed + session)  # condition order of the script
+        observer = SimulatedObserver(pse=args.pse, width=args.width, threshold_sd=args.threshold_sd,
+                                     hysteresis=args.hysteresis, lapse=args.lapse,
+                                     seed=args.seed + session)
+        result = run_session(observer, args.out, participant=f"sim{session:04d}",
+                             sub_id=str(session), monitor=args.monitor, debug=args.debug,
+                             refresh_rate=args.refresh_rate, adaptive=args.adaptive,
+                             coarse_to_fine=args.coarse_to_fine, physical=args.physical,
+                             eccentricities=args.eccentricities, blocked=args.blocked)
+        print(f"{session:>8} {result['wall_time']:>9.2f} {result['virtual_time']:>12.1f} "
+              f"{result.get('overall_mean_rad', np.nan):>8.4f} {len(result.get('phase2_df', ())):>5} "
+              f"{result.get('pse_rad', np.nan):>8.4f} "
+              f"{args.pse:>6.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+CRASH-SAFE SESSION JOURNAL FOR THE QUARTET PARITY RATIO EXPERIMENT
+*Append-only JSON-lines file next to the session CSVs ({outFileName}_journal.jsonl)
+*Every completed trial is written and fsynced before the next trial starts
+*Resume: the trial plan, completed trials and personalized ratios of an
+ interrupted session are rebuilt from its journal
+
+Records (one JSON object per line, "type" first):
+    session       expInfo and the full trial plan of both phases
+    trial         one completed trial dict (phase1 / phase2)
+    subject_ratio the personalized ratios shown in Phase 2
+    end           the session finished (journal is no longer resumable)
+
+A crash can only tear the last line; read_journal() drops an incomplete
+last line, so the journal always holds every trial that was finished.
+"""
+
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+
+def _to_json(value):
+    # numpy scalars in the trial dicts (np.int64 has no JSON encoding)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _read(path):
+    # (records, bytes up to the end of the last complete record)
+    records = []
+    size = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            if not line.endswith(b'\n'):
+                records.pop()
+                break
+            size += len(line)
+    return records, size
+
+
+def read_journal(path):
+    """Records of a journal file, without a torn (incomplete) last line."""
+    return _read(path)[0]
+
+
+def find_unfinished(folder, participant, expName):
+    """
+    Most recent journal in the Output folder of a participant that has no
+    "end" record, or None.
+    """
+    pattern = os.path.join(folder, '%s_%s_*_journal.jsonl' % (participant, expName))
+    for path in sorted(glob.glob(pattern), key=os.path.getmtime, reverse=True):
+        records = read_journal(path)
+        if records and records[0]["type"] == "session" and records[-1]["type"] != "end":
+            return path
+    return None
+
+
+class SessionJournal:
+    """
+    Append-only journal of one session.
+
+    Opening an existing journal (resume) loads its records; the file is then
+    appended to. append() serializes one record, writes it with a single
+    os.write() on an O_APPEND descriptor and fsyncs it (~1 ms on a local
+    disk), which fits in the ITI without stretching it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        new = not os.path.exists(path)
+        self.records = []
+        if not new:
+            # drop a torn last line so the next record starts on its own line
+            self.records, size = _read(path)
+            os.truncate(path, size)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if new:
+            # make the new directory entry durable too
+            dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            except OSError:
+                pass
+            finally:
+                os.close(dir_fd)
+        self.n_appends = 0
+        self.append_max = 0.0
+
+    # -- state rebuilt from the records -------------------------------------
+
+    @property
+    def expInfo(self):
+        """expInfo of the session (None for an empty journal)."""
+        return self.records[0]["expInfo"] if self.records else None
+
+    @property
+    def subject_ratio(self):
+        """Personalized ratios already used in Phase 2, or None."""
+        for record in self.records:
+            if record["type"] == "subject_ratio":
+                return record["ratios"]
+        return None
+
+    def completed(self, phase):
+        """Number of completed trials of a phase."""
+        return sum(1 for r in self.records if r["type"] == "trial" and r["phase"] == phase)
+
+    def conditions(self, phase):
+        """
+        Trial plan of a phase, with the completed trials replaced by their
+        journaled records (responses included).
+        """
+        done = {r["trial"]["Trial"]: r["trial"] for r in self.records
+                if r["type"] == "trial" and r["phase"] == phase}
+        return [done.get(trial["Trial"], dict(trial)) for trial in self.records[0]["conditions"][phase]]
+
+    # -- writing --------------------------------------------------------------
+
+    def append(self, kind, **fields):
+        """Write one record and fsync it."""
+        t0 = time.perf_counter()
+        record = {"type": kind, **fields}
+        line = json.dumps(record, default=_to_json) + '\n'
+        os.write(self._fd, line.encode('utf-8'))
+        os.fsync(self._fd)
+        self.records.append(json.loads(line))
+        self.n_appends += 1
+        self.append_max = max(self.append_max, time.perf_counter() - t0)
+
+    def start(self, expInfo, conditions):
+        """Session header: expInfo and the trial plan ({phase: [trial, ...]})."""
+        self.append("session", expInfo=expInfo, conditions=conditions)
+
+    def append_trial(self, phase, trial):
+        """One completed trial of a phase."""
+        self.append("trial", phase=phase, trial=trial)
+
+    def close(self):
+        """Close the file (safe to call twice)."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def stats_line(self):
+        """One human-readable line for the log."""
+        return (f"Journal: {self.n_appends} records appended, "
+                f"max append+fsync {self.append_max * 1000:.2f} ms\n")
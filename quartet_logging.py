@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+SESSION LOGGING FOR THE QUARTET PARITY RATIO EXPERIMENT
+*Background log writer: logFile.write() only queues the text; a background
+ thread flushes queued records to the psychopy LogFile in batches
+
+The .log content is exactly what would have been written synchronously;
+only the moment of the file I/O moves out of the trial loop.
+"""
+
+import atexit
+import collections
+import threading
+import time
+
+
+class BackgroundLog:
+    """
+    Drop-in replacement for logFile.write() that never touches the file.
+
+    Records are (perf_counter timestamp, text) pairs appended to a deque
+    (atomic, lock-free for the caller). The writer thread wakes every
+    flush_interval seconds, or as soon as max_batch records are pending,
+    and writes everything queued in one sink.write() call. close() (also
+    registered with atexit) drains the queue and stops the thread.
+    """
+
+    def __init__(self, sink, flush_interval=0.1, max_batch=256):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.closed = False
+        self._queue = collections.deque()
+        self._wake = threading.Event()
+        self._drain_lock = threading.Lock()
+        # statistics
+        self.n_records = 0
+        self.n_batches = 0
+        self.max_depth = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.call_max = 0.0
+        self._thread = threading.Thread(target=self._run, name='BackgroundLog', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, txt):
+        """Queue text for the log file (returns immediately)."""
+        t0 = time.perf_counter()
+        if self.closed:
+            self.sink.write(txt)
+            return
+        self._queue.append((t0, txt))
+        depth = len(self._queue)
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if depth >= self.max_batch:
+            self._wake.set()
+        call = time.perf_counter() - t0
+        if call > self.call_max:
+            self.call_max = call
+
+    def _drain(self):
+        with self._drain_lock:
+            records = []
+            while self._queue:
+                records.append(self._queue.popleft())
+            if not records:
+                return
+            self.sink.write(''.join(txt for _, txt in records))
+            done = time.perf_counter()
+            for t0, _ in records:
+                latency = done - t0
+                self.latency_sum += latency
+                if latency > self.latency_max:
+                    self.latency_max = latency
+            self.n_records += len(records)
+            self.n_batches += 1
+
+    def _run(self):
+        while not self.closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._drain()
+
+    def flush(self):
+        """Write everything queued so far (synchronously, from the caller)."""
+        self._drain()
+
+    def close(self):
+        """Drain the queue and stop the writer thread (safe to call twice)."""
+        if self.closed:
+            return
+        self.closed = True
+        self._wake.set()
+        self._thread.join(timeout=2.0)
+        self._drain()
+
+    def stats(self):
+        """Queue depth and flush latency so far (latencies in seconds)."""
+        return {
+            "records": self.n_records,
+            "batches": self.n_batches,
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self.max_depth,
+            "mean_latency": self.latency_sum / self.n_records if self.n_records else 0.0,
+            "max_latency": self.latency_max,
+            "max_write_call": self.call_max,
+        }
+
+    def stats_line(self):
+        """One human-readable line of stats() for the log itself."""
+        s = self.stats()
+        return (f"Log Writer: {s['records']} records in {s['batches']} batches, "
+                f"max queue depth {s['max_queue_depth']}, "
+                f"flush latency mean {s['mean_latency'] * 1000:.2f} ms max {s['max_latency'] * 1000:.2f} ms, "
+                f"max write() call {s['max_write_call'] * 1e6:.1f} us\n")
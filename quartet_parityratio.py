@@ -19,10 +19,18 @@ import numpy as np
 import os
 import pandas as pd
 
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.linear_model import LogisticRegression
-import markdown
+from quartet_timing import compile_phase1_schedule, compile_phase2_schedule, fine_sweep_range, frames_for, FlipTelemetry
+from quartet_geometry import GeometryTable, TrajectoryTable
+from quartet_stimuli import QuartetArray, FrameCache, TextPool
+
+from quartet_analysis import phase1_means, personalized_ratios, analyze_session, is_per_eccentricity, ratio_key
+from quartet_logging import BackgroundLog
+from quartet_journal import SessionJournal, find_unfinished
+from quartet_render import start_render
+from quartet_adaptive import PsiPhase2
+from quartet_responses import ResponseBox, press_frame
+from quartet_calibration import calibrate, CACHE_NAME
+from quartet_columnar import write_phase, HAVE_PYARROW, COLUMNAR_SUFFIX
 
 
 # %% SCREEN AND SYSTEM CONFIG
@@ -61,6 +69,13 @@ dlg.addField("Subject ID:", expInfo['sub_id'])
 dlg.addField("Initials:", expInfo['participant'])
 dlg.addField("Monitor:", choices=list(my_monitors.keys()), initial="TongLab")
 dlg.addField("Debug:", choices=["Yes", "No"], initial="No")
+dlg.addField("Telemetry:", choices=["Yes", "No"], initial="No")
+dlg.addField("Phase 1:", choices=["Linear", "Coarse-to-fine"], initial="Linear")
+dlg.addField("Phase 2:", choices=["Constant", "Adaptive"], initial="Constant")
+dlg.addField("Resume:", choices=["Yes", "No"], initial="No")
+dlg.addField("Motion:", choices=["Apparent", "Physical"], initial="Apparent")
+dlg.addField("Eccentricities (dva):", f"{circle_radius:g}")  # comma-separated, e.g. 2, 3, 5
+dlg.addField("Eccentricity order:", choices=["Interleaved", "Blocked"], initial="Interleaved")
 dlg.show()  # Show GUI
 if dlg.OK == False: core.quit()  # user pressed cancel
 
@@ -70,14 +85,41 @@ expInfo.update({
     'participant': dlg.data[1],
     'monitor': dlg.data[2],
     'debug': dlg.data[3],
+    'telemetry': dlg.data[4],
+    'phase1_mode': dlg.data[5],
+    'phase2_mode': dlg.data[6],
+    'motion': dlg.data[8],
+    'eccentricities': dlg.data[9],
+    'ecc_order': dlg.data[10],
 })
 expInfo['date'] = data.getDateStr()  # add a simple timestamp
 expInfo['expName'] = expName
-DEBUG = True if expInfo['debug'] == "Yes" else False
+RESUME = True if dlg.data[7] == "Yes" else False
 
 # get the path that this script is in and change dir to it
+# (QUARTET_DATA_DIR overrides the data location, e.g. for simulated sessions)
 _thisDir = os.path.dirname(os.path.abspath(__file__))  # get current path
-os.chdir(os.path.dirname(_thisDir))  # change directory
+os.chdir(os.environ.get('QUARTET_DATA_DIR', os.path.dirname(_thisDir)))  # change directory
+
+# Resume the last unfinished session of this participant (same date, settings and trial plan)
+journal = None
+if RESUME:
+    journal_path = find_unfinished(os.path.join('%s_SubjData' % expInfo['participant'], expName, 'Output'),
+                                   expInfo['participant'], expName)
+    if journal_path is not None:
+        journal = SessionJournal(journal_path)
+        expInfo.update(journal.expInfo)
+    else:
+        print("No unfinished session to resume; starting a new session.")
+
+DEBUG = True if expInfo['debug'] == "Yes" else False
+TELEMETRY = True if expInfo['telemetry'] == "Yes" else False
+COARSE_TO_FINE = True if expInfo.get('phase1_mode') == "Coarse-to-fine" else False
+ADAPTIVE = True if expInfo.get('phase2_mode') == "Adaptive" else False
+MOTION = expInfo.get('motion', "Apparent").lower()  # "apparent" or "physical" (squares glide between pairs)
+# quartet eccentricities (circle radii, dva) of the session, interleaved within each run or in blocks
+eccentricities = [float(e) for e in str(expInfo.get('eccentricities', circle_radius)).split(',') if e.strip()]
+ECC_BLOCKED = True if expInfo.get('ecc_order') == "Blocked" else False
 
 # Name and create specific subject folder
 subjFolderName = '%s_SubjData' % (expInfo['participant'])
@@ -105,7 +147,8 @@ if not os.path.isdir(prtFolderName):
     os.makedirs(prtFolderName)
 
 # save a log file and set level for msg to be received
-logFile = logging.LogFile(logFileName+'.log', level=logging.INFO)
+# (writes are queued and flushed to the file by a background thread)
+logFile = BackgroundLog(logging.LogFile(logFileName+'.log', level=logging.INFO))
 logging.console.setLevel(logging.WARNING)  # set console to receive warningVEs
 
 # %% MONITOR AND WINDOW
@@ -153,7 +196,14 @@ phase1 = {
     "feedback_time": 1,
     "response_delay": 150 / 1000,
     "ITI": 1,
-    "num_practice": 4
+    "num_practice": 4,
+    "frame_cache": False,  # pre-render the whole ratio sweep (memory heavy)
+    # coarse-to-fine mode: sweep every coarse_step-th ratio, then re-sweep the
+    # full-resolution window from coarse_back_off to coarse_overshoot coarse steps around the response
+    "coarse_step": 8,
+    "coarse_back_off": 5,
+    "coarse_overshoot": 2,
+    "stage_gap": 0.5 # s, fixation between the coarse and the fine sweep
 }
 phase2 = {
     "num_runs": 4,
@@ -165,7 +215,10 @@ phase2 = {
     "feedback_time": 1,
     "response_delay": 150 / 1000,
     "cycle": 1,
-    "condition_labels": ["PR-3","PR-2","PR-1","PR","PR+1","PR+2","PR+3","PR+4"]
+    "condition_labels": ["PR-3","PR-2","PR-1","PR","PR+1","PR+2","PR+3","PR+4"],
+    # adaptive mode (psi method): conditions chosen trial by trial, stop at the target CI width
+    "target_ci_width": 0.05, # rad, 95% credible interval of the PSE (~ 320 constant-stimuli trials)
+    "min_trials": 40
 }
 # phase3 = {
 #     "num_runs": 1,
@@ -189,33 +242,53 @@ if DEBUG is True:
     phase2["num_trials"] = 8
     # phase3["num_trials"] = 4
 
+# every eccentricity gets the full trial set of each run
+phase1["trials_per_run"] = phase1["num_trials"] * len(eccentricities)
+phase2["trials_per_run"] = phase2["num_trials"] * len(eccentricities)
+
+def order_by_eccentricity(run_trials):
+    """Trials of one run interleaved across eccentricities, or blocked (block order shuffled)."""
+    if len(eccentricities) == 1:
+        return run_trials
+    if ECC_BLOCKED:
+        return [trial for i in np.random.permutation(len(eccentricities)) for trial in run_trials
+                if trial["Eccentricity"] == eccentricities[i]]
+    return [run_trials[i] for i in np.random.permutation(len(run_trials))]
+
 
 # %% PHASE 1 (Method of Limits)
 # ==============================================================================
 phase = phase1
 conditions = []
 for run in range(1, phase["num_runs"] + 1):
-    # counterbalancing factor 1: starting dots
-    quartet_orders = [
-        "left_tilted" if num == 0 else "right_tilted"
-        for num in np.random.permutation(phase["num_trials"]) % 2
-    ]
-    # counterbalancing factor 2: starting ratio
-    ratio_directions = [
-        "ascending" if num == 0 else "descending"
-        for num in np.random.permutation(phase["num_trials"]) % 2
-    ]
-    for trial in range(1, phase["num_trials"] + 1):
-        conditions.append({
-            "Trial": trial + phase["num_trials"] * (run - 1),
-            "Run": run,
-            "Duration": phase["duration"],
-            "RespDelay": phase["response_delay"],
-            "FeedbackTime": phase["feedback_time"],
-            "ITI": phase["ITI"],
-            "QuartetOrder": quartet_orders.pop(),
-            "RatioDir": ratio_directions.pop()
-        })
+    run_trials = []
+    for eccentricity in eccentricities:
+        # counterbalancing factor 1: starting dots
+        quartet_orders = [
+            "left_tilted" if num == 0 else "right_tilted"
+            for num in np.random.permutation(phase["num_trials"]) % 2
+        ]
+        # counterbalancing factor 2: starting ratio
+        ratio_directions = [
+            "ascending" if num == 0 else "descending"
+            for num in np.random.permutation(phase["num_trials"]) % 2
+        ]
+        for trial in range(1, phase["num_trials"] + 1):
+            run_trials.append({
+                "Trial": None,  # numbered in presentation order below
+                "Run": run,
+                "Duration": phase["duration"],
+                "RespDelay": phase["response_delay"],
+                "FeedbackTime": phase["feedback_time"],
+                "ITI": phase["ITI"],
+                "QuartetOrder": quartet_orders.pop(),
+                "RatioDir": ratio_directions.pop(),
+                "Motion": MOTION,
+                "Eccentricity": eccentricity
+            })
+    for trial, condition in enumerate(order_by_eccentricity(run_trials), start=1):
+        condition["Trial"] = trial + phase["trials_per_run"] * (run - 1)
+        conditions.append(condition)
 phase1_conditions = conditions
 phase1_df = pd.DataFrame(conditions)
 
@@ -224,33 +297,54 @@ phase1_df = pd.DataFrame(conditions)
 phase = phase2
 conditions = []
 for run in range(1, phase["num_runs"] + 1):
-    # condition: aspect ratio (8 personalized ratio)
-    condition_ratio = [
-        phase["condition_labels"][num]
-        for num in np.random.permutation(phase["num_trials"]) % len(phase["condition_labels"])
-    ]
-    # counterbalancing factor: starting dots
-    quartet_orders = [
-        "left_tilted" if num == 0 else "right_tilted"
-        for num in np.random.permutation(phase["num_trials"]) % 2
-    ]
-    for trial in range(1, phase["num_trials"] + 1):
-        conditions.append({
-            "Run": run,
-            "Trial": trial + phase["num_trials"] * (run - 1),
-            "Duration_F1": phase["duration_frame1"],
-            "Duration": phase["duration"],
-            "ReportTime": phase["report_time"],
-            "RespDelay": phase["response_delay"],
-            "FeedbackTime": phase["feedback_time"],
-            "ITI": phase["ITI"],
-            "Cycle": phase["cycle"],
-            "ConditionRatio": condition_ratio.pop(),
-            "QuartetOrder": quartet_orders.pop()
-        })
+    run_trials = []
+    for eccentricity in eccentricities:
+        # condition: aspect ratio (8 personalized ratio)
+        condition_ratio = [
+            phase["condition_labels"][num]
+            for num in np.random.permutation(phase["num_trials"]) % len(phase["condition_labels"])
+        ]
+        # counterbalancing factor: starting dots
+        quartet_orders = [
+            "left_tilted" if num == 0 else "right_tilted"
+            for num in np.random.permutation(phase["num_trials"]) % 2
+        ]
+        for trial in range(1, phase["num_trials"] + 1):
+            run_trials.append({
+                "Run": run,
+                "Trial": None,  # numbered in presentation order below
+                "Duration_F1": phase["duration_frame1"],
+                "Duration": phase["duration"],
+                "ReportTime": phase["report_time"],
+                "RespDelay": phase["response_delay"],
+                "FeedbackTime": phase["feedback_time"],
+                "ITI": phase["ITI"],
+                "Cycle": phase["cycle"],
+                "ConditionRatio": condition_ratio.pop(),
+                "QuartetOrder": quartet_orders.pop(),
+                "Motion": MOTION,
+                "Eccentricity": eccentricity
+            })
+    for trial, condition in enumerate(order_by_eccentricity(run_trials), start=1):
+        condition["Trial"] = trial + phase["trials_per_run"] * (run - 1)
+        conditions.append(condition)
 phase2_conditions = conditions
 phase2_df = pd.DataFrame(conditions)
 
+# %% SESSION JOURNAL (append-only, one fsynced record per completed trial)
+# ==============================================================================
+if journal is None:
+    journal = SessionJournal(outFileName + '_journal.jsonl')
+    journal.start(expInfo, {"phase1": phase1_conditions, "phase2": phase2_conditions})
+else:
+    # continue the interrupted session's trial plan after its last completed trial
+    phase1_conditions = journal.conditions("phase1")
+    phase2_conditions = journal.conditions("phase2")
+    if journal.completed("phase1"):
+        phase1["num_practice"] = 0  # already practiced
+    logFile.write(f"Resuming session {expInfo['date']}: {journal.completed('phase1')} Phase 1 and "
+                  f"{journal.completed('phase2')} Phase 2 trials already completed\n")
+
 # %% PHASE 3 (Assessment for Volitional Control)
 # # ==============================================================================
 # phase = phase3
@@ -292,22 +386,19 @@ max_rad = np.arctan(3)        # naximum ratio in radians
 min_rad = np.arctan(1/3)      # minimum ratio in radians
 range_rad = np.linspace(min_rad, max_rad, 154)  # 154 evenly-spaced angles in rad
 range_ratio = np.tan(range_rad)  # rad to ratio
-list_ratio = {
-    "ascending": range_ratio,
-    "descending": range_ratio[::-1]
+# index into range_ratio of each step of a sweep
+list_index = {
+    "ascending": np.arange(len(range_ratio)),
+    "descending": np.arange(len(range_ratio))[::-1]
 }
 
 # SQUARE (quartets)
 SquareSize = 1.0  # in dva
 logFile.write('SquareSize=' + str(SquareSize) + '\n')
-Square = visual.GratingStim(myWin,
-                            autoLog=False,
-                            name='Square',
-                            tex=None,
-                            units='deg',
-                            size=(SquareSize, SquareSize),
-                            color= squareColor,
-                            )
+
+# GEOMETRY TABLES (distances and pixel positions of the whole sweep, this monitor, each eccentricity)
+sweep_geometries = {ecc: GeometryTable.from_monitor(range_ratio, ecc, SquareSize, moni) for ecc in eccentricities}
+sweep_geometry = sweep_geometries[eccentricities[0]]
 
 # DOT (fixation)
 dotFix = visual.Circle(myWin,
@@ -329,6 +420,12 @@ dotFix_green = visual.Circle(myWin,
                        lineColor='green'
                        )
 
+# QUARTET (both squares of a pair in one draw call)
+Square = QuartetArray(myWin, sweep_geometry.square_pix, squareColor, dotFix, dotFix_green)
+
+# FRAME CACHES (pre-rendered quartets, one blit per frame; one per eccentricity)
+frame_caches = {ecc: FrameCache(myWin, Square) for ecc in eccentricities}
+
 # %%  INSTRUCTION
 # ==============================================================================
 
@@ -341,95 +438,107 @@ def show_text(win, text, color='white', height=0.5, pos=(0, 0)):
         pos=pos
     )
 
-triggerText = show_text(myWin, "Experiment will start soon. Press p to continue.")
-phase1Text = show_text(myWin, "Please keep your eyes on the red dot at all times.\n\nPress the space bar as soon as you notice\n\na change in the perceived direction.")
-pracText = show_text(myWin, "Press any key to begin the practice trials.")
-endofpracText = show_text(myWin, "Great job!\nWhen you're ready, press the space bar to begin the experiment.")
-bridgeText = show_text(myWin, "You've finished phase 1! Now, move on to phase 2.\n\nPress any key to proceed.")
-phase2Text = show_text(myWin, "Please keep your eyes on the red dot at all times.\n\nOnce the presentation ends,\n\npress V or H key to report the direction you perceived.")
-phase3Text = show_text(myWin, "Please keep your eyes on the red dot at all times.\n\nTry to perceive the direction indicated in the instructions.\n\nReport the direction you actually perceived.")
-reportText = show_text(myWin, "?")
-norespText = show_text(myWin, "No response detected.\n\nPlease stay focused for the next trial.")
-analysisText = show_text(myWin, "Now analyzing the data ...")
-endText = show_text(myWin, "You're all set! Thank you for your participation.")
+# TEXT POOL: every static screen is laid out here, before the first trial
+text_pool = TextPool(lambda text, **style: show_text(myWin, text, **style))
+triggerText = text_pool.add("trigger", "Experiment will start soon. Press p to continue.")
+phase1Text = text_pool.add("phase1", "Please keep your eyes on the red dot at all times.\n\nPress the space bar as soon as you notice\n\na change in the perceived direction.")
+pracText = text_pool.add("prac", "Press any key to begin the practice trials.")
+endofpracText = text_pool.add("endofprac", "Great job!\nWhen you're ready, press the space bar to begin the experiment.")
+bridgeText = text_pool.add("bridge", "You've finished phase 1! Now, move on to phase 2.\n\nPress any key to proceed.")
+phase2Text = text_pool.add("phase2", "Please keep your eyes on the red dot at all times.\n\nOnce the presentation ends,\n\npress V or H key to report the direction you perceived.")
+phase3Text = text_pool.add("phase3", "Please keep your eyes on the red dot at all times.\n\nTry to perceive the direction indicated in the instructions.\n\nReport the direction you actually perceived.")
+reportText = text_pool.add("report", "?")
+norespText = text_pool.add("noresp", "No response detected.\n\nPlease stay focused for the next trial.")
+analysisText = text_pool.add("analysis", "Now analyzing the data ...")
+endText = text_pool.add("end", "You're all set! Thank you for your participation.")
 
 # Mapping response key to label
 key_to_label = {'v': 'vertical', 'h': 'horizontal'}
 
+def break_text(runs_left):
+    return f"{runs_left} run(s) to go!\n\nPlease take a short break and press any key to continue."
+
+def cue_text(trial_cue):
+    return f"Try to see {trial_cue.upper()}"
+
 def show_break(runs_left):
-    text = f"{runs_left} run(s) to go!\n\nPlease take a short break and press any key to continue."
-    return show_text(myWin, text)
+    return text_pool.get(break_text(runs_left))
 
 def show_cue(trial_cue):
-    text = f"Try to see {trial_cue.upper()}" 
-    return show_text(myWin, text, pos = (0,0.5))
+    return text_pool.get(cue_text(trial_cue), pos=(0, 0.5))
+
+# every break screen either phase can show
+text_pool.warm(break_text(runs_left) for runs_left in
+               range(1, max(phase1["num_runs"], phase2["num_runs"])))
 
 # %% TIME PARAMETERS
 # ==============================================================================
 
-refr_rate = myWin.getActualFrameRate()  # get screen refresh rate
-
-print(f"refr_rate{refr_rate}")
-if refr_rate is None:
-    refr_rate = 120.0 # if could not get reliable refresh rate
-
-if refr_rate is not None:
-    frameDur = 1.0/round(refr_rate)
-else:
-    frameDur = 1.0/round(refr_rate)  # couldn't get a reliable measure so guess
+# refresh rate from the per-monitor calibration cache (in the data folder);
+# a full measurement runs only when the entry is missing, stale or disagrees
+calibration = calibrate(myWin, monName, monInfo, os.path.abspath(CACHE_NAME))
+refr_rate = calibration["refresh_rate"]
+frameDur = 1.0/round(refr_rate)
 
-# physical quartet motion setup 
+# physical quartet motion setup (Motion: Physical): instead of jumping, the
+# squares glide to the next pair's positions over physical_duration
 physical_duration = 0.5  # Total duration of the motion (seconds)
 num_frames_physical = int(physical_duration * refr_rate)  # Number of frames for the motion
 frame_interval = physical_duration / num_frames_physical  # Time per frame
-phases = np.linspace(0, 1, num_frames_physical)  # Phase values from 0 to 1
+phases = np.arange(1, num_frames_physical + 1) / num_frames_physical  # glide progress on each frame (ends at 1)
+
+def glide_phases(duration):
+    """Glide progress per frame for pair intervals of `duration` (the whole interval if it is shorter)."""
+    n_frames = frames_for(duration, frameDur)
+    if n_frames >= num_frames_physical:
+        return phases
+    return np.arange(1, n_frames + 1) / n_frames
+
+# every frame of every Phase 1 glide (ratio x pair x frame x square x xy, pixels; per eccentricity)
+sweep_trajectories = None
+if MOTION == "physical":
+    sweep_trajectories = {ecc: TrajectoryTable(table, glide_phases(phase1["duration"]))
+                          for ecc, table in sweep_geometries.items()}
 
 logFile.write('RefreshRate=' + str(refr_rate) + '\n')
 logFile.write('FrameDuration=' + str(frameDur) + '\n')
+check_rate, interval_sd = calibration['check_rate'], calibration['interval_sd_ms']
+logFile.write(f"RefreshCalibration={calibration['source']}: {refr_rate:.3f} Hz measured vs "
+              f"{calibration['declared_rate']:g} Hz declared "
+              f"(quick check {'none' if check_rate is None else f'{check_rate:.3f} Hz'}, "
+              f"interval SD {'n/a' if interval_sd is None else f'{interval_sd:.3f}'} ms)\n")
+if calibration['reason']:
+    logFile.write(f"RefreshCalibration full measurement: {calibration['reason']}\n")
+if abs(refr_rate - calibration['declared_rate']) > 0.01 * calibration['declared_rate']:
+    logFile.write(f"WARNING: measured refresh rate {refr_rate:.2f} Hz differs from the declared "
+                  f"{calibration['declared_rate']:g} Hz of monitor {monName}\n")
 
 # define clock
 clock = core.Clock()
 logging.setDefaultClock(clock)
 
+# key presses time-stamped at key-down on the experiment clock
+responses = ResponseBox(clock)
+logFile.write('ResponseKeyboard=' + responses.describe() + '\n')
+
+# flip telemetry (opt-in): flip timestamps are on the experiment clock
+telemetry = FlipTelemetry(frameDur) if TELEMETRY else None
+
 # %% FUNCTIONS
 # ==============================================================================
 
-# Calculate the Hori/Verti distances
-def ratio2dist(ratio, radius):
-    """
-    Calculate the horizontal (Hori) and vertical (Verti) distances
-    for a point on a circle given the radius and a ratio.
-    """
-    angle = np.arctan(ratio)  # Ratio to Angle in radians
-    Hori = radius * np.cos(angle)  # Horizontal distance
-    Verti = radius * np.sin(angle)  # Vertical distance
-    return Hori, Verti
-
-# Generate quartets on the screen
-def show_quartets(Hori, Verti, pair, is_green=False):
-    if pair == 0:  # Left-tilted pair
-        Square.setPos((-Hori, Verti))
-        Square.draw()
-        Square.setPos((Hori, -Verti))
-        Square.draw()
-    elif pair == 1:  # Right-tilted pair
-        Square.setPos((Hori, Verti))
-        Square.draw()
-        Square.setPos((-Hori, -Verti))
-        Square.draw()
-    else:
-        raise ValueError("Invalid value for pair. Use 0 for left-tilted or 1 for right-tilted.")
-    dotFix.draw()
-    if is_green:
-        dotFix_green.draw()
-
-# Show Fixation
-def show_fixation(dotFix, win, duration, is_green=False):
+# Show Fixation (work done in `during` is taken out of the wait, not added to it)
+def show_fixation(dotFix, win, duration, is_green=False, during=None):
     dotFix.draw()
     if is_green:
         dotFix_green.draw()
     win.flip()
-    core.wait(duration)
+    if during is None:
+        core.wait(duration)
+    else:
+        start = core.getTime()
+        during()
+        core.wait(max(0.0, duration - (core.getTime() - start)))
 
 # # Quartet: left-tilted dot pair
 # def quartetPart1(Hori, Verti):
@@ -449,10 +558,78 @@ def show_fixation(dotFix, win, duration, is_green=False):
 
 def check_for_escape():
     """Check if the Escape key is pressed and exit the program."""
-    keys = event.getKeys(keyList=['escape'])
-    if 'escape' in keys:
+    keys = responses.get_keys(['escape'])
+    if keys:
+        journal.close()  # completed trials are already on disk
+        logFile.close()  # flush the queued log records
         core.quit()
 
+# One method-of-limits sweep (sweep: indices into range_ratio, in presentation order)
+def present_sweep(sweep, eccentricity, start_pair, duration, resp_delay, trial_no, phase_tag, motion="apparent"):
+    """
+    Show the sweep until the space bar is pressed (after resp_delay) or the
+    list is over. Returns (schedule, frame, key) with key = (name, time) or None;
+    frame is the frame that was on screen when the key went down.
+    """
+    # compile the frame schedule (pair swap per 250 ms, ratio step per cycle)
+    schedule = compile_phase1_schedule(range_ratio[sweep], start_pair, duration, frameDur, resp_delay)
+    sweep_index = sweep[schedule["step"]]
+    if motion == "physical":
+        trial_xys = sweep_trajectories[eccentricity].frame_xys(sweep_index, schedule["pair"],
+                                                               schedule["flip"], schedule["tick"])
+    else:
+        trial_xys = sweep_geometries[eccentricity].frame_xys(sweep_index, schedule["pair"])
+    flip_times = np.full(schedule["n_frames"], np.inf)
+    responses.clear()  # presses from the instruction screens or an earlier stage
+
+    for frame in range(schedule["n_frames"]):
+        check_for_escape()
+        if phase1["frame_cache"] and motion != "physical":
+            frame_caches[eccentricity].draw(sweep_index[frame], schedule["pair"][frame])
+        else:
+            Square.draw(trial_xys[frame])
+        flip_time = myWin.flip()
+        flip_times[frame] = flip_time
+        if telemetry is not None:
+            telemetry.record(flip_time, trial_no, phase_tag, schedule["pair"][frame])
+
+        # Check for button presses during each frame; the response is the
+        # frame on screen at key-down, not the frame on which it was read
+        keys = responses.get_keys(['space'])
+        if keys:
+            key_frame = press_frame(flip_times, keys[0][1])
+            if key_frame >= schedule["resp_frame"]:
+                return schedule, key_frame, keys[0]  # the key and its timestamp
+    return schedule, frame, None
+
+# One Phase 1 trial: a linear sweep, or coarse sweep + fine re-sweep around the response
+def run_limits_trial(direction, eccentricity, start_pair, duration, resp_delay, trial_no, phase_tag,
+                     motion="apparent"):
+    """
+    Returns (schedule, frame, key) of the sweep that gave the response and
+    the ratio reported in the coarse sweep (None in linear mode). Without a
+    response in the fine sweep, the coarse response is kept.
+    """
+    sweep = list_index[direction]
+    coarse_ratio = None
+    if COARSE_TO_FINE:
+        schedule, frame, key = present_sweep(sweep[::phase1["coarse_step"]], eccentricity, start_pair,
+                                             duration, resp_delay, trial_no, phase_tag, motion)
+        if key is None:
+            return schedule, frame, None, None
+        coarse = schedule, frame, key
+        coarse_ratio = schedule["resp_ratio"][frame]
+        start, stop = fine_sweep_range(len(sweep), phase1["coarse_step"], schedule["step"][frame],
+                                       phase1["coarse_back_off"], phase1["coarse_overshoot"])
+        sweep = sweep[start:stop]
+        show_fixation(dotFix, myWin, phase1["stage_gap"])
+        phase_tag = phase_tag + "_fine"
+    schedule, frame, key = present_sweep(sweep, eccentricity, start_pair, duration, resp_delay, trial_no,
+                                         phase_tag, motion)
+    if key is None and coarse_ratio is not None:
+        schedule, frame, key = coarse
+    return schedule, frame, key, coarse_ratio
+
         
 # %% INSTRUCTIONS
 # ==============================================================================
@@ -474,6 +651,16 @@ pracText.draw()
 myWin.flip()
 event.waitKeys(timeStamped=False)
 
+# Pre-render the whole ratio sweep (optional; physical motion draws the precomputed glides)
+for ecc in eccentricities:
+    if sweep_trajectories is not None:
+        logFile.write(f"Phase 1 Trajectories ({ecc:g} dva): {len(sweep_trajectories[ecc])} frames per glide, "
+                      f"{sweep_trajectories[ecc].memory_bytes() / 2**10:.1f} KB\n")
+    elif phase1["frame_cache"]:
+        frame_caches[ecc].build(sweep_geometries[ecc])
+        logFile.write(f"Phase 1 Frame Cache ({ecc:g} dva): {len(frame_caches[ecc])} frames, "
+                      f"{frame_caches[ecc].memory_bytes() / 2**20:.1f} MB\n")
+
 # reset clocks
 clock.reset()
 practice_start_time = clock.getTime()
@@ -485,46 +672,17 @@ logFile.write(f'Time at start of practice trials is {clock.getTime()}\n')
 
 for trial in range(phase1["num_practice"]):
 
-    trial_start_time = clock.getTime()
-
-    trial_pair = np.random.randint(0, 2)
-    trial_list_ratio = list_ratio[np.random.choice(["ascending", "descending"])]
-
-    response_recorded = False
-    response_key = None
-    response_time = None
-    trial_ratio = None
-
-    n_flip = 0
-    n_step = 0
-    HoriDist, VertiDist = ratio2dist(trial_list_ratio[n_step], circle_radius)
-
-    # Stimuli presentation until response
-    while response_recorded is False:
-        check_for_escape()
-        # switch pair (per 250 ms)
-        if clock.getTime() - trial_start_time > phase1["duration"] * (n_flip+1):
-            trial_pair = 1 - trial_pair
-            n_flip += 1
-            # switch ratio (per 1 cycle of quartet)
-            if n_flip % 2 == 0: 
-                if n_step >= len(trial_list_ratio): # exit if the list is over
-                    break
-                trial_ratio = trial_list_ratio[n_step]
-                HoriDist, VertiDist = ratio2dist(trial_ratio, circle_radius)
-                n_step += 1
-        show_quartets(HoriDist, VertiDist, trial_pair)
-        myWin.flip()
-
-        # Check for button presses during each frame
-        keys = event.getKeys(keyList=['space'], timeStamped=clock)
-        if keys and not response_recorded and clock.getTime() - trial_start_time > phase1["response_delay"]:
-            response_key, response_time = keys[0]  # Extract the key and timestamp
-            response_recorded = True  # Mark the response as recorded
+    # Stimuli presentation until response (or until the list is over)
+    trial_dir = np.random.choice(["ascending", "descending"])
+    schedule, frame, key, coarse_ratio = run_limits_trial(trial_dir, eccentricities[trial % len(eccentricities)],
+                                                          np.random.randint(0, 2),
+                                                          phase1["duration"], phase1["response_delay"],
+                                                          trial + 1, "practice", MOTION)
+    response_recorded = key is not None
 
     # Response Feedback
     if response_recorded:
-        dotFix_green.draw() #show_quartets(HoriDist, VertiDist, trial_pair, is_green=True)
+        dotFix_green.draw()
     else:
         norespText.draw()
     myWin.flip()
@@ -545,53 +703,35 @@ event.waitKeys(timeStamped=False)
 # %% RUN PHASE 1
 # ==============================================================================
 
-logFile.write(f'Phase 1: Method of Limits\n')
+logFile.write(f'Phase 1: Method of Limits ({expInfo.get("phase1_mode", "Linear")} sweep)\n')
+phase1_start_time = clock.getTime()
 
-for trial in phase1_conditions:
+for trial in phase1_conditions[journal.completed("phase1"):]:
 
     logFile.write(f'Phase 1: Time at start of trial {trial["Trial"]} is {clock.getTime()}\n')
-    trial_start_time = clock.getTime()
 
     trial_pair = 0 if trial["QuartetOrder"] == "left_tilted" else 1
-    trial_list_ratio = list_ratio[trial["RatioDir"]]
-
-    response_recorded = False
-    response_key = None
-    response_time = None
-    trial_ratio = None
-    n_flip = 0
-    n_step = 0
-    HoriDist, VertiDist = ratio2dist(trial_list_ratio[n_step], circle_radius)
-
-    # Stimuli presentation until response
-    while response_recorded is False:
-        check_for_escape()
-        # switch pair (per 250 ms)
-        if clock.getTime() - trial_start_time > trial["Duration"] * (n_flip+1):
-            trial_pair = 1 - trial_pair
-            n_flip += 1
-            # switch ratio (per 1 cycle of quartet)
-            if n_flip % 2 == 0: 
-                if n_step >= len(trial_list_ratio): # exit if the list is over
-                    break
-                trial_ratio = trial_list_ratio[n_step]
-                HoriDist, VertiDist = ratio2dist(trial_ratio, circle_radius)
-                n_step += 1
-        show_quartets(HoriDist, VertiDist, trial_pair)
-        myWin.flip()
-
-        # Check for button presses during each frame
-        keys = event.getKeys(keyList=['space'], timeStamped=clock)
-        if keys and not response_recorded and clock.getTime() - trial_start_time > trial["RespDelay"]:
-            response_key, response_time = keys[0]  # Extract the key and timestamp
-            response_recorded = True  # Mark the response as recorded    
-            # Record response
-            trial["ResponseKey"] = response_key
-            trial["ResponseTime"] = response_time - trial_start_time
+    trial_start_time = clock.getTime()
 
-    # Record stimulus on response
-    trial["ResponseFlip"] = n_flip if response_recorded else None
-    trial["ResponseRatio"] = trial_ratio if response_recorded else None
+    # Stimuli presentation until response (or until the list is over)
+    schedule, frame, key, coarse_ratio = run_limits_trial(trial["RatioDir"],
+                                                          trial.get("Eccentricity", eccentricities[0]),
+                                                          trial_pair, trial["Duration"],
+                                                          trial["RespDelay"], trial["Trial"], "phase1",
+                                                          trial.get("Motion", "apparent"))
+    response_recorded = key is not None
+    if response_recorded:
+        response_key, response_time = key
+        # Record response
+        trial["ResponseKey"] = response_key
+        trial["ResponseTime"] = response_time - trial_start_time
+
+    # Record stimulus on response (in the sweep that ended the trial)
+    trial_ratio = schedule["resp_ratio"][frame]
+    trial["ResponseFlip"] = int(schedule["flip"][frame]) if response_recorded else None
+    trial["ResponseRatio"] = trial_ratio if response_recorded and not np.isnan(trial_ratio) else None
+    if COARSE_TO_FINE:
+        trial["CoarseRatio"] = coarse_ratio if coarse_ratio is not None and not np.isnan(coarse_ratio) else None
 
     logFile.write(f'Phase 1: Time at the end of trial {trial["Trial"]} is {clock.getTime()}\n')
     
@@ -602,24 +742,60 @@ for trial in phase1_conditions:
         trial["ResponseTime"] = None
 
     show_fixation(dotFix, myWin, trial["FeedbackTime"], is_green=True)
-    show_fixation(dotFix, myWin, trial["ITI"])
+    show_fixation(dotFix, myWin, trial["ITI"], during=lambda: journal.append_trial("phase1", trial))
     
     # Log response
     logFile.write(f"Phase 1: Trial {trial['Trial']} Response: {trial['ResponseKey']} at {trial['ResponseTime']} sec\n")
 
     # Interblock break
-    if trial["Trial"] % phase1["num_trials"] == 0 and trial["Trial"] < phase1["num_trials"] * phase1["num_runs"]:
+    if trial["Trial"] % phase1["trials_per_run"] == 0 and trial["Trial"] < phase1["trials_per_run"] * phase1["num_runs"]:
         show_break(phase1["num_runs"] - trial["Run"]).draw()
         myWin.flip()
         event.waitKeys()
     
+phase1_end_time = clock.getTime()
+logFile.write(f"Phase 1 Duration: {phase1_end_time - phase1_start_time:.1f} s\n")
+
+def save_columnar(df, suffix, phase, subject_ratio=None):
+    """
+    Typed columnar copy of a phase ({outFileName}{suffix}.feather) with the
+    session metadata embedded; returns its path, or None if not written
+    (the CSV is the primary record, so a failure here is only logged).
+    """
+    if not HAVE_PYARROW:
+        logFile.write(f"Columnar {phase} output skipped: pyarrow is not installed\n")
+        return None
+    path = outFileName + suffix + COLUMNAR_SUFFIX
+    metadata = {"expInfo": {key: str(value) for key, value in expInfo.items()},
+                "refr_rate": refr_rate, "eccentricities": eccentricities, "subject_ratio": subject_ratio}
+    try:
+        write_phase(df, path, phase, metadata, condition_labels=phase2["condition_labels"])
+    except Exception as err:
+        logFile.write(f"Columnar {phase} output failed: {type(err).__name__}: {err}\n")
+        return None
+    logFile.write(f"Columnar {phase} copy saved to {path}\n")
+    return path
+
+
 # Convert conditions to a DataFrame
 phase1_df = pd.DataFrame(phase1_conditions)
-# Save responses DataFrame to the Output folder as a CSV file
+# Save responses DataFrame to the Output folder as a CSV file (and a typed columnar copy)
 phase1_df.to_csv(outFileName + '_p1.csv', index=False)
+p1_path = save_columnar(phase1_df, '_p1', "phase1") or outFileName + '_p1.csv'
 
 # Log the saving process 
 logFile.write(f"Phase 1 Responses saved to {outFileName}.csv\n")
+logFile.write(logFile.stats_line())
+logFile.write(journal.stats_line())
+logFile.write(text_pool.stats_line())
+
+# Save frame-interval telemetry (practice + phase 1)
+# (skipped when a resumed session had already finished this phase)
+p1_timing = telemetry.trial_stats(phases=["practice", "phase1", "practice_fine", "phase1_fine"]) if telemetry is not None else None
+if p1_timing is not None and len(p1_timing):
+    p1_timing.to_csv(outFileName + '_p1_timing.csv', index=False)
+    logFile.write(f"Phase 1 Dropped Frames: {p1_timing['Dropped'].sum()} "
+                  f"(max overshoot {p1_timing['MaxOvershoot'].max():.4f} s)\n")
 
 # End of phase 1 instrunctions
 bridgeText.draw()
@@ -629,18 +805,8 @@ event.waitKeys()
 # %% CALCULATE PERSONALIZED ASPECT RATIO
 # ==============================================================================
 
-# Filter by 'ascending' and 'descending' bins
-ascending_bin = phase1_df[phase1_df["RatioDir"] == "ascending"]
-descending_bin = phase1_df[phase1_df["RatioDir"] == "descending"]
-
-# Calculate means in angles
-ascending_mean_rad = np.arctan(
-    ascending_bin[ascending_bin["ResponseKey"].notna()]["ResponseRatio"].astype(float)
-).mean()
-descending_mean_rad = np.arctan(
-    descending_bin[descending_bin["ResponseKey"].notna()]["ResponseRatio"].astype(float)
-).mean()
-overall_mean_rad = (ascending_mean_rad + descending_mean_rad) / 2
+# Calculate means in angles (ascending, descending and overall)
+ascending_mean_rad, descending_mean_rad, overall_mean_rad = phase1_means(phase1_df)
 
 # Calculate means in ratio
 ascending_mean = np.tan(ascending_mean_rad)
@@ -652,16 +818,59 @@ logFile.write(f"Ascending Mean Ratio: {ascending_mean:.4f}\n")
 logFile.write(f"Descending Mean Ratio: {descending_mean:.4f}\n")
 logFile.write(f"Overall Mean Ratio: {overall_mean_ratio:.4f}\n")
 
-# Generate personalized aspect ratio
+# Generate personalized aspect ratio (one set per eccentricity, from its own Phase 1 estimate)
 mystep_rad = 0.075
-myrange_rad = [overall_mean_rad + i * mystep_rad for i in range(-3, 5)]
-myrange_ratio = np.tan(myrange_rad) 
-subject_ratio = {label: value for label, value in zip(phase2["condition_labels"], myrange_ratio)}
+phase1_estimates = {}  # eccentricity -> Phase 1 overall mean (rad)
+subject_ratios = {}  # eccentricity -> {condition label: ratio}
+for ecc in eccentricities:
+    ecc_df = phase1_df[phase1_df["Eccentricity"] == ecc] if len(eccentricities) > 1 else phase1_df
+    phase1_estimates[ecc] = phase1_means(ecc_df)[2]
+    subject_ratios[ecc] = personalized_ratios(phase1_estimates[ecc], phase2["condition_labels"], mystep_rad)[1]
+if journal.subject_ratio is not None:
+    # resumed in Phase 2: keep showing the ratios the session started with
+    saved_ratio = journal.subject_ratio
+    subject_ratios = ({ecc: saved_ratio[ratio_key(ecc)] for ecc in eccentricities}
+                      if is_per_eccentricity(saved_ratio) else {eccentricities[0]: saved_ratio})
+# a single eccentricity keeps the flat {label: ratio} set (journal, analysis and report)
+subject_ratio = (subject_ratios[eccentricities[0]] if len(eccentricities) == 1
+                 else {ratio_key(ecc): ratios for ecc, ratios in subject_ratios.items()})
+if journal.subject_ratio is None:
+    journal.append("subject_ratio", ratios=subject_ratio)
+myrange_ratios = {ecc: np.array([ratios[label] for label in phase2["condition_labels"]])
+                  for ecc, ratios in subject_ratios.items()}
 
 # Log the personalized aspect ratio
 logFile.write("Personalized Aspect Ratios:\n")
-for label, ratio in subject_ratio.items():
-    logFile.write(f"{label}: {ratio:.4f}\n")
+for ecc in eccentricities:
+    if len(eccentricities) > 1:
+        logFile.write(f"Eccentricity {ecc:g} dva (Phase 1 Mean Ratio: {np.tan(phase1_estimates[ecc]):.4f}):\n")
+    for label, ratio in subject_ratios[ecc].items():
+        logFile.write(f"{label}: {ratio:.4f}\n")
+
+# Geometry of the personalized ratios (same order as the condition labels)
+subject_geometries = {ecc: GeometryTable.from_monitor(myrange_ratios[ecc], ecc, SquareSize, moni)
+                      for ecc in eccentricities}
+
+# Pre-render the 8 personalized ratios x 2 pairs (physical motion: precompute their glides)
+subject_trajectories = {}
+for ecc in eccentricities:
+    if MOTION == "physical":
+        subject_trajectories[ecc] = TrajectoryTable(subject_geometries[ecc], glide_phases(phase2["duration"]))
+        logFile.write(f"Phase 2 Trajectories ({ecc:g} dva): {len(subject_trajectories[ecc])} frames per glide, "
+                      f"{subject_trajectories[ecc].memory_bytes() / 2**10:.1f} KB\n")
+    else:
+        frame_caches[ecc].build(subject_geometries[ecc], keys=phase2["condition_labels"])
+        logFile.write(f"Phase 2 Frame Cache ({ecc:g} dva): {len(frame_caches[ecc])} frames, "
+                      f"{frame_caches[ecc].memory_bytes() / 2**20:.1f} MB\n")
+
+# Adaptive engines, one per eccentricity (replay the completed trials of a resumed session)
+psi = None
+if ADAPTIVE:
+    psi = {ecc: PsiPhase2(phase2["condition_labels"], myrange_ratios[ecc], phase1_estimates[ecc])
+           for ecc in eccentricities}
+    for trial in phase2_conditions[:journal.completed("phase2")]:
+        psi[trial.get("Eccentricity", eccentricities[0])].update(trial["ConditionRatio"],
+                                                                 trial.get("ResponseLabel"))
 
 
 # %% RUN PHASE 2
@@ -671,45 +880,65 @@ for label, ratio in subject_ratio.items():
 phase2Text.draw()
 myWin.flip()
 event.waitKeys()
-logFile.write(f'Phase 2: Method of Constant Stimuli\n')
+logFile.write(f'Phase 2: {"Adaptive (psi method)" if ADAPTIVE else "Method of Constant Stimuli"}\n')
 
-for trial in phase2_conditions:
+def end_of_phase2_trial(trial):
+    """Journal the trial and update the adaptive posterior (runs in the ITI)."""
+    journal.append_trial("phase2", trial)
+    if psi is not None:
+        psi[trial.get("Eccentricity", eccentricities[0])].update(trial["ConditionRatio"], trial["ResponseLabel"])
+
+for trial in phase2_conditions[journal.completed("phase2"):]:
+
+    trial_ecc = trial.get("Eccentricity", eccentricities[0])
+
+    # Adaptive mode: stop once the PSE is precise enough (at every eccentricity),
+    # skip the trials of eccentricities that are done, else pick the next condition
+    if psi is not None:
+        if all(engine.done(phase2["target_ci_width"], phase2["min_trials"]) for engine in psi.values()):
+            break
+        if psi[trial_ecc].done(phase2["target_ci_width"], phase2["min_trials"]):
+            journal.append_trial("phase2", dict(trial, Skipped=True))  # keeps a resume aligned with the plan
+            continue
+        trial["ConditionRatio"] = psi[trial_ecc].next_condition()
      
     logFile.write(f'Phase 2: Time at start of trial {trial["Trial"]} is {clock.getTime()}\n')
 
     trial_pair = 0 if trial["QuartetOrder"] == "left_tilted" else 1
-    trial_ratio = subject_ratio[trial["ConditionRatio"]]
+    trial_ratio = subject_ratios[trial_ecc][trial["ConditionRatio"]]
     trial["trial_ratio"] = trial_ratio # record in the df what the ratio is 
-    HoriDist, VertiDist = ratio2dist(trial_ratio, circle_radius)
+
+    # compile the frame schedule (1st frame, then pair swaps for predetermined cycles)
+    schedule = compile_phase2_schedule(trial_ratio, trial_pair, trial["Duration_F1"],
+                                       trial["Duration"], trial["Cycle"], frameDur)
+    trial_xys = None
+    if trial.get("Motion") == "physical":
+        condition_index = np.full(schedule["n_frames"], phase2["condition_labels"].index(trial["ConditionRatio"]))
+        trial_xys = subject_trajectories[trial_ecc].frame_xys(condition_index, schedule["pair"],
+                                                              schedule["flip"], schedule["tick"])
 
     response_recorded = False
     response_key = None
     response_time = None
 
-    trial_start_time = clock.getTime()
-    n_flip = 0
-    next_flip_time = trial["Duration_F1"] # duration for 1st frame
-
     # Stimuli presentation (for predetermined cycles)
-    while 1:
+    for frame in range(schedule["n_frames"]):
         check_for_escape()
-        # switch pair
-        if clock.getTime() - trial_start_time > next_flip_time:
-            trial_pair = 1 - trial_pair
-            n_flip += 1
-            next_flip_time += trial["Duration"]
-        if n_flip >= trial["Cycle"] * 2:
-            break
-        show_quartets(HoriDist, VertiDist, trial_pair)
-        myWin.flip()
-    event.clearEvents(eventType='keyboard')
+        if trial_xys is None:
+            frame_caches[trial_ecc].draw(trial["ConditionRatio"], schedule["pair"][frame])
+        else:
+            Square.draw(trial_xys[frame])
+        flip_time = myWin.flip()
+        if telemetry is not None:
+            telemetry.record(flip_time, trial["Trial"], "phase2", schedule["pair"][frame])
+    responses.clear()
     trial_resp_window = clock.getTime()
 
     # Check for button presses (until response or max report time)
     while response_recorded is False:
         check_for_escape()
-        keys = event.getKeys(keyList=['v', 'h'], timeStamped=clock)
-        if keys and not response_recorded and clock.getTime() - trial_resp_window > trial["RespDelay"]:  # Process only the first response
+        keys = responses.get_keys(['v', 'h'])
+        if keys and not response_recorded and keys[0][1] - trial_resp_window > trial["RespDelay"]:  # Process only the first response
             response_key, response_time = keys[0]  # Extract the key and timestamp
             response_recorded = True  # Mark the response as recorded    
             response_label = key_to_label[response_key]
@@ -729,24 +958,52 @@ for trial in phase2_conditions:
         trial["ResponseTime"] = None
         trial["ResponseLabel"] = None
     show_fixation(dotFix, myWin, trial["FeedbackTime"], is_green=True)
-    show_fixation(dotFix, myWin, trial["ITI"])
+    show_fixation(dotFix, myWin, trial["ITI"], during=lambda: end_of_phase2_trial(trial))
         
     # Log response
     logFile.write(f"Phase 2: Trial {trial['Trial']} Response: {trial['ResponseKey']} at {trial['ResponseTime']} sec\n")
 
     # Interblock break
-    if trial["Trial"] % phase2["num_trials"] == 0 and trial["Trial"] < phase2["num_trials"] * phase2["num_runs"]:
+    if trial["Trial"] % phase2["trials_per_run"] == 0 and trial["Trial"] < phase2["trials_per_run"] * phase2["num_runs"]:
         show_break(phase2["num_runs"] - trial["Run"]).draw()
         myWin.flip()
         event.waitKeys()
     
+# Release the pre-rendered frames
+for cache in frame_caches.values():
+    cache.invalidate()
+
 # Convert conditions to a DataFrame
+if psi is not None:
+    # only the trials run before the adaptive stop
+    phase2_conditions = [trial for trial in phase2_conditions if "ResponseKey" in trial]
+    for ecc, engine in psi.items():
+        pse_lo, pse_hi = engine.pse_ci()
+        logFile.write(f"Adaptive Phase 2{f' ({ecc:g} dva)' if len(psi) > 1 else ''}: stopped after "
+                      f"{engine.n_trials} trials, posterior PSE {engine.pse_mean():.4f} rad, "
+                      f"95% CI [{pse_lo:.4f}, {pse_hi:.4f}] rad\n")
 phase2_df = pd.DataFrame(phase2_conditions)
-# Save responses DataFrame to the Output folder as a CSV file
+# Save responses DataFrame to the Output folder as a CSV file (and a typed columnar copy)
 phase2_df.to_csv(outFileName + '_p2.csv', index=False)
+p2_path = save_columnar(phase2_df, '_p2', "phase2", subject_ratio=subject_ratio) or outFileName + '_p2.csv'
 
 # Log the saving process 
 logFile.write(f"Phase 2 Responses saved to {outFileName}.csv\n")
+logFile.write(logFile.stats_line())
+logFile.write(journal.stats_line())
+logFile.write(text_pool.stats_line())
+
+# Both phases are saved: the session is no longer resumable
+journal.append("end")
+journal.close()
+
+# Save frame-interval telemetry (phase 2)
+# (skipped when a resumed session had already finished this phase)
+p2_timing = telemetry.trial_stats(phases=["phase2"]) if telemetry is not None else None
+if p2_timing is not None and len(p2_timing):
+    p2_timing.to_csv(outFileName + '_p2_timing.csv', index=False)
+    logFile.write(f"Phase 2 Dropped Frames: {p2_timing['Dropped'].sum()} "
+                  f"(max overshoot {p2_timing['MaxOvershoot'].max():.4f} s)\n")
 
 
 # %% Wrap up the data ...
@@ -758,254 +1015,36 @@ myWin.flip()
 baseFileName = outFolderName + os.path.sep + '%s_%s' % (
     expInfo['participant'], expInfo['expName'])
 
-# Phase 1 data: Density Plot
-# ==============================================================================
-
-ascending_bin["RatioDir"] = "Ascending"
-descending_bin["RatioDir"] = "Descending"
-combined_data = pd.concat([ascending_bin, descending_bin], ignore_index=True)
-
-p1_data = combined_data[combined_data["ResponseKey"].notna()].copy()
-p1_data["ResponseRad"] = np.arctan(p1_data["ResponseRatio"])
-
-summary_table = (
-    p1_data.groupby("RatioDir")
-    .agg(
-        MeanRad=("ResponseRad", "mean"),
-        SDRad=("ResponseRad", "std"),
-        MinRad=("ResponseRad", "min"),
-        MaxRad=("ResponseRad", "max"),
-        n=("ResponseRad", "count")
-    )
-    .reset_index()
-)
-
-# Add ratio versions
-summary_table["MeanRatio"] = np.tan(summary_table["MeanRad"])
-summary_table["SDRatio"] = np.tan(summary_table["SDRad"])
-summary_table["MinRatio"] = np.tan(summary_table["MinRad"])
-summary_table["MaxRatio"] = np.tan(summary_table["MaxRad"])
-
-
-# %% Density Plot in Radian
-
-plt.figure(figsize=(6, 2))
-sns.kdeplot(
-    data=p1_data,
-    x="ResponseRad",
-    hue="RatioDir",
-    fill=True,
-    common_norm=False,
-    alpha=0.5,
-    palette={"Ascending": "blue", "Descending": "red"}
-)
-
-for _, row in summary_table.iterrows():
-    plt.axvline(row["MeanRad"], color="blue" if row["RatioDir"] == "Ascending" else "red",
-                linestyle="--", linewidth=2)
-
-plt.title("Density Plot of Response by Direction")
-plt.xlabel("Response (Radian)")
-plt.ylabel("Density")
-plt.tight_layout()
-plt.savefig(baseFileName + '_Phase1_RadDensity.png', dpi=300)
-plt.close()
-
-# %% Density Plot in Ratio
-plt.figure(figsize=(6, 2))
-sns.kdeplot(
-    data=p1_data,
-    x="ResponseRatio",
-    hue="RatioDir",
-    fill=True,
-    common_norm=False,
-    alpha=0.5,
-    palette={"Ascending": "blue", "Descending": "red"}
-)
-
-for _, row in summary_table.iterrows():
-    plt.axvline(row["MeanRatio"], color="blue" if row["RatioDir"] == "Ascending" else "red",
-                linestyle="--", linewidth=2)
-
-plt.title("Density Plot of Response by Direction")
-plt.xlabel("Response (Ratio)")
-plt.ylabel("Density")
-plt.tight_layout()
-plt.savefig(baseFileName + '_Phase1_RatDensity.png', dpi=300)
-plt.close()
-
-# %% Phase 2 data: Estimate Psychometric Curve
-# ==============================================================================
-
-# Filter out invalid responses
-p2_data = phase2_df[phase2_df["ResponseKey"].notna()].copy()
-
-p2_data["ConditionRat"] = p2_data["ConditionRatio"].map(subject_ratio)
-p2_data["ConditionRad"] = np.arctan(p2_data["ConditionRat"].astype(float))
-p2_data["ResponseBinary"] = p2_data["ResponseLabel"].apply(lambda x: 1 if x == "vertical" else 0)
-
-# Model fitting 
-X = p2_data[["ConditionRad"]].values  # (n, 1) shape
-y = p2_data["ResponseBinary"].values  # (n,) shape
-
-model = LogisticRegression(solver="lbfgs", fit_intercept=True, max_iter=1000)
-model.fit(X, y)
-
-# Probability prediction for each ratio
-p2_data["PredictedProb"] = model.predict_proba(X)[:, 1]  # P(y=1)
-
-# Continuous predictions for visualization
-x_pred = np.linspace(X.min(), X.max(), 100).reshape(-1, 1)
-y_pred = model.predict_proba(x_pred)[:, 1]*100
-
-# calculate the PSE
-intercept = model.intercept_[0]
-slope = model.coef_[0][0]
-x_intercept = -intercept / slope
-
-# Summarize data for visualization
-data_summary = (
-    p2_data.groupby("ConditionRad")
-    .agg(
-        vertical_percent=("ResponseBinary", lambda x: x.mean() * 100),
-        n=("ResponseBinary", "count"),
-        se=("ResponseBinary", lambda x: x.std(ddof=1) / np.sqrt(len(x)) * 100)
-    )
-    .reset_index()
-)
-data_summary["ConditionRatio"] = np.tan(data_summary["ConditionRad"])
-
-# %% Plotting the results
-plt.figure(figsize=(6, 6))
-
-# fitted curve
-plt.plot(x_pred, y_pred, color='red', label='Fitted curve')
-
-# probability prediction + error bars
-plt.errorbar(
-    data_summary["ConditionRad"], 
-    data_summary["vertical_percent"],
-    yerr=data_summary["se"],
-    fmt='o', 
-    color='blue', 
-    ecolor='blue', 
-    capsize=3, 
-    label='Observed mean ± SE'
-)
-
-# PSE line
-plt.axvline(x=x_intercept, color='black', linestyle='--')
-plt.axhline(y=50, color='black', linestyle='--')
-plt.text(x_intercept+0.05, 3, f"PSE: {x_intercept:.2f}", fontweight='bold', ha='center', va='bottom')
-
-# Labels
-plt.xlabel("Angle in Radian")
-plt.ylabel("Prediction for Vertical Response (%)")
-plt.title("Psychometric Curve with Quartet Angle")
-plt.legend()
-plt.tight_layout()
-plt.savefig(baseFileName + '_Phase2_RadCurve.png', dpi=300)
-plt.close()
-
-# %% Plotting in ratio
-x_pred_rad = np.linspace(p2_data["ConditionRad"].min(), p2_data["ConditionRad"].max(), 100).reshape(-1, 1)
-y_pred_prob = model.predict_proba(x_pred_rad)[:, 1] * 100
-x_pred_ratio = np.tan(x_pred_rad.flatten())
-
-intercept = model.intercept_[0]
-slope = model.coef_[0][0]
-x_intercept_rad = -intercept / slope
-x_intercept_ratio = np.tan(x_intercept_rad)
-
-plt.figure(figsize=(6, 6))
-
-# Fitted curve
-plt.plot(x_pred_ratio, y_pred_prob, color='red', label='Fitted curve')
-
-# predictions + error bars
-plt.errorbar(
-    data_summary["ConditionRatio"], 
-    data_summary["vertical_percent"],
-    yerr=data_summary["se"],
-    fmt='o', 
-    color='blue', 
-    ecolor='blue', 
-    capsize=3, 
-    label='Observed mean ± SE'
-)
-
-# PSE
-plt.axvline(x=x_intercept_ratio, color='black', linestyle='--')
-plt.axhline(y=50, color='black', linestyle='--')
-plt.text(x_intercept_ratio+0.12, 3, f"PSE: {x_intercept_ratio:.2f}", fontweight='bold', ha='center', va='top')
-
-# Labels
-plt.xlabel("Aspect Ratio")
-plt.ylabel("Prediction for Vertical Response (%)")
-plt.title("Psychometric Curve with Quartet Ratio")
-plt.tight_layout()
-plt.legend()
-plt.savefig(baseFileName + '_Phase2_RatCurve.png', dpi=300)
-plt.close()
-
-
-# %% Save Markdown
-# ==============================================================================
-
-pse_rad = x_intercept
-pse_ratio = x_intercept_ratio
-subject_ratio_df = pd.DataFrame(list(subject_ratio.items()), columns=["Condition Label", "Aspect Ratio"])
-subject_ratio_df["Aspect Ratio"] = subject_ratio_df["Aspect Ratio"].map(lambda x: f"{x:.4f}")
-
-# Markdown
-mdFileName = baseFileName + '_summary.md'
-
-def img_md(filename, width=400):
-    return f'<img src="{filename}" width="{width}">'
-
-md_lines = [
-    f"# Summary Report for Participant {expInfo['participant']}\n",
-    f"**Experiment:** {expInfo['expName']}\n",
-    f"**Date:** {expInfo['date']}\n",
-
-    "## Phase 1 - Method of Limits\n",
-    "**Radian Density Plot:**\n",
-    img_md(os.path.basename(baseFileName) + "_Phase1_RadDensity.png") + "\n\n",
-
-    "**Ratio Density Plot:**\n",
-    img_md(os.path.basename(baseFileName) + "_Phase1_RatDensity.png") + "\n\n",
-
-    "**Summary Table:**\n",
-    summary_table.to_markdown(index=False), 
-    "\n\n",
-
-    "## Personalized Aspect Ratios\n",
-    subject_ratio_df.to_markdown(index=False),
-    "\n\n",
-
-    "## Phase 2 - Psychometric Curve\n",
-    "**Radian Version:**\n",
-    img_md(os.path.basename(baseFileName) + "_Phase2_RadCurve.png") + "\n\n",
-
-    "**Ratio Version:**\n",
-    img_md(os.path.basename(baseFileName) + "_Phase2_RatCurve.png") + "\n\n",
-
-    f"**Estimated PSE (in radian):** `{pse_rad:.4f}`\n",
-    f"**Estimated PSE (in ratio):** `{pse_ratio:.4f}`\n",
-]
-# Save as MD
-with open(mdFileName, 'w', encoding='utf-8') as f:
-    for line in md_lines:
-        f.write(line + '\n')
-
-with open(mdFileName, 'r', encoding='utf-8') as f:
-    md_text = f.read()
-
-html = markdown.markdown(md_text, extensions=['tables'])
-htmlFileName = mdFileName.replace('.md', '.html')
-
-with open(htmlFileName, 'w', encoding='utf-8') as f:
-    f.write(html)
+# Phase 1 summary, Phase 2 psychometric curve and PSE (figures are rendered below)
+results = analyze_session(phase1_df, phase2_df, expInfo, baseFileName, phase2["condition_labels"],
+                          mystep_rad=mystep_rad, subject_ratio=subject_ratio, render=False,
+                          C=None if ADAPTIVE else 1.0)
+summary_table = results["summary_table"]
+pse_rad = results["fit"]["pse_rad"]
+pse_ratio = results["fit"]["pse_ratio"]
+if results["fit"]["estimate"] == "psi posterior":
+    logFile.write("Phase 2 logistic fit has no finite optimum ("
+                  f"{'responses perfectly separated' if results['fit']['separated'] else 'not converged'}): "
+                  "PSE and CI from the psi posterior\n")
+logFile.write(f"Estimated PSE ({results['fit']['estimate']}): {pse_rad:.4f} rad, {pse_ratio:.4f} ratio\n")
+pse_rad_ci = results["bootstrap"]["pse_rad_ci"]
+pse_ratio_ci = results["bootstrap"]["pse_ratio_ci"]
+logFile.write(f"PSE 95% CI ({results['bootstrap']['method']}): [{pse_rad_ci[0]:.4f}, {pse_rad_ci[1]:.4f}] rad, "
+              f"[{pse_ratio_ci[0]:.4f}, {pse_ratio_ci[1]:.4f}] ratio\n")
+
+# PSE vs. eccentricity (all eccentricities fitted in one batched pass)
+by_eccentricity = results["by_eccentricity"]
+if by_eccentricity is not None:
+    by_eccentricity.to_csv(outFileName + '_pse_by_eccentricity.csv', index=False)
+    for row in by_eccentricity.itertuples():
+        logFile.write(f"Eccentricity {row.Eccentricity:g} dva: PSE {row.PSERad:.4f} rad, {row.PSERatio:.4f} ratio "
+                      f"(n = {row.n}, {row.Estimate})\n")
+
+# Figures and summary report in a detached worker process (poll the status file)
+report_status = start_render(p1_path, p2_path, expInfo, baseFileName,
+                             phase2["condition_labels"], subject_ratio=subject_ratio, mystep_rad=mystep_rad,
+                             C=None if ADAPTIVE else 1.0, bootstrap=results["bootstrap"])
+logFile.write(f"Report rendering handed off (status: {report_status})\n")
 
 # %% RUN PHASE 3
 # ==============================================================================
@@ -1052,7 +1091,7 @@ with open(htmlFileName, 'w', encoding='utf-8') as f:
 #             next_flip_time += trial["Duration"]
 #         if n_flip >= trial["Cycle"] * 2:
 #             break
-#         show_quartets(HoriDist, VertiDist, trial_pair)
+#         Square.draw(quartet_xys(HoriDist, VertiDist, trial_pair) * sweep_geometry.pix_per_deg)  # quartet_geometry.quartet_xys
 #         myWin.flip()
 #     trial_resp_window = clock.getTime()
 
@@ -1117,12 +1156,14 @@ with open(htmlFileName, 'w', encoding='utf-8') as f:
 
 
 # %% End of experiment
+logFile.write(logFile.stats_line())
 logFile.write("End of Experiment")
 endText.draw()
 myWin.flip()
 core.wait(5) # wait for 5 s
 myWin.close()
 event.Mouse(visible=False)
+logFile.close()
 
 try:
     core.quit()
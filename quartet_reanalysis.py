@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+OFFLINE BATCH RE-ANALYSIS FOR THE QUARTET PARITY RATIO EXPERIMENT
+*Discovers every session under {participant}_SubjData/{expName}/Output
+*Re-runs the end-of-session analysis (summary table, personalized ratios,
+ PSE, figures, summary) for each session in a process pool
+*Writes a consolidated group results table
+*Reads the typed columnar copies (_p1/_p2.feather) when a session has them
+ (no CSV parsing; personalized ratios and Phase 2 mode from their metadata)
+*Figures and summaries go through the render cache (quartet_artifacts): a
+ session whose artifacts are unchanged is not re-rendered
+
+Each session is analyzed in isolation: a failing session is reported in the
+group table (Status/Error columns) and does not stop the others. Figures and
+summaries are written next to the session CSVs with the session date in the
+name ({participant}_{expName}_{date}_...), so live-session reports are kept.
+
+Usage: python quartet_reanalysis.py ROOT [ROOT ...] [--workers N] [--no-render] [--invalidate-cache]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+os.environ.setdefault('MPLBACKEND', 'Agg')  # workers never open a display
+
+import numpy as np
+import pandas as pd
+
+from quartet_columnar import read_phase, HAVE_PYARROW, COLUMNAR_SUFFIX
+
+EXP_NAME = 'Prescan_MotQuart'
+CONDITION_LABELS = ["PR-3", "PR-2", "PR-1", "PR", "PR+1", "PR+2", "PR+3", "PR+4"]
+
+
+# %% SESSION DISCOVERY
+# ==============================================================================
+
+def find_sessions(roots, expName=EXP_NAME):
+    """
+    Sessions (one dict per _p1.csv with a matching _p2.csv) found under the
+    given data roots, sorted by participant and date.
+    """
+    sessions = []
+    for root in roots:
+        pattern = os.path.join(root, '*_SubjData', expName, 'Output', '*_p1.csv')
+        for p1_path in glob.glob(pattern):
+            prefix = p1_path[:-len('_p1.csv')]
+            p2_path = prefix + '_p2.csv'
+            if not os.path.isfile(p2_path):
+                continue
+            # outFileName = '{participant}_{expName}_{date}'
+            participant, _, date = os.path.basename(prefix).rpartition('_%s_' % expName)
+            if not participant:
+                continue
+            columnar = [prefix + suffix + COLUMNAR_SUFFIX for suffix in ('_p1', '_p2')]
+            sessions.append({
+                "participant": participant,
+                "date": date,
+                "expName": expName,
+                "p1_path": p1_path,
+                "p2_path": p2_path,
+                "columnar_paths": columnar if HAVE_PYARROW and all(map(os.path.isfile, columnar)) else None,
+                "baseFileName": prefix,
+                "journal_path": prefix + '_journal.jsonl',
+                "log_path": os.path.join(os.path.dirname(os.path.dirname(p1_path)), 'Logging',
+                                         os.path.basename(prefix) + '.log'),
+            })
+    return sorted(sessions, key=lambda s: (s["participant"], s["date"]))
+
+
+def session_subject_ratio(phase2_df, condition_labels=CONDITION_LABELS):
+    """
+    Personalized ratios actually shown in a session (from the trial_ratio
+    column of _p2.csv), or None if the column is missing. One set per
+    eccentricity (keyed by ratio_key) when the session ran several.
+    """
+    if "trial_ratio" not in phase2_df:
+        return None
+    if "Eccentricity" in phase2_df and phase2_df["Eccentricity"].nunique() > 1:
+        from quartet_analysis import ratio_key
+
+        return {ratio_key(e): session_subject_ratio(df, condition_labels)
+                for e, df in phase2_df.groupby("Eccentricity")}
+    shown = phase2_df.groupby("ConditionRatio", observed=True)["trial_ratio"].first()
+    return {label: shown[label] for label in condition_labels if label in shown.index}
+
+
+def load_session(session):
+    """
+    (phase1_df, phase2_df, metadata) of a session: from its columnar copies
+    if it has them (metadata as embedded in _p2), else from the CSVs ({}).
+    """
+    if session.get("columnar_paths"):
+        (phase1_df, _), (phase2_df, metadata) = map(read_phase, session["columnar_paths"])
+        return phase1_df, phase2_df, metadata
+    return pd.read_csv(session["p1_path"]), pd.read_csv(session["p2_path"]), {}
+
+
+def session_phase2_mode(session):
+    """
+    Phase 2 mode ("Constant" or "Adaptive") recorded in the session journal;
+    sessions without a journal predate the adaptive mode.
+    """
+    from quartet_journal import read_journal
+
+    if not os.path.isfile(session["journal_path"]):
+        return "Constant"
+    records = read_journal(session["journal_path"])
+    return records[0]["expInfo"].get("phase2_mode", "Constant") if records else "Constant"
+
+
+# %% SESSION WORKER
+# ==============================================================================
+
+def reanalyze_session(session, render=True, invalidate_cache=False, render_workers=None):
+    """
+    Analyze one session; never raises. Returns one row of the group table.
+    render_workers=1 renders in this process (inside a worker pool).
+    """
+    from quartet_analysis import analyze_session
+
+    row = {"Participant": session["participant"], "Date": session["date"],
+           "Session": os.path.basename(session["baseFileName"])}
+    t0 = time.perf_counter()
+    try:
+        phase1_df, phase2_df, metadata = load_session(session)
+        expInfo = {"participant": session["participant"], "expName": session["expName"],
+                   "date": session["date"]}
+        mode = metadata["expInfo"].get("phase2_mode", "Constant") if metadata else session_phase2_mode(session)
+        subject_ratio = metadata.get("subject_ratio") or session_subject_ratio(phase2_df)
+        row["Phase2Mode"] = mode
+        results = analyze_session(phase1_df, phase2_df, expInfo, session["baseFileName"],
+                                  CONDITION_LABELS, subject_ratio=subject_ratio,
+                                  render=render, C=None if mode == "Adaptive" else 1.0,
+                                  render_workers=render_workers, invalidate_cache=invalidate_cache)
+        fit = results["fit"]
+        row.update({
+            "P1Trials": len(phase1_df),
+            "P1Valid": len(results["p1_data"]),
+            "P2Trials": len(phase2_df),
+            "P2Valid": len(results["p2_data"]),
+            "AscendingMeanRad": results["ascending_mean_rad"],
+            "DescendingMeanRad": results["descending_mean_rad"],
+            "OverallMeanRad": results["overall_mean_rad"],
+            "OverallMeanRatio": np.tan(results["overall_mean_rad"]),
+            "Intercept": fit["intercept"],
+            "Slope": fit["slope"],
+            "PSERad": fit["pse_rad"],
+            "PSERatio": fit["pse_ratio"],
+            "PSEEstimate": fit["estimate"],
+            "Converged": fit["converged"],
+            "PSERadLo": results["bootstrap"]["pse_rad_ci"][0],
+            "PSERadHi": results["bootstrap"]["pse_rad_ci"][1],
+            "PSERatioLo": results["bootstrap"]["pse_ratio_ci"][0],
+            "PSERatioHi": results["bootstrap"]["pse_ratio_ci"][1],
+            "Status": "ok",
+            "Error": "",
+        })
+        if results["render"] is not None:
+            row["RenderHits"] = len(results["render"]["hits"])
+            row["RenderMisses"] = len(results["render"]["misses"])
+    except Exception as err:
+        row.update({"Status": "error",
+                    "Error": f"{type(err).__name__}: {err}",
+                    "Traceback": traceback.format_exc()})
+    row["Seconds"] = time.perf_counter() - t0
+    return row
+
+
+# %% BATCH RUN
+# ==============================================================================
+
+def reanalyze(sessions, workers=None, render=True, progress=True, invalidate_cache=False):
+    """
+    Re-analyze sessions in parallel (workers processes, default all cores;
+    with one worker, each session renders its artifacts concurrently instead).
+    Returns the group results table, one row per session.
+    """
+    workers = workers or os.cpu_count() or 1
+    rows = []
+    if workers == 1:
+        for session in sessions:
+            rows.append(reanalyze_session(session, render, invalidate_cache))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(reanalyze_session, session, render, invalidate_cache, 1) for session in sessions]
+            for n_done, future in enumerate(as_completed(futures), 1):
+                rows.append(future.result())
+                if progress:
+                    print(f"\r{n_done}/{len(futures)} sessions", end='', file=sys.stderr)
+        if progress and futures:
+            print(file=sys.stderr)
+    group_df = pd.DataFrame(rows)
+    if len(group_df):
+        group_df = group_df.sort_values(["Participant", "Date"]).reset_index(drop=True)
+    return group_df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-analyze every saved session in parallel.")
+    parser.add_argument('roots', nargs='+', help="folders holding {participant}_SubjData")
+    parser.add_argument('--exp-name', default=EXP_NAME)
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument('--no-render', action='store_true', help="skip figures and summaries")
+    parser.add_argument('--invalidate-cache', action='store_true', help="re-render every figure and summary")
+    parser.add_argument('--out', default='group_results.csv', help="group results table (CSV)")
+    args = parser.parse_args(argv)
+
+    sessions = find_sessions(args.roots, args.exp_name)
+    t0 = time.perf_counter()
+    group_df = reanalyze(sessions, workers=args.workers, render=not args.no_render,
+                         invalidate_cache=args.invalidate_cache)
+    elapsed = time.perf_counter() - t0
+    group_df.drop(columns=["Traceback"], errors='ignore').to_csv(args.out, index=False)
+
+    failed = group_df[group_df["Status"] == "error"] if len(group_df) else group_df
+    print(f"{len(sessions)} sessions in {elapsed:.1f} s ({len(failed)} failed) -> {args.out}")
+    if "RenderHits" in group_df:
+        print(f"render cache: {int(group_df['RenderHits'].sum())} hits, "
+              f"{int(group_df['RenderMisses'].sum())} misses")
+    for _, row in failed.iterrows():
+        print(f"  {row['Session']}: {row['Error']}")
+
+
+if __name__ == '__main__':
+    main()
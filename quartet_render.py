@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+OUT-OF-PROCESS REPORT RENDERING FOR THE QUARTET PARITY RATIO EXPERIMENT
+*start_render(): hands the end-of-session figures and summary report to a
+ detached worker process and returns immediately
+*The worker reads the saved _p1/_p2 files (CSV or columnar), runs
+ analyze_session(render=True) with the bootstrap CI passed in the job (not
+ resampled again) and reports its progress in a status file
+ ({baseFileName}_report_status.json)
+
+Status file (JSON, replaced atomically): "state" is one of queued, running,
+done or error, with "pid", "queued"/"started"/"finished" timestamps (epoch
+seconds), "outputs" (figure and summary paths), "pse_rad"/"pse_ratio" and
+the render cache "hits"/"misses" when done, or "error" and "traceback" on
+failure.
+
+The worker runs in its own session, so it outlives the experiment script
+(core.quit() / os._exit()) and the display can be released right away.
+
+Usage (worker side, normally started by start_render):
+    python quartet_render.py JOB_JSON
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+import traceback
+
+from quartet_artifacts import ARTIFACTS
+from quartet_bootstrap import bootstrap_summary
+
+STATUS_SUFFIX = '_report_status.json'
+REPORT_SUFFIXES = [suffix for suffixes in ARTIFACTS.values() for suffix in suffixes]
+
+
+def write_status(path, **fields):
+    """Replace the status file atomically (readers never see a partial file)."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(fields, f, indent=1)
+    os.replace(tmp, path)
+
+
+def read_status(path):
+    """Current status dict, or None if there is no status file yet."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def wait_for(path, timeout=None, poll=0.2):
+    """Poll a status file until the job is done or failed; returns the status (None on timeout)."""
+    t0 = time.monotonic()
+    while timeout is None or time.monotonic() - t0 < timeout:
+        status = read_status(path)
+        if status is not None and status["state"] in ("done", "error"):
+            return status
+        time.sleep(poll)
+    return None
+
+
+def _plain(ratios):
+    """Ratio set(s) as JSON-ready floats (one level per eccentricity if nested)."""
+    return {key: _plain(value) if isinstance(value, dict) else float(value) for key, value in ratios.items()}
+
+
+def start_render(p1_path, p2_path, expInfo, baseFileName, condition_labels,
+                 subject_ratio=None, mystep_rad=0.075, C=1.0, bootstrap=None):
+    """
+    Start the report worker for one session and return its status file path.
+    bootstrap: the CI the session already computed (bootstrap_pse result),
+    reused by the worker instead of resampling again.
+
+    All paths are made absolute (the experiment script runs from the data
+    folder). The worker's stdout/stderr go to {baseFileName}_report.err.
+    """
+    baseFileName = os.path.abspath(baseFileName)
+    status_path = baseFileName + STATUS_SUFFIX
+    job = {
+        "p1_path": os.path.abspath(p1_path),
+        "p2_path": os.path.abspath(p2_path),
+        "expInfo": {key: str(value) for key, value in expInfo.items()},
+        "baseFileName": baseFileName,
+        "condition_labels": list(condition_labels),
+        "subject_ratio": None if subject_ratio is None else _plain(subject_ratio),
+        "mystep_rad": mystep_rad,
+        "C": C,
+        "bootstrap": bootstrap_summary(bootstrap),
+        "status_path": status_path,
+    }
+    write_status(status_path, state="queued", pid=None, queued=time.time())
+    env = dict(os.environ, MPLBACKEND='Agg')
+    with open(baseFileName + '_report.err', 'w') as err:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), json.dumps(job)],
+                         stdin=subprocess.DEVNULL, stdout=err, stderr=err, env=env,
+                         cwd=os.path.dirname(baseFileName), start_new_session=True)
+    return status_path
+
+
+def run_job(job):
+    """Worker body: analyze and render one session, keeping the status file current."""
+    status = {"state": "running", "pid": os.getpid(), "started": time.time()}
+    previous = read_status(job["status_path"]) or {}
+    status["queued"] = previous.get("queued")
+    write_status(job["status_path"], **status)
+    try:
+        from quartet_analysis import analyze_session
+        from quartet_columnar import read_phase_frame
+
+        results = analyze_session(read_phase_frame(job["p1_path"]), read_phase_frame(job["p2_path"]),
+                                  job["expInfo"], job["baseFileName"], job["condition_labels"],
+                                  mystep_rad=job["mystep_rad"], subject_ratio=job["subject_ratio"],
+                                  C=job.get("C", 1.0), bootstrap=job.get("bootstrap"))
+        status.update(state="done",
+                      outputs=[job["baseFileName"] + suffix for suffix in REPORT_SUFFIXES
+                               if os.path.exists(job["baseFileName"] + suffix)],
+                      pse_rad=float(results["fit"]["pse_rad"]),
+                      pse_ratio=float(results["fit"]["pse_ratio"]),
+                      hits=results["render"]["hits"], misses=results["render"]["misses"])
+    except Exception as err:
+        status.update(state="error", error=f"{type(err).__name__}: {err}",
+                      traceback=traceback.format_exc())
+    status["finished"] = time.time()
+    write_status(job["status_path"], **status)
+    return status
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    status = run_job(json.loads(argv[0]))
+    return 0 if status["state"] == "done" else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+FIGURES AND SUMMARY REPORT FOR THE QUARTET PARITY RATIO EXPERIMENT
+*Phase 1 density plots, Phase 2 psychometric curves, PSE vs. eccentricity
+*Group overlay of the Phase 1 densities (one curve per subject and direction)
+*Summary report (Markdown + HTML)
+
+Densities come from the binned KDE of quartet_kde (Scott bandwidth, as
+seaborn's kdeplot), all groups of a figure in one call.
+The only module that imports matplotlib and markdown. It is loaded
+on first use (quartet_analysis.analyze_session(render=True) or any of these
+names imported from quartet_analysis), so the experiment never pays for it
+before the end of Phase 2.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+import markdown
+
+from quartet_analysis import is_per_eccentricity, predict_vertical
+from quartet_kde import frame_kde
+
+DIRECTION_COLORS = {"Ascending": "blue", "Descending": "red"}
+DENSITY_PANELS = [("ResponseRad", "MeanRad", "Radian", "_Phase1_RadDensity.png"),
+                  ("ResponseRatio", "MeanRatio", "Ratio", "_Phase1_RatDensity.png")]
+
+
+# %% PHASE 1 (Method of Limits)
+# ==============================================================================
+
+def plot_phase1_density(p1_data, summary_table, baseFileName, dpi=300):
+    """Density plots of the Phase 1 responses (radian and ratio)."""
+    for column, mean_column, unit, suffix in DENSITY_PANELS:
+        plt.figure(figsize=(6, 2))
+        kde = frame_kde(p1_data, column, by="RatioDir")
+        for direction, density, (lo, hi) in zip(kde["groups"], kde["density"], kde["support"]):
+            inside = (kde["grid"] >= lo) & (kde["grid"] <= hi)
+            if not np.isfinite(density).any():
+                continue  # fewer than 2 responses or no spread
+            plt.fill_between(kde["grid"][inside], density[inside], color=DIRECTION_COLORS[direction],
+                             alpha=0.5, label=direction)
+
+        for _, row in summary_table.iterrows():
+            plt.axvline(row[mean_column], color=DIRECTION_COLORS[row["RatioDir"]],
+                        linestyle="--", linewidth=2)
+
+        plt.title("Density Plot of Response by Direction")
+        plt.xlabel(f"Response ({unit})")
+        plt.ylabel("Density")
+        plt.legend(title="RatioDir")
+        plt.tight_layout()
+        plt.savefig(baseFileName + suffix, dpi=dpi)
+        plt.close()
+
+
+def plot_group_phase1_density(p1_data, prefix, dpi=300):
+    """
+    Group overlay of the Phase 1 responses (radian and ratio): a thin curve
+    per subject and direction (p1_data has a Subject column) and the pooled
+    density of each direction, on one grid. Writes {prefix}_Phase1_*Density.png.
+    """
+    for column, _, unit, suffix in DENSITY_PANELS:
+        subjects = frame_kde(p1_data, column, by=["Subject", "RatioDir"])
+        pooled = frame_kde(p1_data, column, by="RatioDir", grid=subjects["grid"])
+        fig, ax = plt.subplots(figsize=(6, 3))
+        for direction, color in DIRECTION_COLORS.items():
+            rows = [k for k, (_, d) in enumerate(subjects["groups"]) if d == direction]
+            curves = subjects["density"][rows]
+            curves = curves[np.isfinite(curves).all(axis=1)]
+            segments = np.stack(np.broadcast_arrays(subjects["grid"][None, :], curves), axis=-1)
+            ax.add_collection(LineCollection(segments, colors=color, linewidths=0.5,
+                                             alpha=min(0.5, 20 / max(len(curves), 1))))
+            if direction in pooled["groups"]:
+                ax.plot(pooled["grid"], pooled["density"][pooled["groups"].index(direction)], color=color,
+                        linewidth=2, label=f"{direction} (pooled)")
+        ax.autoscale_view()
+        ax.set_ylim(bottom=0)
+        ax.set_title(f"Phase 1 Responses of {p1_data['Subject'].nunique()} Subjects by Direction")
+        ax.set_xlabel(f"Response ({unit})")
+        ax.set_ylabel("Density")
+        ax.legend(title="RatioDir")
+        fig.tight_layout()
+        fig.savefig(prefix + suffix, dpi=dpi)
+        plt.close(fig)
+
+
+# %% PHASE 2 (Method of Constant Stimuli)
+# ==============================================================================
+
+def plot_phase2_curves(p2_data, data_summary, fit, baseFileName, dpi=300):
+    """Psychometric curves with the PSE (radian and ratio)."""
+    x_intercept = fit["pse_rad"]
+    x_intercept_ratio = fit["pse_ratio"]
+
+    # Continuous predictions for visualization
+    x_pred = np.linspace(p2_data["ConditionRad"].min(), p2_data["ConditionRad"].max(), 100).reshape(-1, 1)
+    y_pred = predict_vertical(fit, x_pred.flatten()) * 100
+
+    # Plotting the results (radian)
+    plt.figure(figsize=(6, 6))
+
+    # fitted curve
+    plt.plot(x_pred, y_pred, color='red', label='Fitted curve')
+
+    # probability prediction + error bars
+    plt.errorbar(
+        data_summary["ConditionRad"],
+        data_summary["vertical_percent"],
+        yerr=data_summary["se"],
+        fmt='o',
+        color='blue',
+        ecolor='blue',
+        capsize=3,
+        label='Observed mean ± SE'
+    )
+
+    # PSE line
+    plt.axvline(x=x_intercept, color='black', linestyle='--')
+    plt.axhline(y=50, color='black', linestyle='--')
+    plt.text(x_intercept+0.05, 3, f"PSE: {x_intercept:.2f}", fontweight='bold', ha='center', va='bottom')
+
+    # Labels
+    plt.xlabel("Angle in Radian")
+    plt.ylabel("Prediction for Vertical Response (%)")
+    plt.title("Psychometric Curve with Quartet Angle")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(baseFileName + '_Phase2_RadCurve.png', dpi=dpi)
+    plt.close()
+
+    # Plotting in ratio
+    x_pred_ratio = np.tan(x_pred.flatten())
+
+    plt.figure(figsize=(6, 6))
+
+    # Fitted curve
+    plt.plot(x_pred_ratio, y_pred, color='red', label='Fitted curve')
+
+    # predictions + error bars
+    plt.errorbar(
+        data_summary["ConditionRatio"],
+        data_summary["vertical_percent"],
+        yerr=data_summary["se"],
+        fmt='o',
+        color='blue',
+        ecolor='blue',
+        capsize=3,
+        label='Observed mean ± SE'
+    )
+
+    # PSE
+    plt.axvline(x=x_intercept_ratio, color='black', linestyle='--')
+    plt.axhline(y=50, color='black', linestyle='--')
+    plt.text(x_intercept_ratio+0.12, 3, f"PSE: {x_intercept_ratio:.2f}", fontweight='bold', ha='center', va='top')
+
+    # Labels
+    plt.xlabel("Aspect Ratio")
+    plt.ylabel("Prediction for Vertical Response (%)")
+    plt.title("Psychometric Curve with Quartet Ratio")
+    plt.tight_layout()
+    plt.legend()
+    plt.savefig(baseFileName + '_Phase2_RatCurve.png', dpi=dpi)
+    plt.close()
+
+
+# %% ECCENTRICITIES
+# ==============================================================================
+
+def plot_pse_by_eccentricity(by_eccentricity, baseFileName, dpi=300):
+    """Phase 2 PSE and Phase 1 estimate (radian) against eccentricity."""
+    plt.figure(figsize=(6, 4))
+    plt.plot(by_eccentricity["Eccentricity"], by_eccentricity["PSERad"], 'o-', color='red', label='Phase 2 PSE')
+    plt.plot(by_eccentricity["Eccentricity"], by_eccentricity["Phase1Rad"], 's--', color='blue',
+             label='Phase 1 estimate')
+    plt.axhline(y=np.pi / 4, color='black', linestyle=':')
+    plt.xlabel("Eccentricity (dva)")
+    plt.ylabel("Angle in Radian")
+    plt.title("Parity Ratio by Eccentricity")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(baseFileName + '_PSE_Eccentricity.png', dpi=dpi)
+    plt.close()
+
+
+# %% SUMMARY REPORT
+# ==============================================================================
+
+def img_md(filename, width=400):
+    return f'<img src="{filename}" width="{width}">'
+
+
+def write_summary(baseFileName, expInfo, summary_table, subject_ratio, pse_rad, pse_ratio, bootstrap=None,
+                  by_eccentricity=None):
+    """
+    Write {baseFileName}_summary.md and its HTML version (with the PSE CI if
+    bootstrapped, and the PSE per eccentricity for multi-eccentricity sessions).
+    """
+    if is_per_eccentricity(subject_ratio):
+        subject_ratio_df = pd.DataFrame({f"{e} dva": {label: f"{ratio:.4f}" for label, ratio in ratios.items()}
+                                         for e, ratios in subject_ratio.items()})
+        subject_ratio_df = subject_ratio_df.rename_axis("Condition Label").reset_index()
+    else:
+        subject_ratio_df = pd.DataFrame(list(subject_ratio.items()), columns=["Condition Label", "Aspect Ratio"])
+        subject_ratio_df["Aspect Ratio"] = subject_ratio_df["Aspect Ratio"].map(lambda x: f"{x:.4f}")
+
+    # Markdown
+    mdFileName = baseFileName + '_summary.md'
+
+    md_lines = [
+        f"# Summary Report for Participant {expInfo['participant']}\n",
+        f"**Experiment:** {expInfo['expName']}\n",
+        f"**Date:** {expInfo['date']}\n",
+
+        "## Phase 1 - Method of Limits\n",
+        "**Radian Density Plot:**\n",
+        img_md(os.path.basename(baseFileName) + "_Phase1_RadDensity.png") + "\n\n",
+
+        "**Ratio Density Plot:**\n",
+        img_md(os.path.basename(baseFileName) + "_Phase1_RatDensity.png") + "\n\n",
+
+        "**Summary Table:**\n",
+        summary_table.to_markdown(index=False),
+        "\n\n",
+
+        "## Personalized Aspect Ratios\n",
+        subject_ratio_df.to_markdown(index=False),
+        "\n\n",
+
+        "## Phase 2 - Psychometric Curve\n",
+        "**Radian Version:**\n",
+        img_md(os.path.basename(baseFileName) + "_Phase2_RadCurve.png") + "\n\n",
+
+        "**Ratio Version:**\n",
+        img_md(os.path.basename(baseFileName) + "_Phase2_RatCurve.png") + "\n\n",
+
+        f"**Estimated PSE (in radian):** `{pse_rad:.4f}`\n",
+        f"**Estimated PSE (in ratio):** `{pse_ratio:.4f}`\n",
+    ]
+    if bootstrap is not None:
+        rad_lo, rad_hi = bootstrap["pse_rad_ci"]
+        ratio_lo, ratio_hi = bootstrap["pse_ratio_ci"]
+        md_lines += [
+            f"**PSE {bootstrap['ci']}% CI (in radian):** `[{rad_lo:.4f}, {rad_hi:.4f}]`\n",
+            f"**PSE {bootstrap['ci']}% CI (in ratio):** `[{ratio_lo:.4f}, {ratio_hi:.4f}]`\n",
+            f"(percentile bootstrap within conditions, {bootstrap['n_valid']}/{bootstrap['n_boot']} replicates)\n"
+            if bootstrap.get("method", "percentile bootstrap") == "percentile bootstrap" else
+            "(PSE and credible interval from the psi posterior: the unpenalized logistic fit "
+            "has no finite optimum for these responses)\n",
+        ]
+    if by_eccentricity is not None:
+        md_lines += [
+            "## PSE by Eccentricity\n",
+            "(the curves above pool all eccentricities)\n",
+            img_md(os.path.basename(baseFileName) + "_PSE_Eccentricity.png") + "\n\n",
+            by_eccentricity.to_markdown(index=False, floatfmt=".4f"),
+            "\n",
+        ]
+    # Save as MD
+    md_text = ''.join(line + '\n' for line in md_lines)
+    with open(mdFileName, 'w', encoding='utf-8') as f:
+        f.write(md_text)
+
+    html = markdown.markdown(md_text, extensions=['tables'])
+    htmlFileName = mdFileName.replace('.md', '.html')
+
+    with open(htmlFileName, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return mdFileName, htmlFileName
+
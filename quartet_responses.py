@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+KEYBOARD RESPONSES FOR THE QUARTET PARITY RATIO EXPERIMENT
+*Key presses time-stamped at key-down on the experiment clock
+*psychopy.hardware.keyboard (Psychtoolbox/ioHub backends collect and stamp
+ events in a background thread, independent of the frame loop); falls back
+ to event.getKeys (stamped when polled, i.e. once per frame) without it
+
+get_keys() returns (name, time) pairs like event.getKeys(timeStamped=clock),
+so a response can be matched to the flip that was on screen when the key
+went down (see press_frame).
+"""
+
+import numpy as np
+
+from psychopy import event
+
+
+class ResponseBox:
+    """
+    Key presses on the experiment clock.
+
+    clock: the experiment core.Clock (key times are seconds on it).
+    backend: psychopy.hardware.keyboard backend ('ptb', 'iohub', 'event');
+    None lets PsychoPy pick the best one installed.
+    """
+
+    def __init__(self, clock, backend=None):
+        self.clock = clock
+        try:
+            from psychopy.hardware import keyboard
+        except ImportError:
+            self._kb = None
+        else:
+            kwargs = {} if backend is None else {"backend": backend}
+            self._kb = keyboard.Keyboard(clock=clock, **kwargs)
+
+    @property
+    def hardware(self):
+        """True when key-down times come from psychopy.hardware.keyboard."""
+        return self._kb is not None
+
+    def describe(self):
+        if self._kb is None:
+            return "event.getKeys (frame-polled)"
+        return f"psychopy.hardware.keyboard ({getattr(self._kb, '_backend', None) or 'default'} backend)"
+
+    def get_keys(self, keyList):
+        """Presses of the listed keys since the last call, as (name, key-down time)."""
+        if self._kb is None:
+            return event.getKeys(keyList=keyList, timeStamped=self.clock)
+        return [(key.name, key.rt) for key in self._kb.getKeys(keyList=keyList, waitRelease=False, clear=True)]
+
+    def clear(self):
+        """Drop pending key presses (both the keyboard and the pyglet event queue)."""
+        if self._kb is not None:
+            self._kb.clearEvents(eventType='keyboard')
+        event.clearEvents(eventType='keyboard')
+
+
+def press_frame(flip_times, press_time):
+    """
+    Index of the frame on screen when a key went down: the last flip at or
+    before press_time (0 if the press precedes the first flip).
+    """
+    return max(int(np.searchsorted(flip_times, press_time, side='right')) - 1, 0)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+STIMULUS RENDERING FOR THE QUARTET PARITY RATIO EXPERIMENT
+*Batched quartet: both squares of a pair drawn in one ElementArrayStim call
+*Frame cache: pre-rendered quartet frames blitted as a single image
+*Text pool: TextStims built once (static screens and keyed variants) and reused
+
+Square positions are given in pixels (see quartet_geometry.GeometryTable),
+so nothing is converted from deg on the frame path.
+"""
+
+import collections
+
+import numpy as np
+from psychopy import visual
+
+
+# %% BATCHED QUARTET
+# ==============================================================================
+
+class QuartetArray:
+    """
+    Draws one quartet pair (two squares) plus the fixation dot(s).
+
+    Both squares live in a single ElementArrayStim, so a frame costs one
+    position update and one draw call for the squares instead of two
+    setPos/draw round trips on a shared GratingStim.
+    """
+
+    def __init__(self, win, square_pix, color, dot_fix, dot_fix_green):
+        self.squares = visual.ElementArrayStim(win,
+                                               autoLog=False,
+                                               name='Square',
+                                               units='pix',
+                                               nElements=2,
+                                               elementTex=None,
+                                               elementMask=None,
+                                               xys=np.zeros((2, 2)),
+                                               sizes=(square_pix, square_pix),
+                                               colors=color,
+                                               colorSpace='rgb',
+                                               )
+        self.dot_fix = dot_fix
+        self.dot_fix_green = dot_fix_green
+
+    def draw(self, xys, is_green=False):
+        """Draw the two squares at xys (pixels, shape (2, 2)) and the fixation."""
+        self.squares.xys = xys
+        self.squares.draw()
+        self.dot_fix.draw()
+        if is_green:
+            self.dot_fix_green.draw()
+
+
+# %% FRAME CACHE
+# ==============================================================================
+
+class FrameCache:
+    """
+    Pre-rendered quartet frames, one texture per (key, pair).
+
+    build() draws each quartet of a GeometryTable once to the back buffer and
+    captures the region around the circle into a BufferImageStim, so
+    presenting a frame is a single blit. Keys are whatever the caller indexes
+    its ratios by (condition labels in Phase 2, sweep indices in Phase 1).
+    """
+
+    def __init__(self, win, quartets):
+        self.win = win
+        self.quartets = quartets
+        self.entries = {}
+        self.size_pix = (0, 0)
+
+    def build(self, table, keys=None):
+        """Render every (key, pair) of a GeometryTable (keys default to its indices)."""
+        self.invalidate()
+        keys = range(len(table)) if keys is None else keys
+        # capture only the square region that can hold the quartet (in norm units)
+        half_pix = np.ceil(table.radius * table.pix_per_deg + table.square_pix / 2) + 2
+        self.size_pix = (int(2 * half_pix), int(2 * half_pix))
+        nx, ny = half_pix / (np.asarray(self.win.size) / 2)
+        rect = (-nx, ny, nx, -ny)
+        for index, key in enumerate(keys):
+            for pair in (0, 1):
+                self.win.clearBuffer()
+                self.quartets.draw(table.xys_pix[index, pair])
+                self.entries[(key, pair)] = visual.BufferImageStim(self.win, rect=rect, autoLog=False)
+        self.win.clearBuffer()
+
+    def invalidate(self):
+        """Drop every cached frame (e.g. when the ratios change)."""
+        self.entries.clear()
+
+    def __contains__(self, key):
+        return (key, 0) in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def memory_bytes(self):
+        """Texture memory held by the cache (RGBA, 4 bytes per pixel)."""
+        return len(self.entries) * self.size_pix[0] * self.size_pix[1] * 4
+
+    def draw(self, key, pair, is_green=False):
+        """Blit the cached quartet (fixation included) for key and pair."""
+        self.entries[(key, pair)].draw()
+        if is_green:
+            self.quartets.dot_fix_green.draw()
+
+
+# %% TEXT POOL
+# ==============================================================================
+
+class TextPool:
+    """
+    TextStims built once and reused (text layout and glyph rasterization are
+    slow, and would otherwise land at run boundaries and trial starts).
+
+    make(text, **style) builds a stimulus. add() registers the static screens
+    by name (never evicted); get() returns the stimulus for a parameterized
+    text, keyed by content and style, from a least-recently-used cache of at
+    most max_size entries. warm() builds variants ahead of time so that a
+    phase only ever hits the cache.
+    """
+
+    def __init__(self, make, max_size=16):
+        self.make = make
+        self.max_size = max_size
+        self.static = {}
+        self.variants = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def add(self, name, text, **style):
+        """Build a static screen and return it (also available as pool[name])."""
+        self.static[name] = self.make(text, **style)
+        return self.static[name]
+
+    def __getitem__(self, name):
+        return self.static[name]
+
+    def __len__(self):
+        return len(self.static) + len(self.variants)
+
+    def get(self, text, **style):
+        """The stimulus showing text (built on a miss, evicting the oldest beyond max_size)."""
+        key = (text, tuple(sorted(style.items())))
+        stim = self.variants.get(key)
+        if stim is not None:
+            self.hits += 1
+            self.variants.move_to_end(key)
+            return stim
+        self.misses += 1
+        stim = self.variants[key] = self.make(text, **style)
+        if len(self.variants) > self.max_size:
+            self.variants.popitem(last=False)
+            self.evictions += 1
+        return stim
+
+    def warm(self, texts, **style):
+        """Build the variants for texts now; warming does not count as hits or misses."""
+        for text in texts:
+            key = (text, tuple(sorted(style.items())))
+            if key not in self.variants:
+                self.variants[key] = self.make(text, **style)
+        while len(self.variants) > self.max_size:
+            self.variants.popitem(last=False)
+            self.evictions += 1
+
+    def stats_line(self):
+        """One log line with the pool size and hit/miss counts."""
+        return (f"Text pool: {len(self.static)} static, {len(self.variants)}/{self.max_size} variants, "
+                f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions\n")
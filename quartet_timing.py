@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+FRAME-COUNT TIMING FOR THE QUARTET PARITY RATIO EXPERIMENT
+*Stimulus scheduler: compiles a trial into an exact per-frame schedule
+*Flip telemetry: per-flip timestamps and per-trial dropped-frame accounting
+
+Every stimulus interval is rounded to a whole number of refresh frames, so
+pair swaps and ratio steps are tied to the flip count instead of being polled
+from the wall clock on every frame.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# %% FRAME ARITHMETIC
+# ==============================================================================
+
+def frames_for(duration, frame_dur):
+    """
+    Number of whole refresh frames closest to a duration (at least one frame).
+    """
+    return max(1, int(round(duration / frame_dur)))
+
+
+# %% STIMULUS SCHEDULER
+# ==============================================================================
+
+def compile_schedule(pairs, steps, ratios, recorded, interval_frames, frame_dur, resp_delay=0):
+    """
+    Expand per-interval stimulus states into a per-frame schedule.
+
+    pairs, steps and recorded hold one entry per stimulus interval (pair shown,
+    index into ratios shown, index into ratios reported on response or -1).
+    interval_frames holds the number of frames of each interval.
+
+    Returns a dict of per-frame arrays ("pair", "flip", "step", "ratio",
+    "resp_ratio", "onset", "tick" = frames since the interval start) plus
+    "n_frames", "frame_dur" and "resp_frame", the first frame on which a
+    response is accepted.
+    """
+    interval_frames = np.asarray(interval_frames, dtype=int)
+    ratios = np.asarray(ratios, dtype=float)
+    flip = np.repeat(np.arange(len(interval_frames)), interval_frames)
+    step = np.asarray(steps, dtype=int)[flip]
+    rec = np.asarray(recorded, dtype=int)[flip]
+    n_frames = len(flip)
+    return {
+        "pair": np.asarray(pairs, dtype=np.int8)[flip],
+        "flip": flip,
+        "step": step,
+        "ratio": ratios[step],
+        "resp_ratio": np.where(rec >= 0, ratios[np.maximum(rec, 0)], np.nan),
+        "onset": np.arange(n_frames) * frame_dur,  # deadline of each frame from trial onset
+        "tick": np.arange(n_frames) - np.repeat(np.cumsum(interval_frames) - interval_frames, interval_frames),
+        "n_frames": n_frames,
+        "frame_dur": frame_dur,
+        "resp_frame": int(np.ceil(resp_delay / frame_dur)),
+    }
+
+
+def compile_phase1_schedule(ratio_list, start_pair, duration, frame_dur, resp_delay=0):
+    """
+    Phase 1 (Method of Limits): the pair swaps every `duration` and the ratio
+    steps once per quartet cycle (2 swaps) until ratio_list is exhausted.
+
+    Matches the former wall-clock loop: the first ratio is shown for the first
+    two cycles, and a ratio is only reported from the second cycle on.
+    """
+    n_intervals = 2 * (len(ratio_list) + 1)
+    k = np.arange(n_intervals)
+    pairs = (start_pair + k) % 2
+    recorded = k // 2 - 1
+    steps = np.maximum(recorded, 0)
+    interval_frames = np.full(n_intervals, frames_for(duration, frame_dur))
+    return compile_schedule(pairs, steps, ratio_list, recorded, interval_frames, frame_dur, resp_delay)
+
+
+def fine_sweep_range(n_steps, coarse_step, coarse_pos, back_off, overshoot):
+    """
+    Coarse-to-fine Phase 1: (start, stop) positions in the full sweep of the
+    fine re-sweep after a response at position `coarse_pos` of the coarse
+    sweep (every coarse_step-th step). The fine sweep starts `back_off`
+    coarse steps before the step on screen at the response (which lags the
+    crossing by the reaction time) and ends `overshoot` coarse steps after it.
+    """
+    center = coarse_pos * coarse_step
+    return max(0, center - back_off * coarse_step), min(n_steps, center + overshoot * coarse_step + 1)
+
+
+def compile_phase2_schedule(ratio, start_pair, duration_f1, duration, cycle, frame_dur, resp_delay=0):
+    """
+    Phase 2 (Method of Constant Stimuli): a single ratio shown for `cycle`
+    quartet cycles, with the first frame lasting `duration_f1`.
+    """
+    n_intervals = 2 * cycle
+    k = np.arange(n_intervals)
+    pairs = (start_pair + k) % 2
+    steps = np.zeros(n_intervals, dtype=int)
+    interval_frames = np.full(n_intervals, frames_for(duration, frame_dur))
+    interval_frames[0] = frames_for(duration_f1, frame_dur)
+    return compile_schedule(pairs, steps, [ratio], steps, interval_frames, frame_dur, resp_delay)
+
+
+# %% FLIP TELEMETRY
+# ==============================================================================
+
+# integer codes used to tag flips with the phase they belong to
+# (the fine re-sweep of a coarse-to-fine Phase 1 trial is tagged separately,
+#  so the gap between the two sweeps is not counted as dropped frames)
+PHASE_CODES = {"practice": 0, "phase1": 1, "phase2": 2, "practice_fine": 3, "phase1_fine": 4}
+
+
+class FlipTelemetry:
+    """
+    Opt-in recorder of myWin.flip() timestamps.
+
+    Flips are written into preallocated NumPy buffers that grow by whole
+    chunks, so recording a flip is a handful of array stores. Each flip is
+    tagged with its trial number, phase code and the quartet pair on screen.
+    """
+
+    def __init__(self, frame_dur, chunk_size=4096):
+        self.frame_dur = frame_dur
+        self.chunk_size = chunk_size
+        self.n = 0
+        self._time = np.empty(chunk_size, dtype=np.float64)
+        self._trial = np.empty(chunk_size, dtype=np.int32)
+        self._phase = np.empty(chunk_size, dtype=np.int8)
+        self._pair = np.empty(chunk_size, dtype=np.int8)
+
+    def _grow(self):
+        """Extend every buffer by one chunk."""
+        self._time = np.concatenate([self._time, np.empty(self.chunk_size, dtype=np.float64)])
+        self._trial = np.concatenate([self._trial, np.empty(self.chunk_size, dtype=np.int32)])
+        self._phase = np.concatenate([self._phase, np.empty(self.chunk_size, dtype=np.int8)])
+        self._pair = np.concatenate([self._pair, np.empty(self.chunk_size, dtype=np.int8)])
+
+    def record(self, flip_time, trial, phase, pair):
+        """Store one flip timestamp (phase is a key of PHASE_CODES)."""
+        i = self.n
+        if i == len(self._time):
+            self._grow()
+        self._time[i] = flip_time
+        self._trial[i] = trial
+        self._phase[i] = PHASE_CODES[phase]
+        self._pair[i] = pair
+        self.n = i + 1
+
+    def flips(self):
+        """Views of the recorded flips (time, trial, phase, pair)."""
+        n = self.n
+        return {"time": self._time[:n], "trial": self._trial[:n],
+                "phase": self._phase[:n], "pair": self._pair[:n]}
+
+    def trial_stats(self, phases=None):
+        """
+        Per-trial frame-interval summary.
+
+        A frame interval longer than 1.5 refresh periods counts as dropped;
+        Dropped is the number of refreshes missed and MaxOvershoot the worst
+        excess of an interval over the nominal frame duration (in seconds).
+        PairDurMax is the longest measured pair-state duration of the trial.
+        """
+        flips = self.flips()
+        keep = np.ones(self.n, dtype=bool)
+        if phases is not None:
+            keep = np.isin(flips["phase"], [PHASE_CODES[p] for p in phases])
+        time, trial = flips["time"][keep], flips["trial"][keep]
+        phase, pair = flips["phase"][keep], flips["pair"][keep]
+        columns = ["Phase", "Trial", "Flips", "Intervals", "Dropped",
+                   "MeanInterval", "MaxOvershoot", "PairDurMax"]
+        if len(time) == 0:
+            return pd.DataFrame(columns=columns)
+
+        # trial boundaries: a new trial starts wherever the (phase, trial) tag changes
+        new_trial = np.r_[True, (np.diff(trial) != 0) | (np.diff(phase) != 0)]
+        starts = np.flatnonzero(new_trial)
+        group = np.cumsum(new_trial) - 1
+        interval = np.diff(time)
+        within = ~new_trial[1:]
+        iv_group = group[1:][within]
+        iv = interval[within]
+
+        n_groups = len(starts)
+        n_flips = np.bincount(group, minlength=n_groups)
+        n_iv = np.bincount(iv_group, minlength=n_groups)
+        missed = np.where(iv > 1.5 * self.frame_dur, np.rint(iv / self.frame_dur) - 1, 0)
+        dropped = np.bincount(iv_group, weights=missed, minlength=n_groups)
+        mean_iv = np.bincount(iv_group, weights=iv, minlength=n_groups) / np.maximum(n_iv, 1)
+        overshoot = np.full(n_groups, np.nan)
+        np.fmax.at(overshoot, iv_group, iv - self.frame_dur)
+
+        # pair-state segments: a segment ends at the first flip showing the other pair
+        new_seg = np.r_[new_trial[1:] | (np.diff(pair) != 0), True]
+        seg_end = np.flatnonzero(new_seg)
+        seg_start = np.r_[0, seg_end[:-1] + 1]
+        seg_next = np.minimum(seg_end + 1, len(time) - 1)
+        closed = ~np.r_[new_trial[1:], True][seg_end]  # segment followed by a flip of the same trial
+        seg_dur = time[seg_next] - time[seg_start]
+        pair_max = np.full(n_groups, np.nan)
+        np.fmax.at(pair_max, group[seg_start][closed], seg_dur[closed])
+
+        phase_names = {code: name for name, code in PHASE_CODES.items()}
+        return pd.DataFrame({
+            "Phase": [phase_names[p] for p in phase[starts]],
+            "Trial": trial[starts],
+            "Flips": n_flips,
+            "Intervals": n_iv,
+            "Dropped": dropped.astype(int),
+            "MeanInterval": np.where(n_iv > 0, mean_iv, np.nan),
+            "MaxOvershoot": overshoot,
+            "PairDurMax": pair_max,
+        }, columns=columns)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""Shared fixtures: the repository root on sys.path and headless sessions."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from quartet_headless import SimulatedObserver, run_session  # noqa: E402
+from quartet_render import wait_for  # noqa: E402
+
+TRUE_PSE = 0.8
+
+
+def headless_session(data_dir, seed=0, participant="test", **kwargs):
+    """Run one simulated session and wait for its report worker."""
+    np.random.seed(seed)
+    observer = SimulatedObserver(pse=TRUE_PSE, seed=seed)
+    scope = run_session(observer, str(data_dir), participant=participant, **kwargs)
+    if "report_status" in scope:
+        # the detached worker writes into data_dir; let it finish before cleanup
+        scope["report"] = wait_for(scope["report_status"], timeout=120)
+    return scope
+
+
+@pytest.fixture(scope="session")
+def debug_session(tmp_path_factory):
+    """A short-protocol session (Debug: Yes): (script globals, data folder)."""
+    data_dir = tmp_path_factory.mktemp("debug")
+    return headless_session(data_dir, debug=True), data_dir
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""quartet_fit.fit_logistic against sklearn's LogisticRegression."""
+
+import numpy as np
+import pytest
+
+from quartet_fit import fit_logistic
+
+sklearn = pytest.importorskip("sklearn.linear_model")
+
+
+def sessions(n_sessions, rng, n_trials=320):
+    # 8 angles around a per-session PSE, as Phase 2
+    pse = rng.normal(np.pi / 4, 0.06, n_sessions)
+    x = pse[:, None] + 0.075 * (np.arange(8) - 3)[None, :]
+    X = np.repeat(x, n_trials // 8, axis=1)
+    p = 1 / (1 + np.exp(20 * (X - pse[:, None])))
+    return X, (rng.random(X.shape) < p).astype(float)
+
+
+@pytest.mark.parametrize("C", [1.0, 10.0, None])
+def test_matches_sklearn(C):
+    X, y = sessions(20, np.random.default_rng(0))
+    fit = fit_logistic(X, y, C=C)
+    assert fit["converged"].all()
+    for i in range(len(X)):
+        ref = sklearn.LogisticRegression(C=np.inf if C is None else C, tol=1e-10, max_iter=10000)
+        ref.fit(X[i][:, None], y[i])
+        assert fit["intercept"][i] == pytest.approx(ref.intercept_[0], rel=1e-5, abs=1e-6)
+        assert fit["slope"][i] == pytest.approx(ref.coef_[0, 0], rel=1e-5, abs=1e-6)
+
+
+def test_ragged_sessions_match_single_fits():
+    X, y = sessions(3, np.random.default_rng(1))
+    lengths = [200 + 40 * i for i in range(3)]
+    ragged = fit_logistic([X[i, :n] for i, n in enumerate(lengths)], [y[i, :n] for i, n in enumerate(lengths)])
+    for i, n in enumerate(lengths):
+        single = fit_logistic(X[i, :n], y[i, :n])
+        assert ragged["pse"][i] == pytest.approx(single["pse"][0], abs=1e-8)
+
+
+def test_aggregated_counts_match_trials():
+    X, y = sessions(1, np.random.default_rng(2))
+    angles = np.unique(X[0])
+    counts = np.array([(X[0] == a).sum() for a in angles])
+    props = np.array([y[0][X[0] == a].mean() for a in angles])
+    aggregated = fit_logistic(angles, props, weights=counts)
+    assert aggregated["pse"][0] == pytest.approx(fit_logistic(X[0], y[0])["pse"][0], abs=1e-8)
+
+
+def test_separated_responses_are_flagged():
+    x = np.array([0.7, 0.7, 0.75, 0.8, 0.85, 0.85])
+    y = np.array([1, 1, 1, 0, 0, 0], dtype=float)
+    unpenalized = fit_logistic(x, y, C=None)
+    assert unpenalized["separated"][0] and not unpenalized["converged"][0]
+    penalized = fit_logistic(x, y, C=1.0)
+    assert penalized["separated"][0] and penalized["converged"][0]
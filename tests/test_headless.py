@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""End-to-end headless sessions: saved data, report and PSE recovery."""
+
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import TRUE_PSE, headless_session
+from quartet_columnar import HAVE_PYARROW, SCHEMAS, read_phase, typed_frame
+from quartet_headless import SimulatedObserver
+from quartet_reanalysis import find_sessions
+
+COLUMNS = {
+    "p1": {"Trial", "Run", "Duration", "RespDelay", "ITI", "QuartetOrder", "RatioDir",
+           "ResponseKey", "ResponseTime", "ResponseFlip", "ResponseRatio"},
+    "p2": {"Run", "Trial", "Duration_F1", "Duration", "ReportTime", "RespDelay", "ITI", "Cycle",
+           "ConditionRatio", "QuartetOrder", "trial_ratio", "ResponseKey", "ResponseTime",
+           "ResponseLabel"},
+}
+
+
+def test_debug_session_csv_columns(debug_session):
+    _, data_dir = debug_session
+    for phase, columns in COLUMNS.items():
+        (path,) = glob.glob(os.path.join(str(data_dir), '*_SubjData', '*', 'Output', '*_%s.csv' % phase))
+        df = pd.read_csv(path)
+        assert columns <= set(df.columns)
+        assert len(df) > 0
+    p2 = pd.read_csv(path)
+    assert p2["ResponseKey"].isin(["v", "h"]).all()
+    assert p2["ConditionRatio"].isin(debug_session[0]["subject_ratio"]).all()
+
+
+def test_debug_session_typed_schema(debug_session):
+    _, data_dir = debug_session
+    (session,) = find_sessions([str(data_dir)])
+    for phase, path in (("phase1", session["p1_path"]), ("phase2", session["p2_path"])):
+        df = pd.read_csv(path)
+        assert set(SCHEMAS[phase]) - {"CoarseRatio"} <= set(df.columns)
+        typed = typed_frame(df, phase)  # raises on values outside the schema
+        assert len(typed) == len(df) > 0
+
+
+@pytest.mark.skipif(not HAVE_PYARROW, reason="pyarrow is not installed")
+def test_debug_session_feather_matches_csv(debug_session):
+    scope, data_dir = debug_session
+    (session,) = find_sessions([str(data_dir)])
+    for phase, csv_path in (("phase1", session["p1_path"]), ("phase2", session["p2_path"])):
+        df, metadata = read_phase(os.path.splitext(csv_path)[0] + '.feather')
+        pd.testing.assert_frame_equal(df, typed_frame(pd.read_csv(csv_path), phase))
+        assert metadata["expInfo"]["participant"] == "test"
+    assert metadata["subject_ratio"] == pytest.approx(scope["subject_ratio"])
+
+
+def test_debug_session_report(debug_session):
+    scope, _ = debug_session
+    assert scope["report"]["state"] == "done", scope["report"].get("traceback")
+    assert all(os.path.isfile(path) for path in scope["report"]["outputs"])
+    assert scope["report"]["pse_rad"] == pytest.approx(scope["pse_rad"])
+
+
+def test_full_session_recovers_pse(tmp_path):
+    # the debug protocol has only 16 Phase 2 trials: too few for the PSE
+    scope = headless_session(tmp_path, seed=6)
+    assert len(scope["phase2_df"]) == 320
+    assert abs(scope["overall_mean_rad"] - TRUE_PSE) < 0.05
+    assert abs(scope["pse_rad"] - TRUE_PSE) < 0.05
+    lo, hi = scope["results"]["bootstrap"]["pse_rad_ci"]
+    assert lo < scope["pse_rad"] < hi
+
+
+def test_ignored_response_is_repeated():
+    # a v/h press made within RespDelay is ignored by the script; the observer must press again
+    observer = SimulatedObserver(pse=TRUE_PSE, seed=0)
+    observer.on_flip(np.array([[3.0, 3.0], [-3.0, -3.0]]), now=0.0)
+    key, t = observer.on_poll(['v', 'h'], now=1.0)
+    assert observer.on_poll(['v', 'h'], now=1.5) is None
+    repeated_key, repeated_t = observer.on_poll(['v', 'h'], now=t + 1.5)
+    assert repeated_key == key and repeated_t > t + 1.5
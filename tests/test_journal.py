@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Crash-safe session journal: torn lines, rebuilt state and resume."""
+
+import glob
+import json
+import os
+
+import numpy as np
+
+from conftest import headless_session
+from quartet_journal import SessionJournal, find_unfinished, read_journal
+
+PLAN = {"phase1": [{"Trial": 1}, {"Trial": 2}], "phase2": [{"Trial": 1}, {"Trial": 2}, {"Trial": 3}]}
+
+
+def test_torn_line_is_dropped_and_state_rebuilt(tmp_path):
+    path = str(tmp_path / "p_exp_2024_journal.jsonl")
+    journal = SessionJournal(path)
+    journal.start({"participant": "p"}, PLAN)
+    journal.append_trial("phase1", {"Trial": 1, "Response": np.int64(3)})
+    journal.append("subject_ratio", ratios={"rat_1": 0.9})
+    journal.append_trial("phase2", {"Trial": 1, "Response": "f"})
+    journal.close()
+    with open(path, "a") as f:
+        f.write('{"type": "trial", "phase": "pha')  # crash mid-write
+
+    assert len(read_journal(path)) == 4
+    assert find_unfinished(str(tmp_path), "p", "exp") == path
+
+    journal = SessionJournal(path)
+    assert journal.expInfo == {"participant": "p"}
+    assert journal.subject_ratio == {"rat_1": 0.9}
+    assert journal.completed("phase1") == 1 and journal.completed("phase2") == 1
+    assert journal.conditions("phase2") == [{"Trial": 1, "Response": "f"}, {"Trial": 2}, {"Trial": 3}]
+    journal.append_trial("phase2", {"Trial": 2, "Response": "j"})
+    journal.append("end")
+    journal.close()
+    with open(path) as f:
+        assert all(json.loads(line) for line in f)  # the torn line was truncated away
+    assert find_unfinished(str(tmp_path), "p", "exp") is None
+
+
+def test_interrupted_session_resumes(tmp_path):
+    complete = headless_session(tmp_path, debug=True)
+    n_trials = len(complete["phase2_df"])
+    path, = glob.glob(os.path.join(str(tmp_path), "**", "*_journal.jsonl"), recursive=True)
+
+    # keep the first k Phase 2 trials, tear the next record and drop "end"
+    k = 5
+    with open(path) as f:
+        lines = f.readlines()
+    phase2 = [i for i, line in enumerate(lines) if json.loads(line).get("phase") == "phase2"]
+    with open(path, "w") as f:
+        f.writelines(lines[:phase2[k]])
+        f.write(lines[phase2[k]][:20])
+    kept = [json.loads(lines[i])["trial"] for i in phase2[:k]]
+
+    resumed = headless_session(tmp_path, seed=1, resume=True)
+    phase2_df = resumed["phase2_df"]
+    assert len(phase2_df) == n_trials
+    assert phase2_df["ResponseKey"].iloc[:k].tolist() == [t["ResponseKey"] for t in kept]
+    assert phase2_df["Trial"].tolist() == complete["phase2_df"]["Trial"].tolist()
+    assert read_journal(path)[-1]["type"] == "end"
+    assert find_unfinished(os.path.dirname(path), "test", resumed["expName"]) is None
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""quartet_kde.kde against scipy.stats.gaussian_kde."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from quartet_kde import frame_kde, kde
+
+stats = pytest.importorskip("scipy.stats")
+
+
+def responses(rng, n_subjects=6, per_direction=10):
+    pse = rng.normal(0.85, 0.06, n_subjects)
+    frames = []
+    for direction, offset in (("Ascending", 0.03), ("Descending", -0.03)):
+        x = pse[:, None] + offset + rng.normal(0, 0.04, (n_subjects, per_direction))
+        frames.append(pd.DataFrame({"Subject": np.repeat(np.arange(n_subjects), per_direction),
+                                    "RatioDir": direction, "ResponseRad": x.ravel()}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def assert_close(result, reference, bandwidth):
+    density, ref = result["density"], np.asarray(reference)
+    assert np.abs(density - ref).max(axis=1).max() / ref.max() < 1e-3
+    assert np.allclose(result["bandwidth"], bandwidth, rtol=1e-12)
+
+
+def test_groups_match_gaussian_kde():
+    data = responses(np.random.default_rng(0))
+    result = frame_kde(data, "ResponseRad", by=["Subject", "RatioDir"], gridsize=2048)
+    groups = list(data.groupby(["Subject", "RatioDir"], sort=True))
+    assert result["groups"] == [key for key, _ in groups]
+    reference, bandwidth = [], []
+    for _, group in groups:
+        exact = stats.gaussian_kde(group["ResponseRad"].to_numpy())
+        reference.append(exact(result["grid"]))
+        bandwidth.append(np.sqrt(exact.covariance[0, 0]))
+    assert_close(result, reference, bandwidth)
+    assert result["n"].tolist() == [10] * len(groups)
+
+
+def test_weights_and_bw_adjust_match_gaussian_kde():
+    rng = np.random.default_rng(1)
+    x, w = rng.normal(0.8, 0.05, 200), rng.uniform(0.5, 2.0, 200)
+    result = kde(x, weights=w, bw_adjust=1.5, gridsize=1024)
+    exact = stats.gaussian_kde(x, weights=w)
+    exact.set_bandwidth(exact.factor * 1.5)
+    assert_close(result, [exact(result["grid"])], [np.sqrt(exact.covariance[0, 0])])
+    assert result["density"][0].sum() * (result["grid"][1] - result["grid"][0]) == pytest.approx(1.0, abs=1e-3)
+
+
+def test_degenerate_groups_are_nan():
+    x = np.array([0.7, 0.8, 0.9, 0.5, 0.6, 0.6, np.nan])
+    by = np.array(["a", "a", "a", "single", "flat", "flat", "a"])
+    result = kde(x, by)
+    assert result["groups"] == ["a", "flat", "single"]
+    assert np.isfinite(result["density"][0]).all()
+    assert np.isnan(result["density"][1:]).all()
+    assert result["n"].tolist() == [3, 2, 1]
+
+
+def test_uneven_grid_is_rejected():
+    with pytest.raises(ValueError):
+        kde(np.array([0.1, 0.2, 0.4]), grid=np.array([0.0, 0.1, 0.3]))
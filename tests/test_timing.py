@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Frame-count schedules of quartet_timing."""
+
+import numpy as np
+import pytest
+
+from quartet_timing import compile_phase1_schedule, compile_phase2_schedule, frames_for
+
+
+@pytest.mark.parametrize("duration, refresh_rate, expected", [
+    (0.2, 60, 12), (0.2, 144, 29), (0.2, 59.94, 12), (0.001, 60, 1), (0.5, 120, 60),
+])
+def test_frames_for(duration, refresh_rate, expected):
+    assert frames_for(duration, 1 / refresh_rate) == expected
+
+
+@pytest.mark.parametrize("refresh_rate", [60, 85, 144])
+def test_phase1_schedule(refresh_rate):
+    frame_dur = 1 / refresh_rate
+    ratios = np.linspace(0.5, 1.5, 10)
+    schedule = compile_phase1_schedule(ratios, start_pair=1, duration=0.2, frame_dur=frame_dur, resp_delay=0.5)
+    per_interval = frames_for(0.2, frame_dur)
+    n_intervals = 2 * (len(ratios) + 1)
+    assert schedule["n_frames"] == n_intervals * per_interval
+    assert len(schedule["pair"]) == len(schedule["ratio"]) == schedule["n_frames"]
+    # the pair swaps every interval, starting from start_pair
+    first_frames = np.arange(n_intervals) * per_interval
+    assert list(schedule["pair"][first_frames]) == [(1 + k) % 2 for k in range(n_intervals)]
+    assert list(schedule["flip"][first_frames]) == list(range(n_intervals))
+    # one ratio per quartet cycle; the first cycle shows ratio 0 and reports nothing
+    assert (schedule["ratio"][:2 * per_interval] == ratios[0]).all()
+    assert np.isnan(schedule["resp_ratio"][:2 * per_interval]).all()
+    assert schedule["resp_ratio"][-1] == ratios[-1]
+    assert schedule["resp_frame"] == int(np.ceil(0.5 * refresh_rate))
+
+
+@pytest.mark.parametrize("refresh_rate", [60, 85, 144])
+def test_phase2_schedule(refresh_rate):
+    frame_dur = 1 / refresh_rate
+    schedule = compile_phase2_schedule(1.1, start_pair=0, duration_f1=0.5, duration=0.2, cycle=4,
+                                       frame_dur=frame_dur)
+    assert schedule["n_frames"] == frames_for(0.5, frame_dur) + 7 * frames_for(0.2, frame_dur)
+    assert (schedule["ratio"] == 1.1).all()
+    assert schedule["flip"][-1] == 7
+    assert schedule["pair"][0] == 0 and schedule["pair"][-1] == 1
+    assert schedule["onset"][-1] == pytest.approx((schedule["n_frames"] - 1) * frame_dur)